@@ -0,0 +1,253 @@
+# coding: utf-8
+import threading
+import time
+from enum import Enum
+
+import numpy as np
+from qfluentwidgets import ConfigItem
+
+from .config import cfg
+from .link_state import LinkState
+from .signal_bus import signalBus
+
+
+class AlarmSeverity(Enum):
+    """ Alarm severity enumeration """
+
+    WARNING = "Warning"
+    CRITICAL = "Critical"
+
+
+class Alarm:
+    """ State of an alarm key at the time it was published """
+
+    def __init__(self, key, title, message, severity, active, count, value=None, since=None):
+        self.key = key
+        self.title = title
+        self.message = message
+        self.severity = severity    # type: AlarmSeverity
+        self.active = active
+        self.count = count          # number of times the alarm was raised
+        self.value = value          # worst value while active
+        self.since = since          # monotonic time the alarm was last raised
+
+
+def hysteresis(setMask, resetMask, active: bool):
+    """ state of a set/reset latch after every sample, `active` is the state before the batch
+
+    A sample which neither sets nor resets keeps the state of the sample before.
+    """
+    marks = np.where(setMask | resetMask, np.arange(len(setMask)), -1)
+    last = np.maximum.accumulate(marks)
+    return np.where(last >= 0, setMask[np.maximum(last, 0)], active)
+
+
+class AlarmRule:
+    """ Threshold on one or more telemetry channels, evaluated on whole batches
+
+    The alarm is raised when the worst channel crosses `limit` and cleared
+    once it is back by more than `band`, so a value hovering at the limit
+    does not flap. With `rateSpan` the rule watches the rate of change per
+    second over `rateSpan` seconds instead of the value. `limit` may be a
+    config item, read on every batch.
+    """
+
+    def __init__(self, key, title, channels, limit, band, above=True, severity=AlarmSeverity.WARNING,
+                 rateSpan=None, unit=""):
+        self.key = key
+        self.title = title
+        self.channels = tuple(channels)
+        self.limit = limit
+        self.band = band
+        self.above = above
+        self.severity = severity
+        self.rateSpan = rateSpan
+        self.unit = unit
+        self._tail = (np.empty(0), np.empty(0))     # samples of the last `rateSpan` seconds
+
+    def currentLimit(self):
+        return cfg.get(self.limit) if isinstance(self.limit, ConfigItem) else self.limit
+
+    def signal(self, times, columns: dict):
+        """ the worst value of the channels after every sample, None if no channel is in the batch """
+        values = [np.asarray(columns[c], np.float64) for c in self.channels if c in columns]
+        if not values:
+            return None
+
+        with np.errstate(all="ignore"):
+            values = values[0] if len(values) == 1 else (np.fmax if self.above else np.fmin).reduce(values)
+
+        return self.__rate(np.asarray(times, np.float64), values) if self.rateSpan else values
+
+    def __rate(self, times, values):
+        tailT, tailV = self._tail
+        t, v = np.concatenate((tailT, times)), np.concatenate((tailV, values))
+        keep = t >= t[-1] - self.rateSpan
+        self._tail = (t[keep], v[keep])
+
+        # rate of every sample of the batch against the first sample `rateSpan` before it
+        i = np.arange(len(tailT), len(t))
+        lag = np.searchsorted(t, t[i] - self.rateSpan)
+        dt = t[i] - t[lag]
+        with np.errstate(all="ignore"):
+            rate = np.abs(v[i] - v[lag]) / dt
+
+        # too short to tell, such as right after the stream started
+        rate[dt < self.rateSpan / 2] = np.nan
+        return rate
+
+    def evaluate(self, times, columns: dict, active: bool):
+        """ evaluate a batch
+
+        :return: (active after the batch, number of raises, worst value while active), None if the
+            channels are not in the batch
+        """
+        values = self.signal(times, columns)
+        if values is None or not len(values):
+            return None
+
+        limit = self.currentLimit()
+        with np.errstate(invalid="ignore"):
+            if self.above:
+                setMask, resetMask = values > limit, values < limit - self.band
+            else:
+                setMask, resetMask = values < limit, values > limit + self.band
+
+        state = hysteresis(setMask, resetMask, active)
+        raises = int(np.count_nonzero(state[1:] & ~state[:-1])) + int(state[0] and not active)
+        worst = None
+        if state.any():
+            worst = float((np.nanmax if self.above else np.nanmin)(np.where(state, values, np.nan)))
+
+        return bool(state[-1]), raises, worst
+
+    def message(self, value):
+        if value is None:
+            return ""
+
+        unit = f" {self.unit}" if self.unit else ""
+        return f"{value:.2f}{unit} (limit {self.currentLimit():g}{unit})"
+
+    def clear(self):
+        self._tail = (np.empty(0), np.empty(0))
+
+
+def defaultRules():
+    return [
+        AlarmRule("leak", "Leak detected", ["leak"], 0.5, 0.25, severity=AlarmSeverity.CRITICAL),
+        AlarmRule("overCurrent", "Thruster over-current", [f"current{i}" for i in range(1, 5)],
+                  cfg.alarmCurrentLimit, 1.0, severity=AlarmSeverity.CRITICAL, unit="A"),
+        AlarmRule("depthLimit", "Depth limit", ["depth"], cfg.alarmDepthLimit, 0.5, unit="m"),
+        AlarmRule("verticalSpeed", "Vertical speed limit", ["depth"], cfg.alarmVerticalSpeed, 0.2,
+                  rateSpan=0.5, unit="m/s"),
+    ]
+
+
+class AlarmEngine:
+    """ Evaluates the alarm rules on every telemetry batch and publishes the alarm states
+
+    `evaluate` is a telemetry source sink and runs on its thread. An alarm
+    is published through `signalBus.alarmChanged` when it is raised or
+    cleared, never for every sample which is over the limit. Raises of the
+    same key less than `minInterval` seconds apart are folded into the
+    count of one publication, which is sent once the interval has passed.
+    """
+
+    def __init__(self, rules=None, minInterval=0.5):
+        self.rules = {rule.key: rule for rule in (rules if rules is not None else defaultRules())}
+        self.minInterval = minInterval
+        self._lock = threading.Lock()
+        self._alarms = {}       # type: dict[str, Alarm]
+        self._published = {}    # monotonic time of the last publication per key
+        self._pending = set()
+        self._timer = None      # flushes the pending publications if no batch comes
+
+    def alarms(self):
+        """ the current state of every alarm which was ever raised """
+        with self._lock:
+            return list(self._alarms.values())
+
+    def evaluate(self, times, columns: dict):
+        with self._lock:
+            for key, rule in self.rules.items():
+                alarm = self._alarms.get(key)
+                result = rule.evaluate(times, columns, alarm is not None and alarm.active)
+                if result is not None:
+                    self.__update(key, rule.title, rule.severity, *result, rule.message, rule.above)
+
+            self.__flush()
+
+    def evaluateBatches(self, batches: list):
+        """ evaluate the (times, columns) batches of a `dataBus` delivery in order """
+        for times, columns in batches:
+            self.evaluate(times, columns)
+
+    def onLinkStateChanged(self, old, new):
+        """ raise the link loss alarm when an up link drops, clear it as restored once the link is up again """
+        up = (LinkState.UP, LinkState.DEGRADED)
+        with self._lock:
+            alarm = self._alarms.get("link")
+            active = alarm is not None and alarm.active
+            if old in up and new not in up:
+                self.__update("link", "Link lost", AlarmSeverity.CRITICAL, True, int(not active), None,
+                              lambda _: f"Link {new.value.lower()}")
+            elif new == LinkState.UP and active:
+                down = time.monotonic() - alarm.since
+                self.__update("link", "Link restored", AlarmSeverity.CRITICAL, False, 0, None,
+                              lambda _: f"Link up again after {down:.1f} s")
+
+            self.__flush()
+
+    def __update(self, key, title, severity, active, raises, worst, message, above=True):
+        alarm = self._alarms.get(key)
+        wasActive = alarm is not None and alarm.active
+        if alarm is None:
+            alarm = self._alarms[key] = Alarm(key, title, "", severity, False, 0)
+
+        alarm.title = title
+        if raises:
+            alarm.since = time.monotonic()
+
+        if worst is not None:
+            if wasActive and alarm.value is not None:
+                worst = max(alarm.value, worst) if above else min(alarm.value, worst)
+            alarm.value = worst
+
+        alarm.count += raises
+        alarm.active = active
+        alarm.message = message(alarm.value)
+        if raises or active != wasActive:
+            self._pending.add(key)
+
+    def flush(self):
+        """ publish the alarms whose interval has passed """
+        with self._lock:
+            self._timer = None
+            self.__flush()
+
+    def __flush(self):
+        now = time.monotonic()
+        for key in list(self._pending):
+            wait = self._published.get(key, -self.minInterval) + self.minInterval - now
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                continue
+
+            self._pending.discard(key)
+            self._published[key] = now
+            a = self._alarms[key]
+            signalBus.alarmChanged.emit(Alarm(a.key, a.title, a.message, a.severity, a.active, a.count,
+                                              a.value, a.since))
+
+    def clear(self):
+        with self._lock:
+            self._alarms.clear()
+            self._pending.clear()
+            for rule in self.rules.values():
+                rule.clear()
+
+
+alarmEngine = AlarmEngine()
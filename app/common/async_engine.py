@@ -0,0 +1,72 @@
+# coding: utf-8
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class AsyncEngine:
+    """ asyncio event loop running on a daemon thread
+
+    Coroutines are submitted from any thread (usually the GUI thread) and
+    blocking calls such as paramiko handshakes are pushed to a worker pool,
+    so neither the GUI thread nor the event loop is ever blocked. Results
+    should be handed back to Qt through signals.
+    """
+
+    def __init__(self, maxWorkers=8):
+        self.maxWorkers = maxWorkers
+        self._loop = None   # type: asyncio.AbstractEventLoop
+        self._thread = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """ event loop of the engine, started on first use """
+        with self._lock:
+            if self._loop is None:
+                self.__start()
+
+        return self._loop
+
+    def __start(self):
+        ready = threading.Event()
+        self._executor = ThreadPoolExecutor(self.maxWorkers, "AsyncEngineWorker")
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._executor)
+            asyncio.set_event_loop(self._loop)
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="AsyncEngine", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def submit(self, coro) -> Future:
+        """ schedule a coroutine on the engine, thread safe """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, func, *args):
+        """ run a function on the engine thread, thread safe """
+        self.loop.call_soon_threadsafe(func, *args)
+
+    @staticmethod
+    async def runBlocking(func, *args):
+        """ await a blocking function executed in the worker pool """
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def stop(self):
+        """ stop the event loop and the worker pool """
+        with self._lock:
+            if self._loop is None:
+                return
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(2)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._loop = None
+
+
+asyncEngine = AsyncEngine()
@@ -0,0 +1,159 @@
+# coding: utf-8
+import struct
+
+
+# kind of a frame, the first byte of every message on the control channel
+KEYFRAME = 0x01     # every thruster
+DELTA = 0x02        # the thrusters which changed since the last frame
+ACK = 0x03          # sent back by the ROV for every frame it applied
+
+HEADER = struct.Struct("!BI")       # kind, sequence number
+COUNT = struct.Struct("!B")         # thrusters of a keyframe
+MASK = struct.Struct("!H")          # changed thrusters of a delta, bit i is thruster i
+ACK_TIMES = struct.Struct("!dd")    # time the ROV received and applied the frame, on the ROV's clock
+
+# a thruster command from -1 to 1 is sent as an int16
+SCALE = 32767
+MAX_THRUSTERS = 16
+
+
+def quantize(value: float) -> int:
+    return max(-SCALE, min(SCALE, round(value * SCALE)))
+
+
+class CommandEncoder:
+    """ Encodes the thruster setpoints of the control loop as keyframes and deltas
+
+    A keyframe carries every thruster, a delta only the thrusters whose
+    quantized command changed since the last frame. A tick which changes
+    nothing sends nothing, until `keyframeInterval` seconds after the last
+    keyframe, so the ROV still hears from the panel while the sticks rest
+    and a ROV which restarted catches up. The stream starts with a
+    keyframe, call `reset` whenever the channel is reopened.
+
+    `rawBytes` counts the bytes a fixed frame of every thruster would have
+    taken on every tick, `encodedBytes` the bytes actually sent, both with
+    the length prefix of the channel.
+    """
+
+    # sequence number, send time and every thruster as float32, the frame before the encoding
+    RAW_HEADER = struct.Struct("!Id")
+
+    def __init__(self, keyframeInterval=0.25, prefixSize=4):
+        self.keyframeInterval = keyframeInterval
+        self.prefixSize = prefixSize
+        self.seq = 0
+        self.ticks = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.suppressed = 0
+        self.rawBytes = 0
+        self.encodedBytes = 0
+        self._last = None
+        self._lastKeyframe = 0
+
+    def reset(self):
+        """ start over with a keyframe """
+        self._last = None
+
+    def encode(self, values, now: float):
+        """ frame of a tick, None if the tick changes nothing
+
+        :return: (sequence number, payload) or None
+        """
+        quantized = [quantize(v) for v in values]
+        self.ticks += 1
+        self.rawBytes += self.prefixSize + self.RAW_HEADER.size + 4 * len(quantized)
+
+        last = self._last
+        if last is None or len(last) != len(quantized) or now - self._lastKeyframe >= self.keyframeInterval:
+            payload = HEADER.pack(KEYFRAME, self.seq) + COUNT.pack(len(quantized)) + \
+                struct.pack(f"!{len(quantized)}h", *quantized)
+            self.keyframes += 1
+            self._lastKeyframe = now
+        else:
+            changed = [i for i, (a, b) in enumerate(zip(quantized, last)) if a != b]
+            if not changed:
+                self.suppressed += 1
+                return None
+
+            mask = sum(1 << i for i in changed)
+            payload = HEADER.pack(DELTA, self.seq) + MASK.pack(mask) + \
+                struct.pack(f"!{len(changed)}h", *(quantized[i] for i in changed))
+            self.deltas += 1
+
+        self._last = quantized
+        seq = self.seq
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.encodedBytes += self.prefixSize + len(payload)
+        return seq, payload
+
+    @staticmethod
+    def parseAck(payload: bytes):
+        """ an acknowledgement, None if the message is something else
+
+        :return: (sequence number, ROV receive time, ROV apply time), the times are None if the ROV
+            does not send them
+        """
+        if not payload or payload[0] != ACK:
+            return None
+
+        if len(payload) == HEADER.size:
+            return HEADER.unpack(payload)[1], None, None
+
+        if len(payload) == HEADER.size + ACK_TIMES.size:
+            return (HEADER.unpack_from(payload)[1],) + ACK_TIMES.unpack_from(payload, HEADER.size)
+
+        return None
+
+
+class CommandDecoder:
+    """ The ROV side of the command stream, applies the frames to the last known setpoint """
+
+    def __init__(self):
+        self.values = None      # type: list[float]
+        self.seq = None
+
+    def decode(self, payload: bytes):
+        """ apply a frame, raises `ValueError` if it is malformed or a delta comes before any keyframe
+
+        :return: (sequence number, thruster commands)
+        """
+        if len(payload) < HEADER.size:
+            raise ValueError("Truncated command frame")
+
+        kind, seq = HEADER.unpack_from(payload)
+        offset = HEADER.size
+        if kind == KEYFRAME:
+            count, = COUNT.unpack_from(payload, offset)
+            offset += COUNT.size
+            if len(payload) != offset + 2 * count:
+                raise ValueError("Malformed keyframe")
+
+            values = [v / SCALE for v in struct.unpack_from(f"!{count}h", payload, offset)]
+        elif kind == DELTA:
+            if self.values is None:
+                raise ValueError("Delta before the first keyframe")
+
+            mask, = MASK.unpack_from(payload, offset)
+            offset += MASK.size
+            changed = [i for i in range(MAX_THRUSTERS) if mask >> i & 1]
+            if len(payload) != offset + 2 * len(changed) or changed and changed[-1] >= len(self.values):
+                raise ValueError("Malformed delta")
+
+            values = list(self.values)
+            for i, v in zip(changed, struct.unpack_from(f"!{len(changed)}h", payload, offset)):
+                values[i] = v / SCALE
+        else:
+            raise ValueError(f"Unknown command frame kind {kind}")
+
+        self.values, self.seq = values, seq
+        return seq, values
+
+    @staticmethod
+    def ack(seq: int, received=None, applied=None) -> bytes:
+        """ acknowledgement of a frame, with the times it was received and applied if given """
+        if received is None or applied is None:
+            return HEADER.pack(ACK, seq)
+
+        return HEADER.pack(ACK, seq) + ACK_TIMES.pack(received, applied)
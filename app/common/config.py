@@ -5,13 +5,30 @@ from enum import Enum
 from PyQt5.QtCore import QLocale
 from qfluentwidgets import (qconfig, QConfig, ConfigItem, OptionsConfigItem, BoolValidator,
                             OptionsValidator, RangeConfigItem, RangeValidator,
-                            FolderListValidator, Theme, FolderValidator, ConfigSerializer, __version__)
+                            FolderListValidator, Theme, FolderValidator, ConfigSerializer, EnumSerializer,
+                            ConfigValidator, __version__)
 
 # ROV Deafult Connection Configuration 
 SSH_ADDRESS = "192.168.137.102" 
 SSH_PORT = 22
 SSH_USERNAME = "rov"
 SSH_PASSWORD = "Aa123456"
+ROV_CONTROL_COMMAND = "rov-control"
+ROV_TELEMETRY_COMMAND = "rov-telemetry"
+ROV_LOG_FOLDER = "/home/rov/logs"
+
+# Thrust of a unit command of each thruster (columns) along each degree of
+# freedom (rows), the 8 thruster vectored frame: 4 horizontal thrusters at
+# 45 degrees in the corners and 4 vertical thrusters
+DOF_NAMES = ("surge", "sway", "heave", "yaw", "pitch", "roll")
+THRUSTER_ALLOCATION = [
+    [-1, -1, 1, 1, 0, 0, 0, 0],
+    [1, -1, 1, -1, 0, 0, 0, 0],
+    [0, 0, 0, 0, -1, -1, -1, -1],
+    [1, -1, -1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, -1, -1, 1, 1],
+    [0, 0, 0, 0, -1, 1, -1, 1],
+]
 
 # Basic Configuration
 YEAR = "2024-2025"
@@ -33,6 +50,14 @@ class Language(Enum):
     AUTO = QLocale()
 
 
+class SSHProfile(Enum):
+    """ SSH algorithm preference profile """
+
+    DEFAULT = "Default"
+    FAST = "Fast"
+    COMPATIBLE = "Compatible"
+
+
 class LanguageSerializer(ConfigSerializer):
     """ Language serializer """
 
@@ -43,6 +68,28 @@ class LanguageSerializer(ConfigSerializer):
         return Language(QLocale(value)) if value != "Auto" else Language.AUTO
 
 
+class AllocationValidator(ConfigValidator):
+    """ Thruster allocation matrix validator, one row per degree of freedom and 6 to 8 thrusters """
+
+    def __init__(self, rows=len(DOF_NAMES), minThrusters=6, maxThrusters=8):
+        self.rows = rows
+        self.minThrusters = minThrusters
+        self.maxThrusters = maxThrusters
+
+    def validate(self, value):
+        try:
+            if len(value) != self.rows or not self.minThrusters <= len(value[0]) <= self.maxThrusters:
+                return False
+
+            return all(len(row) == len(value[0]) and all(isinstance(v, (int, float)) for v in row)
+                       for row in value) and any(v for row in value for v in row)
+        except TypeError:
+            return False
+
+    def correct(self, value):
+        return value if self.validate(value) else THRUSTER_ALLOCATION
+
+
 def isWin11():
     return sys.platform == 'win32' and sys.getwindowsversion().build >= 22000
 
@@ -57,12 +104,75 @@ class Config(QConfig):
         "ROV_Connection", "sshUsername", SSH_USERNAME)
     sshPassword = ConfigItem(
         "ROV_Connection", "sshPassword", SSH_PASSWORD)
+    sshKeyFile = ConfigItem(
+        "ROV_Connection", "sshKeyFile", "")
+    sshAlgorithmProfile = OptionsConfigItem(
+        "ROV_Connection", "sshAlgorithmProfile", SSHProfile.FAST, OptionsValidator(SSHProfile),
+        EnumSerializer(SSHProfile))
+    controlCommand = ConfigItem(
+        "ROV_Connection", "controlCommand", ROV_CONTROL_COMMAND)
+    telemetryCommand = ConfigItem(
+        "ROV_Connection", "telemetryCommand", ROV_TELEMETRY_COMMAND)
+    heartbeatEnabled = ConfigItem(
+        "ROV_Connection", "heartbeatEnabled", True, BoolValidator())
+    heartbeatRate = RangeConfigItem(
+        "ROV_Connection", "heartbeatRate", 10, RangeValidator(1, 50))
+    controlRate = RangeConfigItem(
+        "ROV_Connection", "controlRate", 100, RangeValidator(50, 200))
+    controlLowLatency = ConfigItem(
+        "ROV_Connection", "controlLowLatency", False, BoolValidator())
+
+    # thrusters
+    thrusterAllocation = ConfigItem(
+        "Thrusters", "allocation", THRUSTER_ALLOCATION, AllocationValidator())
+    thrusterLimit = RangeConfigItem(
+        "Thrusters", "limit", 100, RangeValidator(10, 100))
+
+    # gamepad
+    gamepadEnabled = ConfigItem(
+        "Gamepad", "enabled", False, BoolValidator())
+    gamepadDevice = ConfigItem(
+        "Gamepad", "device", "")
+    gamepadDeadzone = RangeConfigItem(
+        "Gamepad", "deadzone", 8, RangeValidator(0, 30))
+    gamepadExpo = RangeConfigItem(
+        "Gamepad", "expo", 30, RangeValidator(0, 100))
 
     # folders
     # musicFolders = ConfigItem(
     #     "Folders", "LocalMusic", [], FolderListValidator())
-    # downloadFolder = ConfigItem(
-    #     "Folders", "Download", "app/download", FolderValidator())
+    downloadFolder = ConfigItem(
+        "Folders", "Download", "app/download", FolderValidator())
+
+    # dive data
+    remoteLogFolder = ConfigItem(
+        "Dive_Data", "remoteLogFolder", ROV_LOG_FOLDER)
+
+    # telemetry
+    telemetryNotifyRate = RangeConfigItem(
+        "Telemetry", "notifyRate", 30, RangeValidator(1, 120))
+    telemetryStatsWindow = RangeConfigItem(
+        "Telemetry", "statsWindow", 10, RangeValidator(1, 300))
+
+    # alarms
+    alarmDepthLimit = RangeConfigItem(
+        "Alarms", "depthLimit", 100, RangeValidator(1, 1000))
+    alarmCurrentLimit = RangeConfigItem(
+        "Alarms", "currentLimit", 15, RangeValidator(1, 60))
+    alarmVerticalSpeed = RangeConfigItem(
+        "Alarms", "verticalSpeedLimit", 2, RangeValidator(1, 10))
+
+    # diagnostics
+    signalTracingEnabled = ConfigItem(
+        "Diagnostics", "SignalTracing", False, BoolValidator())
+
+    # recording
+    recordingEnabled = ConfigItem(
+        "Recording", "Enabled", True, BoolValidator())
+    recordingFolder = ConfigItem(
+        "Recording", "Folder", "app/recordings", FolderValidator())
+    recordingSyncInterval = RangeConfigItem(
+        "Recording", "SyncInterval", 2, RangeValidator(1, 30))
 
     # main window
     micaEnabled = ConfigItem("MainWindow", "MicaEnabled", isWin11(), BoolValidator())
@@ -0,0 +1,307 @@
+# coding: utf-8
+import math
+import sys
+import threading
+import time
+from collections import deque
+
+from paramiko import SSHException
+
+from .command_format import CommandEncoder
+from .config import cfg
+from .control_trace import ControlTracer
+from .latency_stats import LatencyHistory, percentile
+from .signal_bus import signalBus
+from .ssh_channels import channelMultiplexer
+from .ssh_session import sshSessionManager
+from .thruster_mixer import thrusterMixer
+
+
+class ControlLoopStats:
+    """ Timing of the control loop over the last frames, all times in milliseconds """
+
+    def __init__(self, connected=False, rate=None, frames=0, overruns=0, skipped=0, period=None,
+                 jitter=None, jitterMax=None, lateness=None, send=None, sendMax=None, rawRate=0, sentRate=0,
+                 unacked=0, ack=None, ackMax=None):
+        self.connected = connected
+        self.rate = rate            # achieved frames per second
+        self.frames = frames        # frames sent since the loop started
+        self.overruns = overruns    # frames which started a whole period late
+        self.skipped = skipped      # stale frames which were never sent
+        self.period = period        # mean period
+        self.jitter = jitter        # p50 deviation of the period from the nominal period
+        self.jitterMax = jitterMax  # p99 deviation
+        self.lateness = lateness    # p99 delay of the frame start after its deadline
+        self.send = send            # p50 time to hand a command to the transport
+        self.sendMax = sendMax      # p99
+        self.rawRate = rawRate      # bytes per second the setpoints would take without encoding
+        self.sentRate = sentRate    # bytes per second sent
+        self.unacked = unacked      # frames sent but not acknowledged yet
+        self.ack = ack              # p50 time from sending a frame to its acknowledgement
+        self.ackMax = ackMax        # p99
+
+    def __str__(self):
+        if not self.connected:
+            return "No Link"
+
+        if self.rate is None:
+            return "Waiting"
+
+        return f"{self.rate:.0f} Hz, Jitter {self.jitter:.2f} ms (p99 {self.jitterMax:.2f}), " \
+               f"Send {self.send:.2f} ms (p99 {self.sendMax:.2f}), Overruns {self.overruns}, Skipped {self.skipped}, " \
+               f"Uplink {self.sentRate:.0f} of {self.rawRate:.0f} B/s"
+
+
+class ControlLoop:
+    """ Sends the thruster setpoints at `controlRate` on the `control` logical channel
+
+    The loop runs on its own thread with deadlines on the monotonic clock,
+    frame k is due at start + k * period whatever the previous frames cost,
+    so the rate does not drift. A frame which starts late is sent at once to
+    catch up, the frames whose deadline passed a whole period ago are stale
+    and skipped, the newest setpoint is sent instead. `setSetpoint` may be
+    called from any thread, a frame sends whatever setpoint is current.
+    With a `source`, such as `gamepadPoller.demand`, every frame mixes the
+    demand the source returns at that tick instead, removing the source
+    falls back to the setpoint.
+
+    Every frame sent is traced by `tracer` from the input behind it, which
+    `sourceInput` tells for the demand of the tick, such as
+    `gamepadPoller.demandInput`, to the ROV's acknowledgement. A frame is
+    only traced from its input if it is the first to carry that input.
+
+    The setpoints go out through a `CommandEncoder`, so a tick which
+    changes nothing sends nothing between keyframes. The ROV acknowledges
+    every frame by its sequence number, the acknowledgements are read on a
+    second thread. The timing, the uplink bytes and the acknowledgement
+    delay are published through `signalBus.controlLoopUpdated` at most
+    every `publishInterval`.
+
+    A thread which wakes up has to wait for the GIL, by default up to 5 ms
+    while the GUI thread runs Python code. With `controlLowLatency` enabled
+    the switch interval of the interpreter is shortened to `switchInterval`
+    while the loop runs. The interval is global and makes every thread
+    switch more often, so it is opt-in and restored by `stop`.
+    """
+
+    def __init__(self, thrusters=None, channelName="control", window=1000, publishInterval=0.5,
+                 spin=0.0005, switchInterval=0.001, keyframeInterval=0.25):
+        self.channelName = channelName
+        self.publishInterval = publishInterval
+        self.spin = spin
+        self.switchInterval = switchInterval
+        self._defaultSwitchInterval = None     # interval to restore, None while not shortened
+        self.stats = ControlLoopStats()
+        self.history = LatencyHistory(("period", "lateness", "send", "ack"), window)
+        self.encoder = CommandEncoder(keyframeInterval)
+        self.frames = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.acked = 0
+        self.tracer = ControlTracer(window)
+        self._inFlight = deque(maxlen=window)   # traced frames which are not acknowledged yet
+        self._publishedBytes = (0, 0)
+        self.stopEvent = threading.Event()
+        self._setpoint = (0.0,) * (thrusters or len(cfg.get(cfg.thrusterAllocation)[0]))
+        self.source = None      # callable returning the demand of each degree of freedom
+        self.sourceInput = None     # callable returning the input behind the last demand of the source
+        self._lastInput = None
+        self._thread = None
+        self._lastSent = None
+        self._lastPublish = 0
+
+    @property
+    def setpoint(self):
+        return self._setpoint
+
+    def setSetpoint(self, values):
+        """ set the command of every thruster, from -1 to 1, such as the output of `thrusterMixer.mix` """
+        values = tuple(float(v) for v in values)
+        # replacing the tuple is atomic, the loop never sees half a setpoint
+        self._setpoint = values
+
+    @staticmethod
+    def period():
+        return 1 / cfg.get(cfg.controlRate)
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.isRunning():
+            return
+
+        self.stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        self.setLowLatency(cfg.get(cfg.controlLowLatency))
+
+    def stop(self, timeout=1):
+        self.stopEvent.set()
+        if self.isRunning() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+        self.__restoreSwitchInterval()
+
+    def setLowLatency(self, enabled: bool):
+        """ shorten the switch interval of the interpreter while the loop runs, or restore it """
+        if not enabled or not self.isRunning():
+            self.__restoreSwitchInterval()
+        elif self._defaultSwitchInterval is None:
+            self._defaultSwitchInterval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self._defaultSwitchInterval, self.switchInterval))
+
+    def __restoreSwitchInterval(self):
+        if self._defaultSwitchInterval is not None:
+            sys.setswitchinterval(self._defaultSwitchInterval)
+            self._defaultSwitchInterval = None
+
+    def _run(self):
+        try:
+            while not self.stopEvent.is_set():
+                if sshSessionManager.current() is None:
+                    self.__idle()
+                    continue
+
+                try:
+                    self.__loop(channelMultiplexer.channel(self.channelName))
+                except (EOFError, OSError, SSHException):
+                    channelMultiplexer.close(self.channelName)
+                    self.__idle()
+        finally:
+            channelMultiplexer.close(self.channelName)
+            self._lastSent = None
+            self.__publish(time.perf_counter(), force=True)
+
+    def __idle(self):
+        self._lastSent = None
+        self.__publish(time.perf_counter())
+        self.stopEvent.wait(0.2)
+
+    def __loop(self, channel):
+        self.encoder.reset()
+        self._inFlight.clear()
+        # the reader ends with the channel, the loop only returns here after closing it
+        threading.Thread(target=self.__readReplies, args=(channel,),
+                         name=type(self).__name__ + "Reader", daemon=True).start()
+
+        deadline = time.perf_counter()
+        while not self.stopEvent.is_set():
+            period = self.period()
+            self.__sleepUntil(deadline)
+            now = time.perf_counter()
+            late = now - deadline
+            if late >= period:
+                # the frames due before the last period are stale, send the current setpoint once
+                missed = math.floor(late / period)
+                self.overruns += 1
+                self.skipped += missed
+                deadline += missed * period
+
+            self.__send(channel, now, late)
+            self.__publish(now)
+            deadline += period
+
+    def __sleepUntil(self, deadline):
+        """ sleep until shortly before the deadline and spin the rest, sleep(0) releases the GIL """
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self.stopEvent.is_set():
+                return
+
+            time.sleep(remaining - self.spin if remaining > self.spin else 0)
+
+    def __send(self, channel, now, late):
+        sample = {"period": now - self._lastSent if self._lastSent is not None else None, "lateness": late}
+        source, sourceInput, report = self.source, self.sourceInput, None
+        if source is None:
+            setpoint = self._setpoint
+        else:
+            setpoint = thrusterMixer.mix(source()).tolist()
+            if sourceInput is not None:
+                report = sourceInput()
+                if report is not None and self._lastInput is not None and report[0] == self._lastInput[0]:
+                    report = None
+                else:
+                    self._lastInput = report
+
+        mixed = time.perf_counter()
+        frame = self.encoder.encode(setpoint, now)
+        if frame is not None:
+            seq, payload = frame
+            # before sending, the acknowledgement may come back before `sendMessage` returns
+            self._inFlight.append(self.tracer.frame(seq, report, now, mixed, time.perf_counter()))
+            channel.sendMessage(payload)
+            sample["send"] = time.perf_counter() - now
+
+        self.history.add(sample)
+        self._lastSent = now
+        self.frames += 1
+
+    def __readReplies(self, channel):
+        try:
+            while not self.stopEvent.is_set():
+                ack = CommandEncoder.parseAck(channel.recvMessage())
+                if ack is not None:
+                    self.__onAck(time.perf_counter(), *ack)
+        except (EOFError, OSError, SSHException):
+            return
+
+    def __onAck(self, now, seq, rovReceived, rovApplied):
+        # frames are applied in order, the frames before an acknowledged one were received too
+        inFlight = self._inFlight
+        while inFlight:
+            frame = inFlight.popleft()
+            if frame[0] == seq:
+                self.acked += 1
+                self.history.add({"ack": now - frame[3]})
+                self.tracer.acknowledged(frame, now, rovReceived, rovApplied)
+                return
+
+    def __publish(self, now, force=False):
+        if not force and now - self._lastPublish < self.publishInterval:
+            return
+
+        periods = self.history.values("period")
+        stats = ControlLoopStats(sshSessionManager.current() is not None, frames=self.frames,
+                                 overruns=self.overruns, skipped=self.skipped, unacked=len(self._inFlight))
+
+        # the byte rates are measured over whole publish intervals, a forced publication keeps the last ones
+        elapsed = now - self._lastPublish
+        if elapsed < self.publishInterval:
+            stats.rawRate, stats.sentRate = self.stats.rawRate, self.stats.sentRate
+        else:
+            raw, sent = self._publishedBytes
+            self._publishedBytes = (self.encoder.rawBytes, self.encoder.encodedBytes)
+            self._lastPublish = now
+            if elapsed < 2 * self.publishInterval:
+                stats.rawRate = (self.encoder.rawBytes - raw) / elapsed
+                stats.sentRate = (self.encoder.encodedBytes - sent) / elapsed
+
+        acks = self.history.values("ack")
+        if acks:
+            stats.ack = percentile(acks, 50) * 1000
+            stats.ackMax = percentile(acks, 99) * 1000
+
+        if periods:
+            nominal = self.period()
+            deviations = [abs(p - nominal) for p in periods]
+            sends = self.history.values("send") or [0]
+            stats.period = sum(periods) / len(periods) * 1000
+            stats.rate = 1000 / stats.period
+            stats.jitter = percentile(deviations, 50) * 1000
+            stats.jitterMax = percentile(deviations, 99) * 1000
+            stats.lateness = percentile(self.history.values("lateness"), 99) * 1000
+            stats.send = percentile(sends, 50) * 1000
+            stats.sendMax = percentile(sends, 99) * 1000
+
+        self.stats = stats
+        signalBus.controlLoopUpdated.emit(stats)
+
+    def clear(self):
+        self.history.clear()
+        self.tracer.clear()
+        self.frames = self.overruns = self.skipped = self.acked = 0
+
+
+controlLoop = ControlLoop()
@@ -0,0 +1,132 @@
+# coding: utf-8
+import csv
+import json
+import threading
+from collections import deque
+
+from .latency_stats import LatencyHistory
+
+
+# stages of a control frame, from the stick to the acknowledgement
+STAGES = (
+    "read",         # the gamepad reports an input until the poller read it
+    "wait",         # read until the control tick which picked it up
+    "mix",          # tick until the thruster commands are mixed
+    "encode",       # mixed until the frame is encoded
+    "uplink",       # encoded until the ROV received it, through the SSH channel
+    "apply",        # received until the ROV applied it
+    "downlink",     # applied until the acknowledgement arrived
+    "rtt",          # encoded until the acknowledgement arrived, needs no clock offset
+    "total",        # input until the ROV applied it
+)
+
+# columns of an exported frame, the topside times on `time.perf_counter`, the ROV times on its own clock
+FIELDS = ("seq", "input", "read", "tick", "mixed", "encoded", "rovReceived", "rovApplied", "acked", "offset")
+
+
+class ClockOffset:
+    """ Offset of the ROV clock from the topside clock, estimated from the acknowledgements
+
+    Each acknowledgement gives an NTP style sample: the offset is exact if
+    the uplink and the downlink took equally long, its error is at most
+    half the round trip without the time on the ROV. The sample of the
+    shortest round trip among the last `window` is kept, queueing only
+    ever makes a round trip longer.
+    """
+
+    def __init__(self, window=64):
+        self._samples = deque(maxlen=window)    # (delay, offset)
+        self.offset = None
+        self.error = None
+
+    def add(self, sent: float, rovReceived: float, rovSent: float, received: float):
+        delay = (received - sent) - (rovSent - rovReceived)
+        offset = ((rovReceived - sent) + (rovSent - received)) / 2
+        self._samples.append((delay, offset))
+        delay, self.offset = min(self._samples)
+        self.error = delay / 2
+
+    def clear(self):
+        self._samples.clear()
+        self.offset = self.error = None
+
+
+class ControlTracer:
+    """ Time stamps of every control frame from the stick input to the ROV's acknowledgement
+
+    The control loop calls `frame` before it sends a frame and `acknowledged`
+    when the acknowledgement arrives, on its reader thread. The ROV sends
+    the times it received and applied the frame on its own clock, which
+    `clock` relates to the topside clock, so the stages on either side of
+    the link add up. The percentiles of each stage cover the last `window`
+    frames, the last `capacity` frames are kept for `export`.
+    """
+
+    def __init__(self, window=1000, capacity=30000):
+        self.history = LatencyHistory(STAGES, window)
+        self.clock = ClockOffset()
+        self.frames = 0
+        self._frames = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def frame(seq, report, tick, mixed, encoded):
+        """ the record of a frame, `report` is the (number, time stamp, read time) of its input or None """
+        if report is None:
+            return seq, None, None, tick, mixed, encoded
+
+        return seq, report[1], report[2], tick, mixed, encoded
+
+    def acknowledged(self, frame, acked, rovReceived=None, rovApplied=None):
+        """ complete the record of a frame with its acknowledgement """
+        _, stamp, read, tick, mixed, encoded = frame
+        sample = {"mix": mixed - tick, "encode": encoded - mixed, "rtt": acked - encoded}
+        if stamp is not None:
+            sample["read"] = read - stamp
+            sample["wait"] = tick - read
+
+        offset = None
+        if rovReceived is not None:
+            self.clock.add(encoded, rovReceived, rovApplied, acked)
+            offset = self.clock.offset
+            sample["uplink"] = rovReceived - offset - encoded
+            sample["apply"] = rovApplied - rovReceived
+            sample["downlink"] = acked - (rovApplied - offset)
+            if stamp is not None:
+                sample["total"] = rovApplied - offset - stamp
+
+        self.history.add(sample)
+        with self._lock:
+            self.frames += 1
+            self._frames.append(frame + (rovReceived, rovApplied, acked, offset))
+
+    def summary(self):
+        result = {"frames": self.frames, "offset": self.clock.offset, "offsetError": self.clock.error,
+                  "stages": {}}
+        for stage in STAGES:
+            p50, p95, p99 = self.history.percentiles(stage)
+            result["stages"][stage] = {"n": self.history.count(stage), "p50": p50, "p95": p95, "p99": p99}
+
+        return result
+
+    def export(self, path: str):
+        """ write the frames to a JSON file, or a CSV file if the path ends with .csv """
+        with self._lock:
+            frames = list(self._frames)
+
+        if not path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"summary": self.summary(), "fields": FIELDS, "frames": frames}, f)
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(["" if v is None else v for v in frame] for frame in frames)
+
+    def clear(self):
+        self.history.clear()
+        self.clock.clear()
+        with self._lock:
+            self.frames = 0
+            self._frames.clear()
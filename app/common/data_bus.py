@@ -0,0 +1,183 @@
+# coding: utf-8
+import logging
+import time
+from collections import deque
+from enum import Enum
+
+from PyQt5.QtCore import Qt, QObject, QTimer
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryPolicy(Enum):
+    """ Delivery policy enumeration """
+
+    LATEST = "Latest"   # only the newest message, the ones in between are dropped
+    BATCH = "Batch"     # every pending message, as one list
+    EVERY = "Every"     # every pending message, one call each
+
+
+class Subscription:
+    """ A subscriber of a topic, with its own queue and counters
+
+    The queue is a `deque`, whose appends and pops are atomic, so the
+    producers never take a lock. A full queue drops its oldest message.
+    The counters are exact with one producer per topic, concurrent
+    producers may lose a few increments of `published`.
+    """
+
+    def __init__(self, bus, topic: str, callback, maxRate: float, policy: DeliveryPolicy, maxQueue: int):
+        self.bus = bus          # type: DataBus
+        self.topic = topic
+        self.callback = callback
+        self.maxRate = maxRate
+        self.policy = policy
+        self.queue = deque(maxlen=1 if policy == DeliveryPolicy.LATEST else maxQueue)
+        self.delivered = 0      # messages handed to the callback
+        self.deliveries = 0     # calls of the callback
+        self.lastDelivery = 0
+        self.published = 0
+        self.errors = 0         # deliveries whose callback raised
+        self._drained = 0
+
+    @property
+    def name(self):
+        """ qualified name of the callback """
+        return getattr(self.callback, "__qualname__", type(self.callback).__name__)
+
+    @property
+    def depth(self):
+        return len(self.queue)
+
+    @property
+    def dropped(self):
+        """ messages which were replaced or pushed out of the queue before delivery """
+        return max(self.published - self._drained - len(self.queue), 0)
+
+    def put(self, message):
+        self.queue.append(message)
+        self.published += 1
+
+    def due(self, now: float):
+        return self.maxRate is None or now - self.lastDelivery >= 1 / self.maxRate
+
+    def drain(self):
+        """ pop the pending messages, at most as many as were queued when called """
+        queue = self.queue
+        messages = [queue.popleft() for _ in range(len(queue))]
+        self._drained += len(messages)
+        return messages
+
+    def deliver(self, now: float):
+        """ hand the pending messages to the callback, the messages of a call which raises are lost """
+        messages = self.drain()
+        if not messages:
+            return 0
+
+        self.delivered += len(messages)
+        self.deliveries += 1
+        self.lastDelivery = now
+        if self.policy == DeliveryPolicy.LATEST:
+            self.callback(messages[-1])
+        elif self.policy == DeliveryPolicy.BATCH:
+            self.callback(messages)
+        else:
+            for message in messages:
+                self.callback(message)
+
+        return len(messages)
+
+    def cancel(self):
+        self.bus.unsubscribe(self)
+
+
+class DataBus(QObject):
+    """ Topic based publish/subscribe bus for high frequency data, next to `signalBus`
+
+    `publish` may be called from any thread and only appends to the queues
+    of the topic's subscriptions. A timer on the GUI thread drains the
+    queues once per frame and calls the subscribers whose `maxRate` allows
+    it, so the Qt event queue sees one timer event per frame however many
+    messages are published. The timer only runs while the bus is started
+    and has subscriptions, which are made on the GUI thread. A subscriber
+    which raises is logged and counted in its `errors`, the other
+    subscribers of the frame are still served.
+    """
+
+    def __init__(self, frameRate=60, parent=None):
+        super().__init__(parent=parent)
+        self.frameRate = frameRate
+        self.drainTime = 0      # seconds spent in the last frame
+        self._topics = {}       # type: dict[str, tuple[Subscription]]
+        self._started = False
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self.drain)
+
+    def start(self):
+        self._started = True
+        self.__updateTimer()
+
+    def stop(self):
+        self._started = False
+        self._timer.stop()
+
+    def isActive(self):
+        """ whether the frame timer is running """
+        return self._timer.isActive()
+
+    def __updateTimer(self):
+        if not self._started or not any(self._topics.values()):
+            self._timer.stop()
+        elif not self._timer.isActive():
+            self._timer.start(round(1000 / self.frameRate))
+
+    def subscribe(self, topic: str, callback, maxRate=None, policy=DeliveryPolicy.LATEST, maxQueue=4096):
+        """ call `callback` on the GUI thread with the messages of `topic`
+
+        :param maxRate: maximum number of calls per second, once per frame if None
+        """
+        subscription = Subscription(self, topic, callback, maxRate, policy, maxQueue)
+        # copy on write, publishers iterate over the old tuple without a lock
+        self._topics[topic] = self._topics.get(topic, ()) + (subscription,)
+        self.__updateTimer()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._topics.get(subscription.topic, ())
+        self._topics[subscription.topic] = tuple(s for s in subscriptions if s is not subscription)
+        self.__updateTimer()
+
+    def publish(self, topic: str, message):
+        for subscription in self._topics.get(topic, ()):
+            subscription.put(message)
+
+    def hasSubscribers(self, topic: str):
+        return bool(self._topics.get(topic))
+
+    def drain(self):
+        """ deliver the pending messages of the subscriptions which are due """
+        start = time.perf_counter()
+        now = time.monotonic()
+        for subscriptions in list(self._topics.values()):
+            for subscription in subscriptions:
+                if not subscription.queue or not subscription.due(now):
+                    continue
+
+                try:
+                    subscription.deliver(now)
+                except Exception:
+                    subscription.errors += 1
+                    logger.exception("Subscriber of %s failed", subscription.topic)
+
+        self.drainTime = time.perf_counter() - start
+
+    def counters(self):
+        """ (topic, subscriber, policy, max rate, queue depth, published, delivered, dropped, errors)
+        of every subscription """
+        return [(s.topic, s.name, s.policy, s.maxRate, s.depth, s.published, s.delivered, s.dropped, s.errors)
+                for subscriptions in list(self._topics.values()) for s in subscriptions]
+
+
+dataBus = DataBus()
@@ -0,0 +1,187 @@
+# coding: utf-8
+import numpy as np
+
+from .ring_buffer import RingBuffer
+
+
+def _interleave(minT, minV, maxT, maxV):
+    """ merge the min and max point of every bucket into one time ordered series """
+    first = minT <= maxT
+    t = np.empty(2 * len(minT))
+    y = np.empty(2 * len(minT))
+    t[0::2] = np.where(first, minT, maxT)
+    y[0::2] = np.where(first, minV, maxV)
+    t[1::2] = np.where(first, maxT, minT)
+    y[1::2] = np.where(first, maxV, minV)
+    return t, y
+
+
+def _aggregate(minT, minV, maxT, maxV, factor: int):
+    """ min and max of complete groups of `factor` buckets, NaN values are ignored
+
+    :return: (minT, minV, maxT, maxV) of the groups
+    """
+    n = len(minV) // factor
+    rows = np.arange(n)
+    lo = np.where(np.isnan(minV[:n * factor]), np.inf, minV[:n * factor]).reshape(n, factor)
+    hi = np.where(np.isnan(maxV[:n * factor]), -np.inf, maxV[:n * factor]).reshape(n, factor)
+    i, j = lo.argmin(1), hi.argmax(1)
+
+    groupMin, groupMax = lo[rows, i], hi[rows, j]
+    groupMin[groupMin == np.inf] = np.nan
+    groupMax[groupMax == -np.inf] = np.nan
+    return (minT[:n * factor].reshape(n, factor)[rows, i], groupMin,
+            maxT[:n * factor].reshape(n, factor)[rows, j], groupMax)
+
+
+def minMaxDecimate(t, y, buckets: int):
+    """ keep the min and max of `buckets` equal sized buckets, at most 2 * buckets points
+
+    Peaks survive decimation, which is what matters for a strip chart.
+    """
+    t, y = np.asarray(t, np.float64), np.asarray(y, np.float64)
+    if len(t) <= 2 * buckets:
+        return t, y
+
+    # pad to full buckets, the padding is NaN and never chosen
+    size = -(-len(t) // buckets)
+    pad = size * buckets - len(t)
+    t = np.concatenate((t, np.full(pad, t[-1])))
+    y = np.concatenate((y, np.full(pad, np.nan)))
+    t, y = _interleave(*_aggregate(t, y, t, y, size))
+    keep = ~np.isnan(y)
+    return t[keep], y[keep]
+
+
+def lttb(t, y, threshold: int):
+    """ Largest-Triangle-Three-Buckets, keeps `threshold` points which preserve the visual shape
+
+    The first and last points are kept, every bucket in between contributes
+    the point forming the largest triangle with the point chosen in the
+    previous bucket and the mean of the next bucket.
+    """
+    t, y = np.asarray(t, np.float64), np.asarray(y, np.float64)
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return t, y
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    chosen = np.empty(threshold, np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+
+    # mean of every bucket, the mean of the bucket after the last one is the last point
+    means = [(t[a:b].mean(), np.nanmean(y[a:b]) if np.isfinite(y[a:b]).any() else 0.0)
+             for a, b in zip(edges[:-1], edges[1:])] + [(t[-1], y[-1])]
+
+    a = 0
+    for k in range(threshold - 2):
+        start, stop = edges[k], edges[k + 1]
+        nextT, nextY = means[k + 1]
+        area = np.abs((t[a] - nextT) * (y[start:stop] - y[a]) - (t[a] - t[start:stop]) * (nextY - y[a]))
+        a = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        chosen[k + 1] = a
+
+    return t[chosen], y[chosen]
+
+
+class MinMaxLevel:
+    """ A level of the pyramid, the min and max of each bucket with their time stamps """
+
+    def __init__(self, capacity: int):
+        self.minT = RingBuffer(capacity)
+        self.minV = RingBuffer(capacity)
+        self.maxT = RingBuffer(capacity)
+        self.maxV = RingBuffer(capacity)
+
+    def __len__(self):
+        return len(self.minT)
+
+    def extend(self, minT, minV, maxT, maxV):
+        self.minT.extend(minT)
+        self.minV.extend(minV)
+        self.maxT.extend(maxT)
+        self.maxV.extend(maxV)
+
+    def latest(self):
+        return self.minT.latest(), self.minV.latest(), self.maxT.latest(), self.maxV.latest()
+
+    def complete(self):
+        """ True if no bucket has been overwritten yet """
+        return self.minT.total <= self.minT.capacity
+
+    def clear(self):
+        for buffer in (self.minT, self.minV, self.maxT, self.maxV):
+            buffer.clear()
+
+
+class DownsamplePyramid:
+    """ Multi-resolution min/max pyramid of one channel, updated incrementally
+
+    Level k holds the min and max of `factor ** (k + 1)` raw samples per
+    bucket, level 0 already aggregates `factor` raw samples. Samples which
+    do not fill a bucket yet are carried until the next batch, so appending
+    costs a few vectorized operations per level. With the defaults a level
+    holds 4096 buckets and the coarsest one, 8 ** 5 samples per bucket,
+    covers about 37 hours at 1 kHz.
+    """
+
+    def __init__(self, factor=8, levels=5, capacity=4096):
+        self.factor = factor
+        self.levels = [MinMaxLevel(capacity) for _ in range(levels)]
+        self._carry = [None] * levels
+
+    def extend(self, times, values):
+        """ aggregate a batch of raw samples into every level """
+        t = np.asarray(times, np.float64)
+        y = np.asarray(values, np.float64)
+        batch = (t, y, t, y)
+        for k, level in enumerate(self.levels):
+            if self._carry[k] is not None:
+                batch = tuple(np.concatenate(pair) for pair in zip(self._carry[k], batch))
+
+            used = len(batch[0]) // self.factor * self.factor
+            self._carry[k] = tuple(a[used:] for a in batch)
+            if not used:
+                break
+
+            batch = _aggregate(*batch, self.factor)
+            level.extend(*batch)
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+
+        self._carry = [None] * len(self.levels)
+
+    def query(self, t0: float, t1: float, pixels: int, raw=None, method="minmax"):
+        """ points of the time range `t0` to `t1` for a view `pixels` wide, at most 2 * pixels
+
+        :param raw: (times, values, complete) of the raw samples, complete if none has been dropped
+
+        The finest level which covers `t0` and has no more than `factor *
+        pixels` buckets in the range is used, the raw samples first. The
+        result is then decimated with min/max or LTTB to the view width.
+        """
+        candidates = []
+        if raw is not None:
+            rawT, rawY, complete = raw
+            candidates.append((lambda: (rawT, rawY, None, None), complete))
+
+        candidates += [(level.latest, level.complete()) for level in self.levels if len(level)]
+
+        t = y = np.empty(0)
+        for i, (latest, complete) in enumerate(candidates):
+            minT, minV, maxT, maxV = latest()
+            lo, hi = np.searchsorted(minT, (t0, t1))
+            covers = complete or (len(minT) and minT[0] <= t0)
+            if i == len(candidates) - 1 or (covers and hi - lo <= self.factor * pixels):
+                if maxT is None:
+                    t, y = minT[lo:hi], minV[lo:hi]
+                else:
+                    t, y = _interleave(minT[lo:hi], minV[lo:hi], maxT[lo:hi], maxV[lo:hi])
+                break
+
+        if method == "lttb":
+            return lttb(t, y, 2 * pixels)
+
+        return minMaxDecimate(t, y, pixels)
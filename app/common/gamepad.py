@@ -0,0 +1,426 @@
+# coding: utf-8
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .config import cfg, DOF_NAMES
+from .signal_bus import signalBus
+
+try:
+    import fcntl
+except ImportError:     # not on Linux
+    fcntl = None
+
+
+# struct input_event of the Linux input subsystem: struct timeval, type, code and value
+EVENT_FORMAT = "llHHi"
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+EVENT_DTYPE = np.dtype([("sec", "l"), ("usec", "l"), ("type", "<u2"), ("code", "<u2"), ("value", "<i4")])
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT, SYN_DROPPED = 0, 3
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+ABS_HAT0X, ABS_HAT0Y = 0x10, 0x11
+ABS_CNT, KEY_CNT = 0x40, 0x300
+
+# (degree of freedom, axis, sign), the left stick drives in the plane, the right stick heaves and yaws
+GAMEPAD_MAPPING = (
+    ("surge", ABS_Y, -1),
+    ("sway", ABS_X, 1),
+    ("heave", ABS_RY, -1),
+    ("yaw", ABS_RX, 1),
+    ("pitch", ABS_HAT0Y, -1),
+    ("roll", ABS_HAT0X, 1),
+)
+
+# range of the axes whose range is unknown, such as in a recorded event file
+DEFAULT_RANGE = (-32768, 32767)
+HAT_RANGE = (-1, 1)
+
+
+def _ioc(direction, number, size):
+    return direction << 30 | size << 16 | ord("E") << 8 | number
+
+
+def EVIOCGABS(axis):
+    """ ioctl request of the struct input_absinfo of an axis """
+    return _ioc(2, 0x40 + axis, 24)
+
+
+EVIOCGNAME = _ioc(2, 0x06, 256)
+EVIOCGKEY = _ioc(2, 0x18, KEY_CNT // 8)
+EVIOCSCLOCKID = _ioc(1, 0xa0, 4)
+CLOCK_MONOTONIC = 1
+
+# the time stamps are on the monotonic clock, the control loop runs on `time.perf_counter`,
+# both count at the same rate, on Linux they are the same clock
+PERF_COUNTER_OFFSET = time.perf_counter() - time.monotonic()
+
+
+def encodeEvents(events):
+    """ bytes of (time, type, code, value) events, the format of `/dev/input/event*` and of event files """
+    return b"".join(struct.pack(EVENT_FORMAT, int(t), round(t % 1 * 1e6), type, code, value)
+                    for t, type, code, value in events)
+
+
+def findGamepads():
+    """ (name, event device path) of the joysticks and gamepads in /proc/bus/input/devices """
+    try:
+        with open("/proc/bus/input/devices", encoding="utf-8") as f:
+            blocks = f.read().split("\n\n")
+    except OSError:
+        return []
+
+    gamepads = []
+    for block in blocks:
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        name = lines.get("N", "").partition("=")[2].strip('"')
+        handlers = lines.get("H", "").partition("=")[2].split()
+        event = next((h for h in handlers if h.startswith("event")), None)
+        if event and any(h.startswith("js") for h in handlers):
+            gamepads.append((name, f"/dev/input/{event}"))
+
+    return gamepads
+
+
+class GamepadState:
+    """ Axes and buttons after the last complete report of the device """
+
+    def __init__(self, seq=0, time=None, received=None, axes=None, buttons=None, connected=False, name=""):
+        self.seq = seq                  # number of reports
+        self.time = time                # monotonic time stamp of the report by the kernel
+        self.received = received        # monotonic time the report was read
+        self.axes = axes if axes is not None else np.zeros(ABS_CNT, np.int32)
+        self.buttons = buttons if buttons is not None else np.zeros(KEY_CNT, np.uint8)
+        self.connected = connected
+        self.name = name
+
+    def pressed(self, code: int):
+        return bool(self.buttons[code])
+
+
+class GamepadPoller:
+    """ Reads a Linux evdev gamepad on its own thread
+
+    The events are read in bulk and parsed with NumPy. The axis events of
+    a read are coalesced, only the last value of each axis up to the last
+    SYN_REPORT counts, and the result is published as an immutable
+    `GamepadState` by one assignment, so the control loop picks up the
+    newest state on its tick without a lock. `demand` applies the
+    deadzone, the expo curve and the axis mapping to all axes at once.
+
+    The device is `gamepadDevice`, or the first joystick the kernel lists
+    if empty. `replay` feeds a recorded event file instead, such as one
+    taken with `cat /dev/input/event5 > dive.evdev`, so the whole input
+    path runs without hardware. The kernel time stamps are switched to the
+    monotonic clock, a replay stamps each report with the time it is due.
+    A replay replaces the device until it ends or `stopReplay` is called,
+    then the device is read again if the poller was started;
+    `gamepadReplayChanged` of `signalBus` tells the GUI. After the kernel
+    dropped events, the axes and buttons are read back from the device.
+    `demandInput` tells which report the last `demand` was made of, so the
+    control loop can trace a stick movement to the thrusters.
+    """
+
+    def __init__(self, mapping=GAMEPAD_MAPPING):
+        self.axisCodes = np.array(sorted({code for _, code, _ in mapping}), np.intp)
+        self.mapping = np.zeros((len(DOF_NAMES), len(self.axisCodes)))
+        for dof, code, sign in mapping:
+            self.mapping[DOF_NAMES.index(dof), np.searchsorted(self.axisCodes, code)] = sign
+
+        self.events = 0
+        self.reports = 0
+        self.dropped = 0
+        self.replayPath = None  # event file being replayed
+        self.stopEvent = threading.Event()
+        self._live = False      # read the device whenever no replay runs
+        self._state = GamepadState()
+        self._demandState = None
+        self._thread = None
+        self._pending = b""
+        self.setRanges({})
+
+    @staticmethod
+    def isSupported():
+        return sys.platform.startswith("linux") and fcntl is not None
+
+    @property
+    def state(self) -> GamepadState:
+        return self._state
+
+    def setRanges(self, ranges: dict):
+        """ (minimum, maximum) of the axes, by axis code """
+        minimum = np.array([ranges.get(c, HAT_RANGE if c in (ABS_HAT0X, ABS_HAT0Y) else DEFAULT_RANGE)[0]
+                            for c in self.axisCodes], np.float64)
+        maximum = np.array([ranges.get(c, HAT_RANGE if c in (ABS_HAT0X, ABS_HAT0Y) else DEFAULT_RANGE)[1]
+                            for c in self.axisCodes], np.float64)
+        # center and scale, one assignment so `demand` never mixes two ranges
+        self._ranges = ((minimum + maximum) / 2, 2 / np.maximum(maximum - minimum, 1))
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def isReplaying(self):
+        return self.replayPath is not None
+
+    def start(self):
+        """ read the device, after the replay if one runs """
+        self._live = True
+        if self.isRunning() or not self.isSupported():
+            return
+
+        self.__startThread(self._run)
+
+    def replay(self, path: str, speed=1.0, ranges=None):
+        """ feed a recorded event file at `speed` times real time, as fast as possible if None """
+        self.__stopThread()
+        self.setRanges(ranges or {})
+        self.replayPath = path
+        self.__startThread(lambda: self.__replayThenRun(path, speed))
+        signalBus.gamepadReplayChanged.emit(True)
+
+    def stopReplay(self):
+        """ stop the replay and go back to the device if the poller was started """
+        if not self.isReplaying():
+            return
+
+        self.__stopThread()
+        if self._live:
+            self.start()
+
+    def stop(self, timeout=1):
+        """ stop reading the device and any replay """
+        self._live = False
+        self.__stopThread(timeout)
+
+    def __stopThread(self, timeout=1):
+        self.stopEvent.set()
+        if self.isRunning() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def __startThread(self, target):
+        self.stopEvent.clear()
+        self._thread = threading.Thread(target=target, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def demand(self):
+        """ demand of each degree of freedom from -1 to 1, zero while no gamepad is connected """
+        state = self._demandState = self._state
+        if not state.connected:
+            return np.zeros(len(DOF_NAMES))
+
+        deadzone = cfg.get(cfg.gamepadDeadzone) / 100
+        expo = cfg.get(cfg.gamepadExpo) / 100
+        center, scale = self._ranges
+        x = (state.axes[self.axisCodes] - center) * scale
+        # deadzone and expo on the magnitude, np.clip costs more than all the rest on 6 values
+        magnitude = np.maximum(np.minimum(np.abs(x), 1) - deadzone, 0) / (1 - deadzone)
+        magnitude *= (1 - expo) + expo * magnitude * magnitude
+        return self.mapping @ np.copysign(magnitude, x)
+
+    def demandInput(self):
+        """ the report behind the last `demand`, None before the first report
+
+        :return: (report number, time stamp, time it was read), the times on the clock of `time.perf_counter`
+        """
+        state = self._demandState
+        if state is None or state.time is None or state.received is None:
+            return None
+
+        return state.seq, state.time + PERF_COUNTER_OFFSET, state.received + PERF_COUNTER_OFFSET
+
+    def feed(self, data: bytes, received=None, stamp=None):
+        """ parse the events of a read and publish the state after the last complete report
+
+        `stamp` replaces the time stamp of the events, such as those of an event file.
+        """
+        data = self._pending + data
+        count = len(data) // EVENT_SIZE
+        if count == 0:
+            self._pending = data
+            return
+
+        events = np.frombuffer(data, EVENT_DTYPE, count)
+        syn = events["type"] == EV_SYN
+        reports = np.flatnonzero(syn & (events["code"] == SYN_REPORT))
+        if not len(reports):
+            self._pending = data
+            return
+
+        # the events after the last report belong to the next one
+        end = reports[-1] + 1
+        self._pending = data[end * EVENT_SIZE:]
+        events, syn = events[:end], syn[:end]
+        self.events += end
+
+        if stamp is None:
+            last = events[-1]
+            stamp = float(last["sec"] + last["usec"] / 1e6)
+
+        # the kernel dropped events of a report with SYN_DROPPED, the rest of it is skipped
+        events = events[self.__keepMask(events, syn)]
+
+        state = self._state
+        axes, buttons = state.axes, state.buttons
+        for kind, target in ((EV_ABS, "axes"), (EV_KEY, "buttons")):
+            selected = events[events["type"] == kind]
+            if not len(selected):
+                continue
+
+            # the last value of each code wins
+            codes = selected["code"][::-1]
+            codes, first = np.unique(codes, return_index=True)
+            values = selected["value"][::-1][first]
+            valid = codes < (ABS_CNT if kind == EV_ABS else KEY_CNT)
+            if target == "axes":
+                axes = axes.copy()
+                axes[codes[valid]] = values[valid]
+            else:
+                buttons = buttons.copy()
+                buttons[codes[valid]] = values[valid] != 0
+
+        self.reports += len(reports)
+        self._state = GamepadState(state.seq + len(reports), stamp,
+                                   received if received is not None else time.monotonic(),
+                                   axes, buttons, True, state.name)
+
+    def __keepMask(self, events, syn):
+        """ the events which are not in a report with a SYN_DROPPED, such a report is incomplete """
+        dropped = syn & (events["code"] == SYN_DROPPED)
+        if not dropped.any():
+            return slice(None)
+
+        keep = np.ones(len(events), bool)
+        start, dropping = 0, False
+        for i in np.flatnonzero(syn):
+            if events["code"][i] == SYN_DROPPED:
+                self.dropped += 1
+                dropping = True
+            elif events["code"][i] == SYN_REPORT:
+                keep[start:i + 1] = not dropping
+                start, dropping = i + 1, False
+
+        return keep
+
+    def disconnect(self):
+        self._pending = b""
+        self._state = GamepadState(self._state.seq, self._state.time, self._state.received)
+
+    def __replayThenRun(self, path, speed):
+        try:
+            self._replay(path, speed)
+        finally:
+            self.replayPath = None
+            signalBus.gamepadReplayChanged.emit(False)
+
+        # a replay which ran to its end hands over to the device
+        if self._live and not self.stopEvent.is_set() and self.isSupported():
+            self._run()
+
+    def _run(self):
+        try:
+            while not self.stopEvent.is_set():
+                path = cfg.get(cfg.gamepadDevice) or next((p for _, p in findGamepads()), None)
+                if not path:
+                    self.stopEvent.wait(1)
+                    continue
+
+                try:
+                    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                except OSError:
+                    self.stopEvent.wait(1)
+                    continue
+
+                try:
+                    self.__configure(fd)
+                    self.__read(fd)
+                except OSError:
+                    self.stopEvent.wait(1)
+                finally:
+                    os.close(fd)
+                    self.disconnect()
+        finally:
+            self.disconnect()
+
+    def __configure(self, fd):
+        """ monotonic time stamps, the ranges of the axes and the initial state """
+        fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack("i", CLOCK_MONOTONIC))
+        name = fcntl.ioctl(fd, EVIOCGNAME, bytes(256)).split(b"\0", 1)[0].decode(errors="replace")
+
+        ranges, axes, buttons = self.__queryState(fd, np.zeros(ABS_CNT, np.int32))
+        self.setRanges(ranges)
+        self._pending = b""
+        self._state = GamepadState(0, None, time.monotonic(), axes, buttons, True, name)
+
+    def __queryState(self, fd, axes):
+        """ (ranges, axes, buttons) read from the device, an axis the device lacks keeps its value in `axes` """
+        ranges, axes = {}, axes.copy()
+        for code in self.axisCodes:
+            try:
+                value, minimum, maximum, _, _, _ = struct.unpack(
+                    "6i", fcntl.ioctl(fd, EVIOCGABS(code), bytes(24)))
+            except OSError:     # the device has no such axis
+                continue
+
+            ranges[int(code)] = (minimum, maximum)
+            axes[code] = value
+
+        keys = fcntl.ioctl(fd, EVIOCGKEY, bytes(KEY_CNT // 8))
+        buttons = np.unpackbits(np.frombuffer(keys, np.uint8), bitorder="little")
+        return ranges, axes, buttons
+
+    def __resync(self, fd):
+        """ the state of the device after the kernel dropped events, which the reports no longer carry """
+        state = self._state
+        _, axes, buttons = self.__queryState(fd, state.axes)
+        self._state = GamepadState(state.seq, state.time, time.monotonic(), axes, buttons, True, state.name)
+
+    def __read(self, fd):
+        while not self.stopEvent.is_set():
+            readable, _, _ = select.select([fd], [], [], 0.2)
+            if not readable:
+                continue
+
+            data = os.read(fd, EVENT_SIZE * 256)
+            if not data:
+                raise OSError("Gamepad disconnected")
+
+            dropped = self.dropped
+            self.feed(data)
+            if self.dropped != dropped:
+                self.__resync(fd)
+
+    def _replay(self, path, speed):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        count = len(data) // EVENT_SIZE
+        events = np.frombuffer(data, EVENT_DTYPE, count)
+        reports = np.flatnonzero((events["type"] == EV_SYN) & (events["code"] == SYN_REPORT))
+        stamps = events["sec"][reports] + events["usec"][reports] / 1e6
+
+        self._pending = b""
+        self._state = GamepadState(connected=True, name=os.path.basename(path))
+        try:
+            start, begin = time.monotonic(), 0
+            for i, end in enumerate(reports + 1):
+                if self.stopEvent.is_set():
+                    return
+
+                due = start + (stamps[i] - stamps[0]) / speed if speed else time.monotonic()
+                delay = due - time.monotonic()
+                if delay > 0 and self.stopEvent.wait(delay):
+                    return
+
+                self.feed(data[begin * EVENT_SIZE:end * EVENT_SIZE], stamp=due)
+                begin = end
+        finally:
+            self.disconnect()
+
+
+gamepadPoller = GamepadPoller()
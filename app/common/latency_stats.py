@@ -0,0 +1,62 @@
+# coding: utf-8
+import math
+import threading
+from collections import deque
+
+
+# upper edges of the histogram buckets in milliseconds, the last bucket is open
+HISTOGRAM_EDGES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+def percentile(values, q):
+    """ nearest-rank percentile of an unsorted sequence, None if empty """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class LatencyHistory:
+    """ Rolling history of the last N latency samples of each stage """
+
+    def __init__(self, stages, maxlen=100):
+        self.stages = tuple(stages)
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=maxlen) for stage in self.stages}
+
+    def add(self, sample: dict):
+        """ add a sample, `sample` maps stage name to seconds """
+        with self._lock:
+            for stage, value in sample.items():
+                if stage in self._samples and value is not None:
+                    self._samples[stage].append(value)
+
+    def values(self, stage):
+        with self._lock:
+            return list(self._samples[stage])
+
+    def count(self, stage):
+        return len(self._samples[stage])
+
+    def percentiles(self, stage, qs=(50, 95, 99)):
+        """ percentiles of a stage in seconds """
+        values = self.values(stage)
+        return tuple(percentile(values, q) for q in qs)
+
+    def histogram(self, stage, edges=HISTOGRAM_EDGES):
+        """ sample counts of a stage per bucket, buckets are bounded by `edges` in ms """
+        counts = [0] * (len(edges) + 1)
+        for v in self.values(stage):
+            ms = v * 1000
+            i = next((i for i, e in enumerate(edges) if ms <= e), len(edges))
+            counts[i] += 1
+
+        return counts
+
+    def clear(self):
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
@@ -0,0 +1,162 @@
+# coding: utf-8
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from paramiko import SSHException
+
+from .async_engine import asyncEngine
+from .config import cfg
+from .signal_bus import signalBus
+from .ssh_session import sshSessionManager
+
+
+class LinkQuality:
+    """ Link statistics over a sliding time window, all times in milliseconds """
+
+    def __init__(self, connected=False, sent=0, lost=0, rtt=None, rttMin=None,
+                 rttMean=None, rttMax=None, jitter=None):
+        self.connected = connected
+        self.sent = sent
+        self.lost = lost
+        self.rtt = rtt
+        self.rttMin = rttMin
+        self.rttMean = rttMean
+        self.rttMax = rttMax
+        self.jitter = jitter
+
+    @property
+    def loss(self):
+        """ ratio of lost heartbeats in the window """
+        return self.lost / self.sent if self.sent else 0
+
+    def __str__(self):
+        if not self.connected:
+            return "No Link"
+
+        if self.rtt is None:
+            return f"Loss {self.loss:.0%}"
+
+        return f"RTT {self.rtt:.1f} ms (min {self.rttMin:.1f} / avg {self.rttMean:.1f} / max {self.rttMax:.1f}), " \
+               f"Jitter {self.jitter:.1f} ms, Loss {self.loss:.0%}"
+
+
+class LinkMonitor:
+    """ Heartbeat over the pooled SSH transport
+
+    Keepalive requests are scheduled at `heartbeatRate` on the async engine,
+    the round trips run on a thread of their own rather than in the engine's
+    worker pool, where SFTP transfers and checks could queue them, and the
+    statistics are published through `signalBus.linkQualityUpdated` at most
+    every `publishInterval`. Only one heartbeat is in flight at a time, it
+    is timed from the moment the request is actually sent, and one which
+    gets no reply within `timeout` is counted as lost.
+    """
+
+    def __init__(self, window=10, timeout=0.5, publishInterval=0.5):
+        self.window = window
+        self.timeout = timeout
+        self.publishInterval = publishInterval
+        self.quality = LinkQuality()
+        self._samples = deque()     # (time, rtt or None)
+        self._future = None
+        self._inFlight = None
+        self._sentAt = 0
+        self._timedOut = False
+        self._executor = None
+
+    def isRunning(self):
+        return self._future is not None and not self._future.done()
+
+    def start(self):
+        if not self.isRunning():
+            # a fresh thread, the one of a stopped monitor may still be blocked on its last echo
+            self._executor = ThreadPoolExecutor(1, "LinkHeartbeat")
+            self._future = asyncEngine.submit(self._run())
+
+    def stop(self):
+        if self.isRunning():
+            self._future.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        nextBeat = lastPublish = loop.time()
+        while True:
+            now = loop.time()
+            if cfg.get(cfg.heartbeatEnabled):
+                self._tick(now)
+
+            if now - lastPublish >= self.publishInterval:
+                lastPublish = now
+                self._publish(now)
+
+            nextBeat += 1 / cfg.get(cfg.heartbeatRate)
+            if nextBeat < now:
+                nextBeat = now
+
+            await asyncio.sleep(nextBeat - loop.time())
+
+    def stalledFor(self, now):
+        """ seconds the heartbeat in flight has been waiting for its reply, 0 if none is in flight """
+        return now - self._sentAt if self._inFlight is not None else 0
+
+    def _tick(self, now):
+        if self._inFlight is not None:
+            if not self._timedOut and now - self._sentAt > self.timeout:
+                self._timedOut = True
+                self._samples.append((now, None))
+
+            return
+
+        session = sshSessionManager.current()
+        if session is None:
+            return
+
+        self._sentAt = now
+        self._inFlight = asyncio.get_running_loop().run_in_executor(self._executor, self.echo, session.transport)
+        self._inFlight.add_done_callback(self.__onEcho)
+
+    def echo(self, transport):
+        """ round trip a keepalive request, blocks until the reply arrives """
+        # the clock of the event loop is the monotonic clock
+        self._sentAt = time.monotonic()
+        start = time.perf_counter()
+        transport.global_request("keepalive@openssh.com", wait=True)
+        if not transport.is_active():
+            raise SSHException("SSH transport closed")
+
+        return time.perf_counter() - start
+
+    def __onEcho(self, future):
+        if not self._timedOut:
+            rtt = None if future.cancelled() or future.exception() else future.result()
+            self._samples.append((asyncio.get_running_loop().time(), rtt))
+
+        self._inFlight = None
+        self._timedOut = False
+
+    def _publish(self, now):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+        rtts = [rtt * 1000 for _, rtt in self._samples if rtt is not None]
+        quality = LinkQuality(
+            connected=sshSessionManager.current() is not None,
+            sent=len(self._samples),
+            lost=len(self._samples) - len(rtts)
+        )
+        if rtts:
+            quality.rtt = rtts[-1]
+            quality.rttMin = min(rtts)
+            quality.rttMax = max(rtts)
+            quality.rttMean = sum(rtts) / len(rtts)
+            diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+            quality.jitter = sum(diffs) / len(diffs) if diffs else 0
+
+        self.quality = quality
+        signalBus.linkQualityUpdated.emit(quality)
+
+
+linkMonitor = LinkMonitor()
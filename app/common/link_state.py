@@ -0,0 +1,176 @@
+# coding: utf-8
+import asyncio
+import random
+from enum import Enum
+
+from paramiko import AuthenticationException
+
+from .async_engine import asyncEngine
+from .link_monitor import linkMonitor
+from .signal_bus import signalBus
+from .ssh_session import connectionItems, sshSessionManager
+
+
+class LinkState(Enum):
+    """ Link state enumeration """
+
+    DISCONNECTED = "Disconnected"
+    CONNECTING = "Connecting"
+    AUTHENTICATING = "Authenticating"
+    UP = "Up"
+    DEGRADED = "Degraded"
+    RECONNECTING = "Reconnecting"
+
+
+# allowed transitions of the link state machine
+TRANSITIONS = {
+    LinkState.DISCONNECTED: {LinkState.CONNECTING},
+    LinkState.CONNECTING: {LinkState.AUTHENTICATING, LinkState.RECONNECTING, LinkState.DISCONNECTED},
+    LinkState.AUTHENTICATING: {LinkState.UP, LinkState.RECONNECTING, LinkState.DISCONNECTED},
+    LinkState.UP: {LinkState.DEGRADED, LinkState.RECONNECTING, LinkState.DISCONNECTED},
+    LinkState.DEGRADED: {LinkState.UP, LinkState.RECONNECTING, LinkState.DISCONNECTED},
+    LinkState.RECONNECTING: {LinkState.CONNECTING, LinkState.DISCONNECTED},
+}
+
+
+class LinkStateMachine:
+    """ Supervises the ROV link and reconnects it automatically
+
+    The machine runs on the async engine. While the link is up it watches
+    the pooled SSH session and the heartbeat of `linkMonitor`, a dead
+    transport or a stalled heartbeat starts a reconnect. Failed attempts are
+    retried with exponential backoff plus jitter until `budget` attempts are
+    used up. Every transition is published through `signalBus.linkStateChanged`.
+    """
+
+    def __init__(self, baseDelay=0.05, maxDelay=5, budget=10, deadAfter=0.5,
+                 degradedLoss=0.2, degradedRtt=200, interval=0.02):
+        """
+        Parameters
+        ----------
+        baseDelay, maxDelay: float
+            first and largest delay in seconds between reconnect attempts
+
+        budget: int
+            number of failed attempts before the machine gives up and disconnects
+
+        deadAfter: float
+            seconds without heartbeat reply before the link is considered dead, well above the
+            round trip of a degraded link so that a slow tether is not torn down
+
+        degradedLoss, degradedRtt: float
+            heartbeat loss ratio and mean RTT in milliseconds above which the link is degraded
+
+        interval: float
+            seconds between two health checks while the link is up
+        """
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.budget = budget
+        self.deadAfter = deadAfter
+        self.degradedLoss = degradedLoss
+        self.degradedRtt = degradedRtt
+        self.interval = interval
+        self.state = LinkState.DISCONNECTED
+        self.attempts = 0
+        self._future = None
+        self._wakeup = None     # type: asyncio.Event
+
+        for item in connectionItems():
+            item.valueChanged.connect(self.reconnect)
+
+    def isRunning(self):
+        return self._future is not None and not self._future.done()
+
+    def start(self):
+        """ connect and keep the link up """
+        if not self.isRunning():
+            self._future = asyncEngine.submit(self._run())
+
+    def stop(self):
+        """ stop supervising, the link is left disconnected """
+        if self.isRunning():
+            self._future.cancel()
+
+    def backoff(self, attempt: int):
+        """ delay before the reconnect attempt, exponential with equal jitter """
+        delay = min(self.maxDelay, self.baseDelay * 2 ** max(attempt - 1, 0))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _transition(self, state: LinkState):
+        if state == self.state or state not in TRANSITIONS[self.state]:
+            return
+
+        old, self.state = self.state, state
+        signalBus.linkStateChanged.emit(old, state)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.attempts = 0
+        try:
+            self._transition(LinkState.CONNECTING)
+            while True:
+                if self.state == LinkState.DISCONNECTED:
+                    # wait for a config change before trying again
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    self.attempts = 0
+                    self._transition(LinkState.CONNECTING)
+                elif self.state in (LinkState.CONNECTING, LinkState.RECONNECTING):
+                    await self._connect(loop)
+                else:
+                    self._supervise(loop.time())
+                    await asyncio.sleep(self.interval)
+        finally:
+            self._transition(LinkState.DISCONNECTED)
+
+    async def _connect(self, loop):
+        if self.state == LinkState.RECONNECTING:
+            await asyncio.sleep(self.backoff(self.attempts))
+            self._transition(LinkState.CONNECTING)
+
+        # this attempt already uses the latest config
+        self._wakeup.clear()
+
+        def onStage(stage):
+            if stage == "auth":
+                loop.call_soon_threadsafe(self._transition, LinkState.AUTHENTICATING)
+
+        try:
+            session, reused = await asyncEngine.runBlocking(lambda: sshSessionManager.session(5, onStage))
+        except AuthenticationException:
+            # retrying with the same password will not help
+            self._transition(LinkState.DISCONNECTED)
+            return
+        except Exception:
+            self.attempts += 1
+            self._transition(LinkState.RECONNECTING if self.attempts < self.budget else LinkState.DISCONNECTED)
+            return
+
+        if reused:
+            self._transition(LinkState.AUTHENTICATING)
+
+        self.attempts = 0
+        self._transition(LinkState.UP)
+
+    def _supervise(self, now):
+        """ check the health of the link which is up """
+        if sshSessionManager.current() is None or linkMonitor.stalledFor(now) > self.deadAfter:
+            sshSessionManager.invalidate()
+            self._transition(LinkState.RECONNECTING)
+            return
+
+        quality = linkMonitor.quality
+        degraded = quality.loss > self.degradedLoss or (
+            quality.rttMean is not None and quality.rttMean > self.degradedRtt)
+        self._transition(LinkState.DEGRADED if degraded else LinkState.UP)
+
+    def reconnect(self, *args):
+        """ reset the reconnect budget and wake up a machine which gave up """
+        self.attempts = 0
+        if self._wakeup is not None:
+            asyncEngine.call(self._wakeup.set)
+
+
+linkStateMachine = LinkStateMachine()
@@ -0,0 +1,241 @@
+# coding: utf-8
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .config import cfg
+
+
+TIME_COLUMN = "t"
+META_FILE = "meta.json"
+INDEX_FILE = "index.f8"
+
+
+class ColumnWriter:
+    """ Append-only column file written through a memory map of its current chunk
+
+    The file grows by `chunkSize` values at a time and only the chunk being
+    written is mapped, so memory use stays flat however long the dive is.
+    """
+
+    def __init__(self, path: str, dtype, chunkSize: int):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunkSize = chunkSize
+        self.count = 0
+        self._chunk = None      # type: np.memmap
+        self._file = open(path, "wb+")
+
+    def append(self, values):
+        values = np.asarray(values, self.dtype)
+        while len(values):
+            offset = self.count % self.chunkSize
+            if offset == 0 or self._chunk is None:
+                self.__mapChunk(self.count // self.chunkSize)
+
+            n = min(len(values), self.chunkSize - offset)
+            self._chunk[offset:offset + n] = values[:n]
+            values = values[n:]
+            self.count += n
+
+    def __mapChunk(self, index: int):
+        if self._chunk is not None:
+            self._chunk.flush()
+
+        chunkBytes = self.chunkSize * self.dtype.itemsize
+        self._file.truncate((index + 1) * chunkBytes)
+        self._chunk = np.memmap(self._file, self.dtype, "r+", index * chunkBytes, (self.chunkSize,))
+
+    def flush(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+
+    def close(self):
+        """ unmap the chunk and cut the file to the written values """
+        self.flush()
+        self._chunk = None
+        self._file.truncate(self.count * self.dtype.itemsize)
+        self._file.close()
+
+
+class DiveRecording:
+    """ One dive on disk, a folder with one column file per channel
+
+    The time stamps are stored in `t.f8` and each channel in `<name>.f4`.
+    `index.f8` holds the first time stamp of every chunk, a sparse index
+    for seeking. `meta.json` describes the columns and the number of
+    records which are safely on disk. A channel which appears late starts
+    at the record number stored as its `start`.
+    """
+
+    def __init__(self, folder: str, chunkSize=65536):
+        self.folder = folder
+        self.chunkSize = chunkSize
+        self.count = 0
+        self.startedAt = datetime.now().isoformat(timespec="seconds")
+        self.columns = {}       # type: dict[str, ColumnWriter]
+        self.starts = {}        # record number of the first value of each channel
+
+        os.makedirs(folder, exist_ok=True)
+        self.index = open(os.path.join(folder, INDEX_FILE), "wb")
+        self.__addColumn(TIME_COLUMN, np.float64)
+
+    def __addColumn(self, name: str, dtype):
+        suffix = "f8" if np.dtype(dtype) == np.float64 else "f4"
+        self.columns[name] = ColumnWriter(
+            os.path.join(self.folder, f"{name}.{suffix}"), dtype, self.chunkSize)
+        self.starts[name] = self.count
+
+    def append(self, times, columns: dict):
+        n = len(times)
+        if n == 0:
+            return
+
+        for name in columns.keys() - self.columns.keys():
+            self.__addColumn(name, np.float32)
+
+        # first time stamp of every chunk which starts in this batch
+        first = -self.count % self.chunkSize
+        self.index.write(np.asarray(times[first::self.chunkSize], np.float64).tobytes())
+
+        self.columns[TIME_COLUMN].append(times)
+        nan = None
+        for name, column in self.columns.items():
+            if name == TIME_COLUMN:
+                continue
+
+            if name in columns:
+                column.append(columns[name])
+            else:
+                nan = np.full(n, np.nan, np.float32) if nan is None else nan
+                column.append(nan)
+
+        self.count += n
+
+    def sync(self):
+        """ flush the maps and the index to disk, then publish the record count in the meta file """
+        for column in self.columns.values():
+            column.flush()
+
+        self.index.flush()
+        os.fsync(self.index.fileno())
+        self.__writeMeta()
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+
+        self.index.close()
+        self.__writeMeta()
+
+    def __writeMeta(self):
+        meta = {
+            "version": 1,
+            "startedAt": self.startedAt,
+            "count": self.count,
+            "chunkSize": self.chunkSize,
+            "columns": {
+                name: {"file": os.path.basename(c.path), "dtype": c.dtype.str, "start": self.starts[name]}
+                for name, c in self.columns.items()
+            },
+        }
+        path = os.path.join(self.folder, META_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(path + ".tmp", path)
+
+
+class DiveRecorder:
+    """ Records the telemetry of a telemetry source on a writer thread
+
+    `write` only queues a batch, so the source thread is never held up by
+    the disk. The writer thread appends the batches to the current
+    `DiveRecording` and syncs it every `recordingSyncInterval` seconds. A
+    dive folder is created in `recordingFolder` when the first batch after
+    `start` arrives.
+    """
+
+    def __init__(self, chunkSize=65536):
+        self.chunkSize = chunkSize
+        self.recording = None   # type: DiveRecording
+        self.records = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._running = False
+
+    def isRunning(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="DiveRecorder", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """ stop recording, the batches already queued are written first """
+        if not self._running:
+            return
+
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def write(self, times, columns: dict):
+        """ queue a batch for recording, called on the source's thread """
+        if self._running:
+            self._queue.put((times, columns))
+
+    def backlog(self):
+        """ number of queued batches """
+        return self._queue.qsize()
+
+    def _run(self):
+        lastSync = time.monotonic()
+        try:
+            while True:
+                # nothing to sync until the first batch opened a recording
+                timeout = None
+                if self.recording is not None:
+                    timeout = max(lastSync + cfg.get(cfg.recordingSyncInterval) - time.monotonic(), 0)
+
+                try:
+                    batch = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    batch = ()
+
+                if batch is None:
+                    break
+
+                if batch:
+                    if self.recording is None:
+                        self.recording = DiveRecording(self.newFolder(), self.chunkSize)
+                        lastSync = time.monotonic()
+
+                    self.recording.append(*batch)
+                    self.records += len(batch[0])
+
+                if self.recording and time.monotonic() - lastSync >= cfg.get(cfg.recordingSyncInterval):
+                    self.recording.sync()
+                    lastSync = time.monotonic()
+        finally:
+            if self.recording:
+                self.recording.close()
+                self.recording = None
+
+    @staticmethod
+    def newFolder():
+        return os.path.join(cfg.get(cfg.recordingFolder), datetime.now().strftime("dive-%Y%m%d-%H%M%S"))
+
+
+diveRecorder = DiveRecorder()
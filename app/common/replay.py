@@ -0,0 +1,227 @@
+# coding: utf-8
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .recorder import INDEX_FILE, META_FILE, TIME_COLUMN
+from .signal_bus import signalBus
+from .telemetry import TelemetrySource, TelemetryStore
+
+
+# replay speeds the engine accepts
+MIN_SPEED = 0.25
+MAX_SPEED = 32
+
+
+class DiveReader:
+    """ Read access to a dive recorded by `DiveRecording`
+
+    The column files are memory-mapped read-only and nothing is decoded
+    when the dive is opened, only the records asked for are read. Seeking
+    binary-searches the sparse chunk index first and then the time stamps
+    of a single chunk.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        with open(os.path.join(folder, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.count = meta["count"]
+        self.chunkSize = meta["chunkSize"]
+        self.startedAt = meta.get("startedAt")
+        self.starts = {}
+        self.columns = {}   # type: dict[str, np.ndarray]
+        for name, column in meta["columns"].items():
+            start = column["start"]
+            self.starts[name] = start
+            self.columns[name] = self.__map(os.path.join(folder, column["file"]), column["dtype"], self.count - start)
+
+        # chunks written after the last sync of a dive which was cut short are ignored
+        chunks = -(-self.count // self.chunkSize)
+        self.index = np.fromfile(os.path.join(folder, INDEX_FILE), np.float64, chunks)
+
+    @staticmethod
+    def __map(path: str, dtype, count: int):
+        if count <= 0:
+            return np.empty(0, dtype)
+
+        return np.memmap(path, dtype, "r", shape=(count,))
+
+    @property
+    def times(self):
+        return self.columns[TIME_COLUMN]
+
+    @property
+    def channels(self):
+        return [name for name in self.columns if name != TIME_COLUMN]
+
+    @property
+    def startTime(self):
+        return float(self.times[0]) if self.count else 0.0
+
+    @property
+    def endTime(self):
+        return float(self.times[self.count - 1]) if self.count else 0.0
+
+    def locate(self, t: float):
+        """ number of the first record at or after time `t` """
+        chunk = max(int(np.searchsorted(self.index, t, "right")) - 1, 0)
+        start = chunk * self.chunkSize
+        stop = min(start + self.chunkSize, self.count)
+        return start + int(np.searchsorted(self.times[start:stop], t, "left"))
+
+    def read(self, start: int, stop: int):
+        """ (times, columns) of the records `start` to `stop`, a channel which starts later is padded with NaN """
+        start, stop = max(start, 0), min(stop, self.count)
+        if stop <= start:
+            return np.empty(0), {}
+
+        times = np.array(self.times[start:stop])
+        columns = {}
+        for name in self.channels:
+            first = self.starts[name]
+            if stop <= first:
+                continue
+
+            values = self.columns[name][max(start - first, 0):stop - first]
+            if start < first:
+                values = np.concatenate((np.full(first - start, np.nan, values.dtype), values))
+
+            columns[name] = np.array(values)
+
+        return times, columns
+
+    def window(self, t0: float, t1: float):
+        """ (times, columns) of the records between the times `t0` and `t1` """
+        return self.read(self.locate(t0), self.locate(t1))
+
+
+class ReplaySource(TelemetrySource):
+    """ Plays a recorded dive into a store, behind the same interface as the live source
+
+    A timer thread advances the replay clock by `speed` times the elapsed
+    time and appends the records it passes. `seek` loads the
+    `historySeconds` before the new position, so the views have the same
+    history they would have live, and nothing else is read. The thread
+    stops by itself at the end of the recording, `replayStateChanged` of
+    `signalBus` tells the GUI whenever the replay starts or stops.
+    """
+
+    def __init__(self, store: TelemetryStore, tick=0.02, historySeconds=30):
+        super().__init__(store, "replay")
+        self.tick = tick
+        self.historySeconds = historySeconds
+        self.reader = None      # type: DiveReader
+        self.speed = 1.0
+        self.paused = False
+        self._position = 0.0    # replay clock in recording time
+        self._cursor = 0        # first record not yet played
+        self._lock = threading.Lock()
+
+    def open(self, folder: str):
+        """ open a recorded dive and seek to its start """
+        reader = DiveReader(folder)
+        with self._lock:
+            self.reader = reader
+
+        self.seek(reader.startTime)
+        signalBus.replayStateChanged.emit(self.isRunning())
+        return reader
+
+    def close(self):
+        """ stop the replay and release the recorded dive """
+        self.stop()
+        with self._lock:
+            self.reader = None
+            self._position = 0.0
+            self._cursor = 0
+            self.store.clear()
+
+        signalBus.replayStateChanged.emit(False)
+
+    def isOpen(self):
+        return self.reader is not None
+
+    def isFinished(self):
+        """ whether every record of the open dive has been played """
+        reader = self.reader
+        return reader is not None and self._cursor >= reader.count
+
+    def start(self):
+        """ play the open dive from the current position, from its start if it was played to the end """
+        if self.reader is None or self.isRunning():
+            return
+
+        if self.isFinished():
+            self.seek(self.reader.startTime)
+
+        super().start()
+        signalBus.replayStateChanged.emit(True)
+
+    def setSpeed(self, speed: float):
+        self.speed = min(max(speed, MIN_SPEED), MAX_SPEED)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    @property
+    def position(self):
+        return self._position
+
+    def seek(self, t: float):
+        """ jump to time `t` of the recording """
+        with self._lock:
+            reader = self.reader
+            if reader is None:
+                return
+
+            t = min(max(t, reader.startTime), reader.endTime)
+            self._position = t
+            self._cursor = reader.locate(t)
+            times, columns = reader.read(reader.locate(t - self.historySeconds), self._cursor)
+            self.store.clear()
+            self.append(times, columns)
+
+        self.publish(force=True)
+
+    def _run(self):
+        try:
+            self.__play()
+        finally:
+            self.publish(force=True)
+            signalBus.replayStateChanged.emit(False)
+
+    def __play(self):
+        last = time.monotonic()
+        while not self.stopEvent.wait(self.tick):
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            if self.paused:
+                self.publish()
+                continue
+
+            with self._lock:
+                reader = self.reader
+                if reader is None or self._cursor >= reader.count:
+                    return
+
+                self._position = min(self._position + elapsed * self.speed, reader.endTime)
+                # the last record is played once the clock reaches it
+                stop = reader.count if self._position >= reader.endTime else reader.locate(self._position)
+
+                times, columns = reader.read(self._cursor, stop)
+                self._cursor = stop
+                if len(times):
+                    self.append(times, columns)
+
+            self.publish()
+
+
+replaySource = ReplaySource(TelemetryStore())
@@ -0,0 +1,64 @@
+# coding: utf-8
+import numpy as np
+
+
+class RingBuffer:
+    """ Preallocated NumPy buffer which keeps the latest `capacity` samples """
+
+    def __init__(self, capacity: int, dtype=np.float64, fill=np.nan):
+        self.capacity = capacity
+        self.data = np.full(capacity, fill, dtype)
+        self.total = 0      # number of samples ever appended
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, values):
+        """ append a batch of samples, the oldest ones are overwritten """
+        values = np.asarray(values, self.data.dtype)
+        n = len(values)
+        if n >= self.capacity:
+            values = values[-self.capacity:]
+
+        start = (self.total + n - len(values)) % self.capacity
+        end = start + len(values)
+        if end <= self.capacity:
+            self.data[start:end] = values
+        else:
+            split = self.capacity - start
+            self.data[start:] = values[:split]
+            self.data[:end - self.capacity] = values[split:]
+
+        self.total += n
+
+    def latest(self, n=None):
+        """ copy of the latest `n` samples in order, all samples if n is None """
+        n = len(self) if n is None else min(n, len(self))
+        if n == 0:
+            return self.data[:0].copy()
+
+        end = self.total % self.capacity
+        start = (end - n) % self.capacity
+        if start < end:
+            return self.data[start:end].copy()
+
+        return np.concatenate((self.data[start:], self.data[:end]))
+
+    def searchsorted(self, value, side="left"):
+        """ position of `value` among the samples in order, like `np.searchsorted`, without copying
+
+        The samples must be sorted, such as time stamps.
+        """
+        n = len(self)
+        end = self.total % self.capacity
+        start = (end - n) % self.capacity
+        older = self.data[start:] if n and start >= end else self.data[start:end]
+        i = int(np.searchsorted(older, value, side))
+        if i < len(older) or len(older) == n:
+            return i
+
+        return len(older) + int(np.searchsorted(self.data[:end], value, side))
+
+    def clear(self):
+        self.data.fill(np.nan if self.data.dtype.kind == "f" else 0)
+        self.total = 0
@@ -0,0 +1,276 @@
+# coding: utf-8
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import stat
+import threading
+from concurrent.futures import CancelledError
+from typing import List, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .async_engine import asyncEngine
+from .ssh_channels import channelMultiplexer
+from .ssh_session import sshSessionManager
+
+
+class TransferCancelled(Exception):
+    """ Transfer cancelled by user """
+
+
+class TransferPlan:
+    """ Blocks of a remote file and the ones already on disk
+
+    The plan is saved next to the partial file, so an interrupted pull only
+    fetches the missing blocks next time, as long as the remote file is unchanged.
+    """
+
+    def __init__(self, remotePath: str, localPath: str, size: int, mtime: int, blockSize: int):
+        self.remotePath = remotePath
+        self.localPath = localPath
+        self.size = size
+        self.mtime = mtime
+        self.blockSize = blockSize
+        self.done = set()
+        self._lock = threading.Lock()
+
+    @property
+    def partPath(self):
+        return self.localPath + ".part"
+
+    @property
+    def planPath(self):
+        return self.localPath + ".part.json"
+
+    @property
+    def blockCount(self):
+        return max((self.size + self.blockSize - 1) // self.blockSize, 1)
+
+    def blockRange(self, index: int):
+        offset = index * self.blockSize
+        return offset, min(self.blockSize, self.size - offset)
+
+    def pending(self):
+        return [i for i in range(self.blockCount) if i not in self.done]
+
+    def doneBytes(self):
+        return sum(self.blockRange(i)[1] for i in self.done)
+
+    def markDone(self, index: int):
+        with self._lock:
+            self.done.add(index)
+            self.save()
+
+    def load(self):
+        """ restore the finished blocks of an earlier attempt """
+        if not (os.path.exists(self.planPath) and os.path.exists(self.partPath)):
+            return
+
+        try:
+            with open(self.planPath, encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if (plan.get("size"), plan.get("mtime"), plan.get("blockSize")) == (self.size, self.mtime, self.blockSize):
+            self.done = set(plan.get("done", []))
+
+    def save(self):
+        with open(self.planPath, "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "mtime": self.mtime, "blockSize": self.blockSize,
+                       "done": sorted(self.done)}, f)
+
+
+def localSha256(path: str, bufferSize=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(bufferSize), b""):
+            h.update(data)
+
+    return h.hexdigest()
+
+
+def remoteSha256(path: str, size=0, timeout=30, minRate=10 * 1024 * 1024):
+    """ sha256 of a remote file computed by `sha256sum` on the ROV, None if unavailable
+
+    `sha256sum` prints nothing until it has read the whole file, so the
+    timeout grows by a second for every `minRate` bytes of `size`, the
+    slowest the ROV's SD card and ARM core hash.
+    """
+    channel = sshSessionManager.openChannel(timeout)
+    try:
+        channel.settimeout(timeout + size / minRate)
+        channel.exec_command("sha256sum -- " + shlex.quote(path))
+        output = b"".join(iter(lambda: channel.recv(4096), b""))
+        if channel.recv_exit_status() != 0 or not output:
+            return None
+
+        return output.split()[0].decode().lower()
+    finally:
+        channel.close()
+
+
+class SFTPTransferEngine(QObject):
+    """ Pipelined, parallel SFTP downloads
+
+    Each file is split into blocks which are pulled by `streams` workers,
+    every worker has its own sftp channel and keeps `requestSize` read
+    requests in flight per block. Blocks already on disk are skipped, and
+    finished files are verified against `sha256sum` on the ROV.
+    """
+
+    progressChanged = pyqtSignal(int, int)      # transferred bytes, total bytes
+    fileStarted = pyqtSignal(str)               # remote path
+    fileFinished = pyqtSignal(str, str)         # remote path, status message
+    finished = pyqtSignal(bool)                 # True if every file succeeded
+
+    def __init__(self, streams=4, blockSize=4 * 1024 * 1024, requestSize=32 * 1024, verify=True, parent=None):
+        super().__init__(parent=parent)
+        self.streams = streams
+        self.blockSize = blockSize
+        self.requestSize = requestSize
+        self.verify = verify
+        self._future = None
+        self._cancelEvent = threading.Event()
+
+    def isRunning(self):
+        return self._future is not None and not self._future.done()
+
+    def pullFolder(self, remoteDir: str, localDir: str):
+        """ pull every regular file of a remote folder """
+        self.__start(self._pullFolder(remoteDir, localDir))
+
+    def pull(self, files: List[Tuple[str, str]]):
+        """ pull a list of `(remotePath, localPath)` """
+        self.__start(self._pullFiles(files))
+
+    def cancel(self):
+        if self.isRunning():
+            self._cancelEvent.set()
+
+    def __start(self, coro):
+        if self.isRunning():
+            coro.close()
+            return
+
+        self._cancelEvent.clear()
+        self._future = asyncEngine.submit(coro)
+        self._future.add_done_callback(self.__onDone)
+
+    async def _pullFolder(self, remoteDir: str, localDir: str):
+        sftp = await asyncEngine.runBlocking(channelMultiplexer.sftp)
+        attrs = await asyncEngine.runBlocking(sftp.listdir_attr, remoteDir)
+        files = [(remoteDir.rstrip("/") + "/" + a.filename, os.path.join(localDir, a.filename))
+                 for a in attrs if stat.S_ISREG(a.st_mode)]
+        return await self._pullFiles(files)
+
+    async def _pullFiles(self, files):
+        sftp = await asyncEngine.runBlocking(channelMultiplexer.sftp)
+        plans = []
+        for remotePath, localPath in files:
+            attr = await asyncEngine.runBlocking(sftp.stat, remotePath)
+            plan = TransferPlan(remotePath, localPath, attr.st_size, attr.st_mtime, self.blockSize)
+            plan.load()
+            plans.append(plan)
+
+        total = sum(p.size for p in plans)
+        progress = [sum(p.doneBytes() for p in plans)]
+        progressLock = threading.Lock()
+        self.progressChanged.emit(progress[0], total)
+
+        def onBlock(n):
+            with progressLock:
+                progress[0] += n
+                self.progressChanged.emit(progress[0], total)
+
+        success = True
+        for plan in plans:
+            self.fileStarted.emit(plan.remotePath)
+            try:
+                status = await self._pullFile(plan, onBlock)
+            except TransferCancelled:
+                self.fileFinished.emit(plan.remotePath, "Cancelled")
+                return False
+            except Exception as e:
+                success = False
+                status = "Failed: " + str(e)
+
+            self.fileFinished.emit(plan.remotePath, status)
+
+        return success
+
+    async def _pullFile(self, plan: TransferPlan, onBlock):
+        os.makedirs(os.path.dirname(os.path.abspath(plan.localPath)), exist_ok=True)
+        if not plan.done or not os.path.exists(plan.partPath):
+            plan.done.clear()
+            with open(plan.partPath, "wb") as f:
+                f.truncate(plan.size)
+
+        pending = plan.pending()
+        lock = threading.Lock()
+
+        def nextBlock():
+            with lock:
+                return pending.pop(0) if pending else None
+
+        streams = min(self.streams, len(pending))
+        results = await asyncio.gather(*(
+            asyncEngine.runBlocking(self._stream, plan, f"sftp:{i}", nextBlock, onBlock)
+            for i in range(streams)
+        ), return_exceptions=True)
+
+        errors = [e for e in results if isinstance(e, BaseException)]
+        if errors:
+            raise errors[0]
+
+        status = "Unverified"
+        if self.verify:
+            local, remote = await asyncio.gather(
+                asyncEngine.runBlocking(localSha256, plan.partPath),
+                asyncEngine.runBlocking(remoteSha256, plan.remotePath, plan.size))
+            if remote is not None:
+                if local != remote:
+                    # the blocks can not be trusted anymore, start over next time
+                    os.remove(plan.planPath)
+                    raise IOError(f"Checksum mismatch, local {local} != remote {remote}")
+
+                status = "Verified"
+
+        os.replace(plan.partPath, plan.localPath)
+        os.remove(plan.planPath)
+        return status
+
+    def _stream(self, plan: TransferPlan, channelName: str, nextBlock, onBlock):
+        """ pull blocks until there is none left, runs in a worker thread """
+        sftp = channelMultiplexer.sftp(name=channelName)
+        with sftp.open(plan.remotePath, "rb") as remote, open(plan.partPath, "r+b") as local:
+            while True:
+                if self._cancelEvent.is_set():
+                    raise TransferCancelled()
+
+                index = nextBlock()
+                if index is None:
+                    return
+
+                offset, size = plan.blockRange(index)
+                requests = [(o, min(self.requestSize, offset + size - o))
+                            for o in range(offset, offset + size, self.requestSize)]
+
+                # readv keeps all requests of the block in flight at once
+                local.seek(offset)
+                for data in remote.readv(requests):
+                    local.write(data)
+
+                local.flush()
+                plan.markDone(index)
+                onBlock(size)
+
+    def __onDone(self, future):
+        try:
+            success = future.result()
+        except (CancelledError, Exception):
+            success = False
+
+        self.finished.emit(success)
@@ -1,6 +1,8 @@
 # coding: utf-8
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from .signal_trace import signalTracer
+
 
 class SignalBus(QObject):
     """ Signal bus """
@@ -8,6 +10,14 @@ class SignalBus(QObject):
     switchToSampleCard = pyqtSignal(str, int)
     micaEnableChanged = pyqtSignal(bool)
     supportSignal = pyqtSignal()
+    linkQualityUpdated = pyqtSignal(object)
+    linkStateChanged = pyqtSignal(object, object)   # old LinkState, new LinkState
+    telemetryUpdated = pyqtSignal(object)           # TelemetryStore
+    alarmChanged = pyqtSignal(object)               # Alarm
+    controlLoopUpdated = pyqtSignal(object)         # ControlLoopStats
+    replayStateChanged = pyqtSignal(bool)           # whether the replay of a dive is playing
+    gamepadReplayChanged = pyqtSignal(bool)         # whether recorded gamepad input replaces the device
 
 
-signalBus = SignalBus()
\ No newline at end of file
+signalBus = SignalBus()
+signalTracer.instrument(signalBus)
\ No newline at end of file
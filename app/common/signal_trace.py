@@ -0,0 +1,262 @@
+# coding: utf-8
+import csv
+import inspect
+import json
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import Qt, QObject, pyqtBoundSignal, pyqtSignal
+
+from .latency_stats import LatencyHistory
+
+
+# upper edges of the histogram buckets of queueing delay and slot time in milliseconds
+SIGNAL_HISTOGRAM_EDGES = (0.01, 0.1, 1, 5, 10, 50, 100, 500)
+
+STAGES = ("queue", "slot")
+
+
+class SignalStats:
+    """ Emissions, queueing delay and slot time of one signal
+
+    The rate is counted in buckets of `bucketTime` seconds which cover
+    `rateWindow`, so it is exact however often the signal is emitted.
+    """
+
+    def __init__(self, name: str, maxlen=1000, rateWindow=5, bucketTime=0.1):
+        self.name = name
+        self.emits = 0
+        self.rateWindow = rateWindow
+        self.bucketTime = bucketTime
+        self.history = LatencyHistory(STAGES, maxlen)
+        self._buckets = deque(maxlen=round(rateWindow / bucketTime) + 1)    # [bucket number, emissions]
+
+    def emitted(self, t: float):
+        self.emits += 1
+        bucket = int(t // self.bucketTime)
+        buckets = self._buckets
+        if buckets and buckets[-1][0] == bucket:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([bucket, 1])
+
+    def rate(self):
+        """ emissions per second over the last `rateWindow` seconds, to the bucket """
+        now = time.perf_counter()
+        first = int(now // self.bucketTime) - self._buckets.maxlen + 2
+        span = now - first * self.bucketTime
+        return sum(n for bucket, n in list(self._buckets) if bucket >= first) / span
+
+    def summary(self):
+        result = {"signal": self.name, "emits": self.emits, "rate": self.rate()}
+        for stage in STAGES:
+            p50, p95, p99 = self.history.percentiles(stage)
+            result[stage] = {
+                "n": self.history.count(stage),
+                "p50": p50, "p95": p95, "p99": p99,
+                "histogram": self.history.histogram(stage, SIGNAL_HISTOGRAM_EDGES),
+            }
+
+        return result
+
+    def clear(self):
+        self.emits = 0
+        self._buckets.clear()
+        self.history.clear()
+
+
+class SlotProbe(QObject):
+    """ Calls a slot and records how long the call waited in the queue and how long it ran
+
+    The probe lives in the thread of the slot's object, so a queued
+    connection stays queued. `pending` holds the emit times of the calls
+    which have not run yet, queued calls of one receiver run in order.
+    """
+
+    def __init__(self, slot, stats: SignalStats):
+        super().__init__()
+        self.slot = slot
+        self.stats = stats
+        self.pending = deque()
+        self.argCount = self.__argCount(slot)
+        owner = getattr(slot, "__self__", None)
+        if isinstance(owner, QObject):
+            self.moveToThread(owner.thread())
+
+    @staticmethod
+    def __argCount(slot):
+        """ number of arguments the slot takes, the extra arguments of a signal are dropped like Qt does """
+        try:
+            parameters = inspect.signature(slot).parameters.values()
+        except (TypeError, ValueError):
+            return None
+
+        if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+            return None
+
+        return sum(1 for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+    def call(self, *args):
+        start = time.perf_counter()
+        emitted = self.pending.popleft() if self.pending else None
+        try:
+            self.slot(*(args if self.argCount is None else args[:self.argCount]))
+        finally:
+            end = time.perf_counter()
+            self.stats.history.add({"queue": start - emitted if emitted is not None else None,
+                                    "slot": end - start})
+
+
+class TracedSignal:
+    """ Stands in for a bound signal of an instrumented object
+
+    While tracing is off `emit` and `connect` pass straight through, the
+    cost is one Python call. Turning tracing on reconnects every slot
+    connected through this object behind a `SlotProbe`, turning it off
+    connects the slots directly again.
+    """
+
+    def __init__(self, tracer, name: str, signal: pyqtBoundSignal):
+        self.tracer = tracer
+        self.name = name
+        self.signal = signal
+        self.stats = SignalStats(name)
+        self.connections = []   # [slot, connection type, probe or None]
+
+    def __getattr__(self, name):
+        return getattr(self.signal, name)
+
+    def connect(self, slot, type=Qt.AutoConnection):
+        connection = [slot, type, None]
+        self.connections.append(connection)
+        self.__connect(connection, self.tracer.enabled)
+
+    def disconnect(self, slot=None):
+        for connection in [c for c in self.connections if slot is None or c[0] == slot]:
+            self.__disconnect(connection)
+            self.connections.remove(connection)
+
+    def emit(self, *args):
+        if self.tracer.enabled:
+            t = time.perf_counter()
+            self.stats.emitted(t)
+            for _, _, probe in self.connections:
+                if probe is not None:
+                    probe.pending.append(t)
+
+        self.signal.emit(*args)
+
+    # connecting a signal to this one emits it, as with a bound signal
+    __call__ = emit
+
+    def setTraced(self, traced: bool):
+        for connection in self.connections:
+            self.__disconnect(connection)
+            self.__connect(connection, traced)
+
+    def __connect(self, connection, traced: bool):
+        slot, type, _ = connection
+        if traced:
+            probe = connection[2] = SlotProbe(slot, self.stats)
+            self.signal.connect(probe.call, type)
+        else:
+            self.signal.connect(slot, type)
+
+    def __disconnect(self, connection):
+        slot, _, probe = connection
+        try:
+            self.signal.disconnect(probe.call if probe is not None else slot)
+        except TypeError:
+            pass
+
+        if probe is not None:
+            probe.deleteLater()
+            connection[2] = None
+
+
+class SignalTracer:
+    """ Opt-in timing of the signals of instrumented objects such as `signalBus`
+
+    `instrument` puts a `TracedSignal` in front of every signal of an
+    object, which has to happen before anything connects to it. Nothing is
+    measured until `setEnabled(True)`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.signals = {}       # type: dict[str, TracedSignal]
+        self._lock = threading.Lock()
+
+    def instrument(self, obj: QObject, names=None, prefix=None):
+        """ trace the signals `names` of `obj`, all signals its class declares if None """
+        prefix = prefix or type(obj).__name__
+        if names is None:
+            names = [n for n, v in vars(type(obj)).items() if isinstance(v, pyqtSignal)]
+
+        for name in names:
+            traced = TracedSignal(self, f"{prefix}.{name}", getattr(obj, name))
+            setattr(obj, name, traced)
+            with self._lock:
+                self.signals[traced.name] = traced
+
+    def setEnabled(self, enabled: bool):
+        if enabled == self.enabled:
+            return
+
+        self.enabled = enabled
+        with self._lock:
+            signals = list(self.signals.values())
+
+        for signal in signals:
+            signal.setTraced(enabled)
+
+    def summaries(self):
+        with self._lock:
+            signals = list(self.signals.values())
+
+        return [s.stats.summary() for s in signals if s.stats.emits]
+
+    def report(self):
+        """ text report of the traced signals """
+        lines = []
+        for s in self.summaries():
+            queue, slot = s["queue"], s["slot"]
+            lines.append("{0}: {1} emits, {2:.1f}/s".format(s["signal"], s["emits"], s["rate"]))
+            for stage, values in (("queue", queue), ("slot", slot)):
+                if values["n"]:
+                    lines.append("    {0} p50 / p95 / p99: {1:.3f} / {2:.3f} / {3:.3f} ms  [{4}]".format(
+                        stage, values["p50"] * 1000, values["p95"] * 1000, values["p99"] * 1000,
+                        " ".join(str(c) for c in values["histogram"])))
+
+        if lines:
+            lines.append("Buckets (ms): " + " ".join(
+                f"≤{e}" for e in SIGNAL_HISTOGRAM_EDGES) + f" >{SIGNAL_HISTOGRAM_EDGES[-1]}")
+
+        return "\n".join(lines)
+
+    def export(self, path: str):
+        """ write the summaries to a JSON file, or a CSV file if the path ends with .csv """
+        summaries = self.summaries()
+        if not path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"histogramEdgesMs": SIGNAL_HISTOGRAM_EDGES, "signals": summaries}, f, indent=2)
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["signal", "emits", "rate", "stage", "n", "p50", "p95", "p99"] +
+                            [f"<={e}ms" for e in SIGNAL_HISTOGRAM_EDGES] + [f">{SIGNAL_HISTOGRAM_EDGES[-1]}ms"])
+            for s in summaries:
+                for stage in STAGES:
+                    v = s[stage]
+                    writer.writerow([s["signal"], s["emits"], f"{s['rate']:.3f}", stage, v["n"],
+                                     v["p50"], v["p95"], v["p99"]] + v["histogram"])
+
+    def clear(self):
+        with self._lock:
+            for signal in self.signals.values():
+                signal.stats.clear()
+
+
+signalTracer = SignalTracer()
@@ -0,0 +1,248 @@
+# coding: utf-8
+import struct
+import threading
+
+import paramiko
+from paramiko import SSHException
+from qfluentwidgets import ConfigItem
+
+from .config import cfg
+from .ssh_session import sshSessionManager
+
+
+class ChannelSpec:
+    """ How a logical channel is opened and its flow control parameters
+
+    Parameters
+    ----------
+    name: str
+        name of the logical channel
+
+    kind: str
+        `exec` runs `command` on the ROV, `shell` starts an interactive shell
+        and `sftp` starts the sftp subsystem
+
+    command: str or ConfigItem
+        remote command of an `exec` channel
+
+    windowSize: int
+        receive window in bytes, the ROV can only send this many bytes before we read them
+
+    maxPacketSize: int
+        largest packet the ROV may send on this channel
+    """
+
+    def __init__(self, name: str, kind: str, command=None, windowSize=None, maxPacketSize=None):
+        self.name = name
+        self.kind = kind
+        self.command = command
+        self.windowSize = windowSize
+        self.maxPacketSize = maxPacketSize
+
+
+# small packets keep the control stream responsive, a large window lets bulk data stream
+DEFAULT_CHANNELS = {
+    "control": ChannelSpec("control", "exec", cfg.controlCommand, 64 * 1024, 4 * 1024),
+    "telemetry": ChannelSpec("telemetry", "exec", cfg.telemetryCommand, 1024 * 1024, 32 * 1024),
+    "sftp": ChannelSpec("sftp", "sftp", None, 8 * 1024 * 1024, 32 * 1024),
+    "shell": ChannelSpec("shell", "shell", None, 256 * 1024, 16 * 1024),
+}
+
+
+class LogicalChannel:
+    """ Named channel with its own buffer and byte/message counters
+
+    Attributes of the underlying `paramiko.Channel` are reachable through it,
+    so it can be handed to `paramiko.SFTPClient` directly.
+    """
+
+    HEADER = struct.Struct("!I")
+
+    def __init__(self, spec: ChannelSpec, channel: paramiko.Channel):
+        self.spec = spec
+        self.channel = channel
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.messagesSent = 0
+        self.messagesReceived = 0
+        self._buffer = bytearray()
+        self._sendLock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+    def isOpen(self):
+        t = self.channel.get_transport()
+        return not self.channel.closed and t is not None and t.is_active()
+
+    def send(self, data) -> int:
+        n = self.channel.send(data)
+        self.bytesSent += n
+        return n
+
+    def sendall(self, data):
+        self.channel.sendall(data)
+        self.bytesSent += len(data)
+
+    def recv(self, nbytes: int) -> bytes:
+        data = self.channel.recv(nbytes)
+        self.bytesReceived += len(data)
+        return data
+
+    def sendMessage(self, payload: bytes):
+        """ send a length prefixed message, thread safe """
+        with self._sendLock:
+            self.sendall(self.HEADER.pack(len(payload)) + payload)
+            self.messagesSent += 1
+
+    def recvMessage(self) -> bytes:
+        """ receive a length prefixed message, raises EOFError when the channel is closed """
+        self._fill(self.HEADER.size)
+        size, = self.HEADER.unpack_from(self._buffer)
+        self._fill(self.HEADER.size + size)
+
+        payload = bytes(self._buffer[self.HEADER.size:self.HEADER.size + size])
+        del self._buffer[:self.HEADER.size + size]
+        self.messagesReceived += 1
+        return payload
+
+    def _fill(self, size: int):
+        while len(self._buffer) < size:
+            data = self.recv(max(size - len(self._buffer), self.spec.maxPacketSize or 32768))
+            if not data:
+                raise EOFError(f"Channel {self.name} closed")
+
+            self._buffer += data
+
+    def stats(self):
+        return {
+            "bytesSent": self.bytesSent,
+            "bytesReceived": self.bytesReceived,
+            "messagesSent": self.messagesSent,
+            "messagesReceived": self.messagesReceived,
+        }
+
+    def close(self):
+        self.channel.close()
+
+
+class ChannelMultiplexer:
+    """ Hands out named logical channels over the single pooled SSH transport
+
+    Every channel has its own receive window, so a bulk transfer on one
+    channel never stalls the stream of another. Channels are reopened on
+    demand after the transport is re-established. A channel is opened, and
+    its sftp client started, under a lock of its name only, so opening one
+    channel, which may include the SSH handshake, never holds up the
+    lookup of the others.
+    """
+
+    def __init__(self, specs=None):
+        self.specs = dict(specs or DEFAULT_CHANNELS)
+        self._channels = {}     # type: dict[str, LogicalChannel]
+        self._sftp = {}         # type: dict[str, paramiko.SFTPClient]
+        self._nameLocks = {}    # type: dict[str, threading.Lock]
+        self._lock = threading.Lock()
+
+    def addSpec(self, spec: ChannelSpec):
+        self.specs[spec.name] = spec
+
+    def spec(self, name: str) -> ChannelSpec:
+        """ spec of a channel, `name:suffix` opens another channel with the spec of `name` """
+        if name in self.specs:
+            return self.specs[name]
+
+        base = self.specs[name.split(":", 1)[0]]
+        return ChannelSpec(name, base.kind, base.command, base.windowSize, base.maxPacketSize)
+
+    def channel(self, name: str, timeout=5) -> LogicalChannel:
+        """ get the open logical channel of `name`, open it if needed """
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel and channel.isOpen():
+                return channel
+
+            nameLock = self._nameLocks.setdefault(name, threading.Lock())
+
+        # concurrent callers of the same name wait for a single open
+        with nameLock:
+            with self._lock:
+                channel = self._channels.get(name)
+                if channel and channel.isOpen():
+                    return channel
+
+            channel = self._open(self.spec(name), timeout)
+            with self._lock:
+                self._channels[name] = channel
+                self._sftp.pop(name, None)
+
+            return channel
+
+    def sftp(self, timeout=5, name="sftp") -> paramiko.SFTPClient:
+        """ sftp client over a logical channel of kind `sftp`
+
+        An sftp client must not be shared between threads, parallel streams
+        should each use their own channel such as `sftp:1`, `sftp:2`.
+        """
+        channel = self.channel(name, timeout)
+        with self._lock:
+            client = self._sftp.get(name)
+            if client is not None and client.sock is channel:
+                return client
+
+            nameLock = self._nameLocks.setdefault(name, threading.Lock())
+
+        # the client negotiates the sftp version with the server, a round trip
+        with nameLock:
+            with self._lock:
+                client = self._sftp.get(name)
+                if client is not None and client.sock is channel:
+                    return client
+
+            client = paramiko.SFTPClient(channel)
+            with self._lock:
+                self._sftp[name] = client
+
+            return client
+
+    def _open(self, spec: ChannelSpec, timeout):
+        session, _ = sshSessionManager.session(timeout)
+        chan = session.openChannel(
+            timeout, window_size=spec.windowSize, max_packet_size=spec.maxPacketSize)
+        chan.set_name(spec.name)
+
+        if spec.kind == "exec":
+            command = spec.command
+            chan.exec_command(cfg.get(command) if isinstance(command, ConfigItem) else command)
+        elif spec.kind == "shell":
+            chan.invoke_shell()
+        elif spec.kind == "sftp":
+            chan.invoke_subsystem("sftp")
+        else:
+            chan.close()
+            raise SSHException(f"Unknown channel kind: {spec.kind}")
+
+        return LogicalChannel(spec, chan)
+
+    def stats(self):
+        """ byte and message counters of each logical channel """
+        with self._lock:
+            return {name: c.stats() for name, c in self._channels.items()}
+
+    def close(self, name=None):
+        """ close the channel of `name`, or all channels if name is None """
+        with self._lock:
+            names = [name] if name else list(self._channels)
+            for n in names:
+                channel = self._channels.pop(n, None)
+                if channel:
+                    channel.close()
+
+                self._sftp.pop(n, None)
+
+
+channelMultiplexer = ChannelMultiplexer()
@@ -0,0 +1,94 @@
+# coding: utf-8
+import asyncio
+from concurrent.futures import CancelledError
+from typing import Callable, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .async_engine import asyncEngine
+
+
+class SSHCheckEngine(QObject):
+    """ Runs connection checks as cancellable coroutines on the async engine
+
+    Only one check is in flight at a time, repeated requests join it. The
+    result is delivered to the thread of this object through `checkFinished`.
+    A check which times out or is cancelled calls `abortFunc`, which has to
+    make the blocking check function return, otherwise it keeps a worker
+    and whatever it holds, such as the handshake lock of a session.
+    """
+
+    checkStarted = pyqtSignal()
+    checkFinished = pyqtSignal(str, str)    # status, message
+    checkCancelled = pyqtSignal()
+
+    def __init__(self, checkFunc: Callable[[], Tuple[str, str]], timeout=8, minDuration=1, abortFunc=None,
+                 parent=None):
+        """
+        Parameters
+        ----------
+        checkFunc: callable
+            blocking check function which returns `(status, message)`, it runs in the worker pool
+
+        timeout: float
+            seconds before the check is given up
+
+        minDuration: float
+            minimum seconds a check lasts, so that the progress bar does not flicker
+
+        abortFunc: callable
+            thread safe function which aborts the check function, such as `sshSessionManager.abort`
+        """
+        super().__init__(parent=parent)
+        self.checkFunc = checkFunc
+        self.abortFunc = abortFunc
+        self.timeout = timeout
+        self.minDuration = minDuration
+        self._future = None
+
+    def isChecking(self):
+        return self._future is not None and not self._future.done()
+
+    def check(self):
+        """ start a check, returns False if it joined the check in flight """
+        if self.isChecking():
+            return False
+
+        self.checkStarted.emit()
+        self._future = asyncEngine.submit(self._run())
+        self._future.add_done_callback(self.__onDone)
+        return True
+
+    def cancel(self):
+        if self.isChecking():
+            self._future.cancel()
+            self.__abort()
+
+    def __abort(self):
+        if self.abortFunc is not None:
+            self.abortFunc()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            status, message = await asyncio.wait_for(
+                asyncEngine.runBlocking(self.checkFunc), self.timeout)
+        except asyncio.TimeoutError:
+            self.__abort()
+            status, message = "Failed", self.tr("SSH Connection Failed: Timed out after ") + \
+                f"{self.timeout}s"
+
+        await asyncio.sleep(max(self.minDuration - (loop.time() - start), 0))
+        return status, message
+
+    def __onDone(self, future):
+        # called from the engine thread, signals are queued to the receivers' thread
+        try:
+            status, message = future.result()
+        except CancelledError:
+            self.checkCancelled.emit()
+        except Exception as e:
+            self.checkFinished.emit("Failed", self.tr("SSH Connection Failed: ") + repr(e))
+        else:
+            self.checkFinished.emit(status, message)
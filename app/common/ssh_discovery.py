@@ -0,0 +1,154 @@
+# coding: utf-8
+import asyncio
+import ipaddress
+import time
+from concurrent.futures import CancelledError
+from typing import List
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .async_engine import asyncEngine
+
+
+# largest number of addresses a scan probes, a /22
+MAX_CANDIDATES = 1024
+
+
+def parseCandidates(text: str, limit=MAX_CANDIDATES) -> List[str]:
+    """ parse candidate addresses
+
+    `text` is a comma or space separated list of addresses, subnets such as
+    `192.168.137.0/24` and last octet ranges such as `192.168.137.100-120`.
+    Raises `ValueError` if there are more than `limit` addresses.
+    """
+    addresses = []
+    for item in text.replace(",", " ").split():
+        if "/" in item:
+            network = ipaddress.ip_network(item, strict=False)
+            if network.num_addresses > limit:
+                raise ValueError(f"{item} has {network.num_addresses} addresses, at most {limit} can be scanned")
+
+            hosts = list(network.hosts()) or [network.network_address]
+            addresses.extend(str(i) for i in hosts)
+        elif "-" in item:
+            start, end = item.split("-", 1)
+            first = ipaddress.ip_address(start)
+            if "." not in end:
+                end = start.rsplit(".", 1)[0] + "." + end
+
+            last = ipaddress.ip_address(end)
+            if int(last) - int(first) + 1 > limit:
+                raise ValueError(f"{item} has {int(last) - int(first) + 1} addresses, at most {limit} can be scanned")
+
+            addresses.extend(str(ipaddress.ip_address(i)) for i in range(int(first), int(last) + 1))
+        else:
+            addresses.append(str(ipaddress.ip_address(item)))
+
+        if len(addresses) > limit:
+            raise ValueError(f"More than {limit} addresses, at most {limit} can be scanned")
+
+    # remove duplicates but keep the order
+    return list(dict.fromkeys(addresses))
+
+
+class DiscoveryResult:
+    """ SSH server which answered the discovery scan """
+
+    def __init__(self, address: str, port: int, latency: float, banner: str):
+        self.address = address
+        self.port = port
+        self.latency = latency  # seconds from connect to banner
+        self.banner = banner
+
+    def __repr__(self):
+        return f"DiscoveryResult({self.address}:{self.port}, {self.latency * 1000:.1f} ms, {self.banner!r})"
+
+
+async def probe(address: str, port=22, timeout=0.8):
+    """ connect to a host and read its SSH banner, returns None if it is not an SSH server """
+    start = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        banner = await asyncio.wait_for(reader.readline(), max(timeout - (time.perf_counter() - start), 0.05))
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if not banner.startswith(b"SSH-"):
+        return None
+
+    return DiscoveryResult(address, port, time.perf_counter() - start, banner.decode(errors="replace").strip())
+
+
+async def scan(addresses, port=22, concurrency=128, timeout=0.8, onProbed=None):
+    """ probe the addresses in parallel with bounded concurrency
+
+    Parameters
+    ----------
+    onProbed: callable
+        called with `(address, result)` after each host is probed, result is None if no SSH server answered
+
+    Returns
+    -------
+    results: List[DiscoveryResult]
+        responders sorted by latency
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(address):
+        async with semaphore:
+            result = await probe(address, port, timeout)
+
+        if onProbed:
+            onProbed(address, result)
+
+        return result
+
+    results = await asyncio.gather(*(run(a) for a in addresses))
+    return sorted((r for r in results if r), key=lambda r: r.latency)
+
+
+class SSHDiscovery(QObject):
+    """ Runs discovery scans on the async engine and reports through signals """
+
+    found = pyqtSignal(object)          # DiscoveryResult
+    progressChanged = pyqtSignal(int, int)  # probed, total
+    finished = pyqtSignal(list)         # List[DiscoveryResult] sorted by latency
+
+    def __init__(self, concurrency=128, timeout=0.8, parent=None):
+        super().__init__(parent=parent)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._future = None
+
+    def isScanning(self):
+        return self._future is not None and not self._future.done()
+
+    def scan(self, addresses: List[str], port=22):
+        """ start a scan, the scan in flight is cancelled """
+        self.cancel()
+        total = len(addresses)
+        probed = [0]
+
+        def onProbed(address, result):
+            probed[0] += 1
+            self.progressChanged.emit(probed[0], total)
+            if result:
+                self.found.emit(result)
+
+        self._future = asyncEngine.submit(
+            scan(addresses, port, self.concurrency, self.timeout, onProbed))
+        self._future.add_done_callback(self.__onDone)
+
+    def cancel(self):
+        if self.isScanning():
+            self._future.cancel()
+
+    def __onDone(self, future):
+        try:
+            self.finished.emit(future.result())
+        except CancelledError:
+            pass
@@ -0,0 +1,370 @@
+# coding: utf-8
+import errno
+import os
+import select
+import socket
+import threading
+import time
+
+import paramiko
+from paramiko import SSHException
+
+from .config import cfg, SSHProfile
+from .latency_stats import LatencyHistory
+
+
+# stages of a handshake, in the order they happen
+HANDSHAKE_STAGES = ("tcp", "banner", "kex", "auth")
+
+# algorithm preferences of each profile, names of `paramiko.transport.SecurityOptions` attributes
+ALGORITHM_PROFILES = {
+    # paramiko's own preferences
+    SSHProfile.DEFAULT: {},
+    # cheapest on the ROV's ARM board: x25519 key exchange, AEAD ciphers which need no
+    # separate MAC, and ed25519 host keys which verify faster than RSA
+    SSHProfile.FAST: {
+        "kex": ("curve25519-sha256@libssh.org", "ecdh-sha2-nistp256", "diffie-hellman-group14-sha256"),
+        "ciphers": ("aes128-gcm@openssh.com", "aes256-gcm@openssh.com", "aes128-ctr", "aes256-ctr"),
+        "digests": ("hmac-sha2-256-etm@openssh.com", "hmac-sha2-256", "hmac-sha2-512"),
+        "key_types": ("ssh-ed25519", "ecdsa-sha2-nistp256", "rsa-sha2-256", "rsa-sha2-512"),
+    },
+    # widest set for older sshd builds
+    SSHProfile.COMPATIBLE: {
+        "kex": ("diffie-hellman-group14-sha256", "diffie-hellman-group-exchange-sha256",
+                "diffie-hellman-group16-sha512", "ecdh-sha2-nistp256", "curve25519-sha256@libssh.org"),
+        "ciphers": ("aes128-ctr", "aes256-ctr", "aes128-cbc", "aes256-cbc", "3des-cbc"),
+        "digests": ("hmac-sha2-256", "hmac-sha2-512", "hmac-sha1"),
+        "key_types": ("rsa-sha2-256", "rsa-sha2-512", "ssh-ed25519", "ecdsa-sha2-nistp256"),
+    },
+}
+
+
+def applyProfile(transport: paramiko.Transport, profile: SSHProfile):
+    """ set the algorithm preferences of `profile` before the handshake
+
+    Algorithms this paramiko build does not support are skipped, a category
+    without any supported algorithm keeps paramiko's preferences.
+    """
+    options = transport.get_security_options()
+    for name, preferred in ALGORITHM_PROFILES[profile].items():
+        supported = getattr(options, name)
+        setattr(options, name, [a for a in preferred if a in supported] or supported)
+
+
+class SSHSession:
+    """ Authenticated SSH transport which is kept alive between uses
+
+    The private key in `keyFile` is tried first if there is one, the
+    password is used if the key is rejected or no key is given. `abort`
+    makes a handshake in progress on another thread fail at once.
+    """
+
+    def __init__(self, address: str, port: int, username: str, password: str,
+                 keyFile="", profile=SSHProfile.DEFAULT):
+        self.address = address
+        self.port = port
+        self.username = username
+        self.password = password
+        self.keyFile = keyFile
+        self.profile = profile
+        self.transport = None   # type: paramiko.Transport
+        self.connectedAt = None
+        self.timings = {}       # stage -> seconds of the last handshake
+        self._aborted = threading.Event()
+        self._sock = None
+        self._handshake = None  # transport of the handshake in progress
+
+    @property
+    def key(self):
+        return (self.address, self.port, self.username)
+
+    @property
+    def credentials(self):
+        """ settings which need a new handshake when changed """
+        return (self.password, self.keyFile, self.profile)
+
+    @property
+    def algorithms(self):
+        """ negotiated (cipher, mac) of the client to server direction """
+        if self.transport is None:
+            return None
+
+        return self.transport.local_cipher, self.transport.local_mac
+
+    def connect(self, timeout=5, onStage=None):
+        """ open the TCP connection, negotiate keys and authenticate
+
+        The duration of each stage in `HANDSHAKE_STAGES` is stored in `timings`,
+        stages reached before a failure are recorded as well. `onStage` is
+        called with the name of each stage when it starts.
+        """
+        self.timings = {}
+        clock = time.perf_counter
+        onStage = onStage or (lambda stage: None)
+
+        onStage("tcp")
+        t0 = clock()
+        sock = self.__connectSocket(timeout)
+        t1 = clock()
+        # small control packets must not wait for Nagle's algorithm
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.timings["tcp"] = t1 - t0
+
+        transport = None
+        try:
+            # wait for the first bytes of the server identification string
+            onStage("banner")
+            sock.settimeout(timeout)
+            if not sock.recv(1, socket.MSG_PEEK):
+                raise SSHException("Handshake aborted" if self._aborted.is_set() else
+                                   "Connection closed by server before banner")
+
+            t2 = clock()
+            self.timings["banner"] = t2 - t1
+
+            onStage("kex")
+            transport = self._handshake = paramiko.Transport(sock)
+            if self._aborted.is_set():
+                raise SSHException("Handshake aborted")
+
+            transport.banner_timeout = timeout
+            transport.auth_timeout = timeout
+            applyProfile(transport, self.profile)
+            transport.start_client(timeout=timeout)
+            t3 = clock()
+            self.timings["kex"] = t3 - t2
+
+            onStage("auth")
+            self.authenticate(transport)
+            self.timings["auth"] = clock() - t3
+        except BaseException:
+            if transport is not None:
+                transport.close()
+            else:
+                sock.close()
+            raise
+        finally:
+            self._sock = self._handshake = None
+
+        self.transport = transport
+        self.connectedAt = time.time()
+
+    def __connectSocket(self, timeout):
+        """ TCP connection in slices of 0.1 s, so that `abort` does not wait for the timeout """
+        family, kind, proto, _, address = socket.getaddrinfo(self.address, self.port, 0, socket.SOCK_STREAM)[0]
+        sock = self._sock = socket.socket(family, kind, proto)
+        try:
+            sock.setblocking(False)
+            deadline = time.monotonic() + timeout
+            error = sock.connect_ex(address)
+            while error in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                if self._aborted.is_set():
+                    raise SSHException("Handshake aborted")
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+
+                _, writable, failed = select.select([], [sock], [sock], min(remaining, 0.1))
+                if writable or failed:
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+            if error:
+                raise OSError(error, os.strerror(error))
+
+            sock.setblocking(True)
+            return sock
+        except BaseException:
+            self._sock = None
+            sock.close()
+            raise
+
+    def abort(self):
+        """ make a handshake in progress fail, thread safe """
+        self._aborted.set()
+        transport, sock = self._handshake, self._sock
+        if transport is not None:
+            transport.close()
+        elif sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def authenticate(self, transport: paramiko.Transport):
+        """ authenticate with the key file, fall back to the password """
+        if self.keyFile:
+            key = paramiko.PKey.from_path(self.keyFile)
+            try:
+                transport.auth_publickey(self.username, key)
+                return
+            except paramiko.AuthenticationException:
+                if not self.password:
+                    raise
+
+        transport.auth_password(self.username, self.password)
+
+    def isAlive(self):
+        """ cheap local health check, no round trip to the server """
+        t = self.transport
+        return t is not None and t.is_active() and t.is_authenticated()
+
+    def ping(self, timeout=5):
+        """ round trip a channel open/close through the transport
+
+        :return: round trip time in seconds
+        """
+        start = time.perf_counter()
+        channel = self.openChannel(timeout)
+        channel.close()
+        return time.perf_counter() - start
+
+    def openChannel(self, timeout=5, **kwargs):
+        """ open a new session channel on the kept-alive transport """
+        if not self.isAlive():
+            raise SSHException("SSH session is not active")
+
+        return self.transport.open_session(timeout=timeout, **kwargs)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+
+def connectionItems():
+    """ config items which change the connection to the ROV """
+    return (cfg.sshAddress, cfg.sshPort, cfg.sshUser, cfg.sshPassword,
+            cfg.sshKeyFile, cfg.sshAlgorithmProfile)
+
+
+class SSHSessionManager:
+    """ Process-wide pool of SSH sessions, one per (address, port, username)
+
+    Sessions are handshaked once and reused by every caller. A session is only
+    re-established when it dies or the `sshAddress`/`sshPort`/`sshUser`/
+    `sshPassword`/`sshKeyFile`/`sshAlgorithmProfile` config items change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}     # type: dict[tuple, SSHSession]
+        self._keyLocks = {}     # type: dict[tuple, threading.Lock]
+        self._connecting = {}   # type: dict[tuple, SSHSession]
+        self.history = LatencyHistory(HANDSHAKE_STAGES + ("rtt",))
+
+        for item in connectionItems():
+            item.valueChanged.connect(self._onConfigChanged)
+
+    @staticmethod
+    def currentConfig():
+        """ read the connection parameters from the config
+
+        :return: (address, port, username, password, keyFile, profile)
+        """
+        return (cfg.get(cfg.sshAddress), int(cfg.get(cfg.sshPort)), cfg.get(cfg.sshUser),
+                cfg.get(cfg.sshPassword), cfg.get(cfg.sshKeyFile), cfg.get(cfg.sshAlgorithmProfile))
+
+    def session(self, timeout=5, onStage=None):
+        """ get the session of current config, handshake only if needed
+
+        :param onStage: called with the name of each handshake stage when it starts
+
+        :return: (session, reused) where reused is False if a new handshake was made
+        """
+        config = self.currentConfig()
+        key, credentials = config[:3], config[3:]
+
+        with self._lock:
+            keyLock = self._keyLocks.setdefault(key, threading.Lock())
+
+        # concurrent callers of the same key wait for a single handshake
+        with keyLock:
+            with self._lock:
+                session = self._sessions.get(key)
+
+            if session and session.isAlive() and session.credentials == credentials:
+                return session, True
+
+            if session:
+                session.close()
+
+            session = SSHSession(*config)
+            with self._lock:
+                self._connecting[key] = session
+
+            try:
+                session.connect(timeout, onStage)
+            finally:
+                self.history.add(session.timings)
+                with self._lock:
+                    self._connecting.pop(key, None)
+
+            with self._lock:
+                self._sessions[key] = session
+
+            return session, False
+
+    def abort(self):
+        """ abort the handshakes in progress, their callers raise `SSHException` and the key locks are released """
+        with self._lock:
+            sessions = list(self._connecting.values())
+
+        for session in sessions:
+            session.abort()
+
+    def current(self):
+        """ alive session of current config without handshaking, None if there is none """
+        config = self.currentConfig()
+        with self._lock:
+            session = self._sessions.get(config[:3])
+
+        if session and session.isAlive() and session.credentials == config[3:]:
+            return session
+
+        return None
+
+    def ping(self, timeout=5):
+        """ round trip the session of current config and record it in `history` """
+        session, reused = self.session(timeout)
+        rtt = session.ping(timeout)
+        self.history.add({"rtt": rtt})
+        return session, reused, rtt
+
+    def openChannel(self, timeout=5, **kwargs):
+        """ open a channel on the session of current config """
+        session, _ = self.session(timeout)
+        return session.openChannel(timeout, **kwargs)
+
+    def invalidate(self, key=None):
+        """ close the session of `key`, or the session of current config if key is None """
+        if key is None:
+            key = self.currentConfig()[:3]
+
+        with self._lock:
+            session = self._sessions.pop(key, None)
+
+        if session:
+            session.close()
+
+    def closeAll(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+    def _onConfigChanged(self, value):
+        """ drop the sessions which no longer match the config """
+        config = self.currentConfig()
+        with self._lock:
+            stale = [k for k, s in self._sessions.items()
+                     if k != config[:3] or s.credentials != config[3:]]
+            sessions = [self._sessions.pop(k) for k in stale]
+
+        for session in sessions:
+            session.close()
+
+
+sshSessionManager = SSHSessionManager()
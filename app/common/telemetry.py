@@ -0,0 +1,309 @@
+# coding: utf-8
+import json
+import logging
+import socket
+import threading
+import time
+
+import numpy as np
+from paramiko import SSHException
+
+from .config import cfg
+from .data_bus import dataBus
+from .downsampling import DownsamplePyramid
+from .ring_buffer import RingBuffer
+from .signal_bus import signalBus
+from .ssh_channels import channelMultiplexer
+from .ssh_session import sshSessionManager
+from .telemetry_format import HEADER_MAGIC, FrameDecoder, TelemetrySchema
+from .telemetry_stats import StatsEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryStore:
+    """ Time stamps and one ring buffer per telemetry channel
+
+    All buffers stay aligned to the time buffer, a channel missing from a
+    record is stored as NaN. Every channel also feeds a `DownsamplePyramid`,
+    so views can show far more history than the ring buffers hold, and
+    the channels of `statsEngine` feed its rolling statistics. `stats` holds
+    the statistics as of the last telemetry update. The store is written
+    by a telemetry source and read by the GUI, both under `lock`.
+    """
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.time = RingBuffer(capacity)
+        self.channels = {}      # type: dict[str, RingBuffer]
+        self.pyramids = {}      # type: dict[str, DownsamplePyramid]
+        self.version = 0        # number of appended batches
+        self.statsEngine = StatsEngine(window=cfg.get(cfg.telemetryStatsWindow))
+        self.stats = {}         # type: dict[str, ChannelStats]
+
+    def append(self, times, columns: dict):
+        """ append a batch of records, `columns` maps channel names to arrays as long as `times` """
+        n = len(times)
+        if n == 0:
+            return
+
+        with self.lock:
+            for name in columns.keys() - self.channels.keys():
+                buffer = self.channels[name] = RingBuffer(self.capacity)
+                buffer.total = self.time.total
+                self.pyramids[name] = DownsamplePyramid()
+
+            self.time.extend(times)
+            for name, buffer in self.channels.items():
+                values = columns[name] if name in columns else np.full(n, np.nan)
+                buffer.extend(values)
+                self.pyramids[name].extend(times, values)
+
+            self.statsEngine.update(times, columns)
+            self.version += 1
+
+    def channelNames(self):
+        with self.lock:
+            return list(self.channels)
+
+    def latest(self, name: str, n=None):
+        """ (times, values) of the latest `n` samples of a channel """
+        with self.lock:
+            return self.time.latest(n), self.channels[name].latest(n)
+
+    def endTime(self):
+        """ time stamp of the latest record, None if the store is empty """
+        with self.lock:
+            return float(self.time.data[(self.time.total - 1) % self.capacity]) if len(self.time) else None
+
+    def downsample(self, name: str, t0: float, t1: float, pixels: int, method="minmax"):
+        """ (times, values) of a channel between `t0` and `t1`, at most 2 * pixels points """
+        with self.lock:
+            pyramid = self.pyramids[name]
+            first = self.time.searchsorted(t0)
+            raw = None
+            # only copy the raw samples if the pyramid would choose them, from the one before `t0` on
+            if self.time.searchsorted(t1, "right") - first <= pyramid.factor * pixels:
+                n = len(self.time) - max(first - 1, 0)
+                raw = (self.time.latest(n), self.channels[name].latest(n), self.time.total <= self.capacity)
+
+            return pyramid.query(t0, t1, pixels, raw, method)
+
+    def updateStats(self):
+        """ compute the statistics of the window ending at the latest record into `stats` """
+        with self.lock:
+            if not len(self.time):
+                self.stats = {}
+                return
+
+            end = self.time.data[(self.time.total - 1) % self.capacity]
+            n = len(self.time) - self.time.searchsorted(end - self.statsEngine.window)
+            times = self.time.latest(n)
+            self.stats = {
+                name: self.statsEngine.snapshot(name, times, self.channels[name].latest(n))
+                for name in self.statsEngine.channels if name in self.channels
+            }
+
+    def last(self):
+        """ latest value of every channel """
+        with self.lock:
+            if not len(self.time):
+                return {}
+
+            i = (self.time.total - 1) % self.capacity
+            return {name: float(b.data[i]) for name, b in self.channels.items()}
+
+    def clear(self):
+        with self.lock:
+            self.time.clear()
+            self.channels.clear()
+            self.pyramids.clear()
+            self.statsEngine.clear()
+            self.stats = {}
+            self.version += 1
+
+
+def parseJsonRecords(lines):
+    """ parse newline delimited JSON records such as `{"t": 12.5, "depth": 1.2}`
+
+    :return: (times, columns) as NumPy arrays, records which fail to parse are skipped
+    """
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+            record["t"] = float(record["t"])
+        except (ValueError, KeyError, TypeError):
+            continue
+
+        records.append(record)
+
+    times = np.fromiter((r.pop("t") for r in records), np.float64, len(records))
+    names = set().union(*records) if records else set()
+    columns = {name: np.fromiter((r.get(name, np.nan) for r in records), np.float64, len(records))
+               for name in names}
+    return times, columns
+
+
+class TelemetrySource:
+    """ Producer of telemetry records, such as the live link or a replay
+
+    A source runs on its own worker thread, writes batches of records into
+    `store` and notifies the GUI through `signalBus.telemetryUpdated` at no
+    more than `telemetryNotifyRate`, however fast the records arrive.
+    Every batch is handed to the callables in `sinks` as well, on the
+    source's thread, so a sink must return quickly, and published as
+    (times, columns) on the `topic` of `dataBus`.
+    Subclasses implement `_run`, which returns once `stopEvent` is set.
+    """
+
+    def __init__(self, store: TelemetryStore, topic="telemetry"):
+        self.store = store
+        self.topic = topic
+        self.sinks = []
+        self.records = 0
+        self.stopEvent = threading.Event()
+        self._thread = None
+        self._pending = False
+        self._lastPublish = 0
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.isRunning():
+            return
+
+        self.stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        self.stopEvent.set()
+        if self.isRunning() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @staticmethod
+    def notifyInterval():
+        return 1 / cfg.get(cfg.telemetryNotifyRate)
+
+    def append(self, times, columns: dict):
+        """ store a batch and notify the GUI if the notify interval has passed """
+        self.store.append(times, columns)
+        for sink in self.sinks:
+            sink(times, columns)
+
+        dataBus.publish(self.topic, (times, columns))
+
+        self.records += len(times)
+        self._pending = True
+        self.publish()
+
+    def publish(self, force=False):
+        """ emit `telemetryUpdated` for the stored batches, sources call it while idle as well """
+        if not self._pending:
+            return
+
+        now = time.monotonic()
+        if force or now - self._lastPublish >= self.notifyInterval():
+            self._lastPublish = now
+            self._pending = False
+            self.store.updateStats()
+            signalBus.telemetryUpdated.emit(self.store)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class SSHTelemetrySource(TelemetrySource):
+    """ Reads the telemetry stream of the ROV from the `telemetry` logical channel
+
+    The stream is only read while the link is up, the link state machine
+    takes care of reconnecting. The format is detected from the first bytes:
+    binary frames described by a `TelemetrySchema` header, or newline
+    delimited JSON objects with the ROV time stamp `t` in seconds and one
+    value per channel. A stream which starts with a broken header is
+    logged, counted in `streamErrors` and reopened, so it resyncs on the
+    header the ROV sends on the new channel.
+    """
+
+    def __init__(self, store: TelemetryStore, channelName="telemetry", retryDelay=1):
+        super().__init__(store)
+        self.channelName = channelName
+        self.retryDelay = retryDelay
+        self.streamErrors = 0
+        self.decoder = None     # type: FrameDecoder
+
+    @property
+    def droppedFrames(self):
+        """ frames lost according to the sequence numbers of the binary stream """
+        return self.decoder.dropped if self.decoder else 0
+
+    def _run(self):
+        try:
+            while not self.stopEvent.is_set():
+                if sshSessionManager.current() is None:
+                    self.stopEvent.wait(0.2)
+                    continue
+
+                try:
+                    channel = channelMultiplexer.channel(self.channelName)
+                    self._read(channel)
+                except (EOFError, OSError, SSHException):
+                    channelMultiplexer.close(self.channelName)
+                    self.stopEvent.wait(0.2)
+                except ValueError as e:
+                    self.streamErrors += 1
+                    logger.warning("Malformed telemetry stream on %s, reopening it: %s", self.channelName, e)
+                    channelMultiplexer.close(self.channelName)
+                    self.stopEvent.wait(self.retryDelay)
+        finally:
+            channelMultiplexer.close(self.channelName)
+            self.publish(force=True)
+
+    def _read(self, channel):
+        # wake up at the notify rate to publish the last batch of a burst
+        channel.settimeout(self.notifyInterval())
+        data = b""
+        binary = None   # unknown until the first bytes arrive
+        decoder = None
+        while not self.stopEvent.is_set():
+            try:
+                chunk = channel.recv(65536)
+            except socket.timeout:
+                self.publish()
+                continue
+
+            if not chunk:
+                raise EOFError(f"Channel {self.channelName} closed")
+
+            data += chunk
+            if binary is None:
+                binary = data.startswith(HEADER_MAGIC[:len(data)])
+
+            if not binary:
+                lines = data.split(b"\n")
+                data = lines.pop()
+                if lines:
+                    self.append(*parseJsonRecords(lines))
+                continue
+
+            if decoder is None:
+                header = TelemetrySchema.parseHeader(data)
+                if header is None:
+                    continue
+
+                schema, size = header
+                decoder = self.decoder = FrameDecoder(schema)
+                data = data[size:]
+
+            frames, size = decoder.decode(data)
+            data = data[size:]
+            if len(frames):
+                self.append(frames["t"], {name: frames[name] for name in decoder.schema.channels})
+
+
+telemetryStore = TelemetryStore()
+sshTelemetrySource = SSHTelemetrySource(telemetryStore)
@@ -0,0 +1,137 @@
+# coding: utf-8
+import json
+import struct
+
+import numpy as np
+
+
+# first bytes of a binary telemetry stream, followed by the schema
+HEADER_MAGIC = b"ROVT"
+HEADER = struct.Struct("<4sH")      # magic, length of the JSON channel list
+
+# first bytes of every frame, used to find the next frame after corrupted bytes
+SYNC = b"\xa5\x5a"
+
+TELEMETRY_CHANNELS = ("depth", "heading", "pitch", "roll", "temperature", "voltage",
+                      "current1", "current2", "current3", "current4",     # thruster currents in A
+                      "leak")                                             # 1 if the leak sensor is wet
+
+
+class TelemetrySchema:
+    """ Layout of a binary telemetry frame
+
+    A frame is the sync word, a uint32 sequence number, the float64 ROV time
+    stamp `t` and one float32 per channel, little endian without padding.
+    The ROV sends its schema once at the start of the stream, so both sides
+    always agree on the layout. The `struct` and the NumPy `dtype` of a
+    frame are compiled once per schema.
+    """
+
+    def __init__(self, channels=TELEMETRY_CHANNELS):
+        self.channels = tuple(channels)
+        self.struct = struct.Struct("<2sId" + "f" * len(self.channels))
+        self.dtype = np.dtype(
+            [("sync", "S2"), ("seq", "<u4"), ("t", "<f8")] + [(c, "<f4") for c in self.channels])
+
+    @property
+    def frameSize(self):
+        return self.struct.size
+
+    def header(self) -> bytes:
+        channels = json.dumps(self.channels).encode()
+        return HEADER.pack(HEADER_MAGIC, len(channels)) + channels
+
+    @classmethod
+    def parseHeader(cls, buffer):
+        """ parse the schema at the start of a stream
+
+        :return: (schema, consumed bytes), None if the header is incomplete, raises `ValueError` if
+            the stream does not start with a valid header
+        """
+        if len(buffer) < HEADER.size:
+            return None
+
+        magic, size = HEADER.unpack_from(buffer)
+        if magic != HEADER_MAGIC:
+            raise ValueError("Not a binary telemetry stream")
+
+        if len(buffer) < HEADER.size + size:
+            return None
+
+        channels = json.loads(bytes(buffer[HEADER.size:HEADER.size + size]))
+        if not isinstance(channels, list) or not all(isinstance(c, str) for c in channels) or \
+                len(set(channels)) != len(channels) or {"sync", "seq", "t"} & set(channels):
+            raise ValueError(f"Invalid telemetry channels {channels!r}")
+
+        return cls(channels), HEADER.size + size
+
+    def encode(self, seq: int, t: float, values) -> bytes:
+        """ pack a single frame, as the ROV does """
+        return self.struct.pack(SYNC, seq & 0xFFFFFFFF, t, *values)
+
+    def encodeArray(self, seq, t, columns: dict) -> bytes:
+        """ pack a batch of frames from arrays """
+        frames = np.zeros(len(t), self.dtype)
+        frames["sync"] = SYNC
+        frames["seq"] = np.asarray(seq) & 0xFFFFFFFF
+        frames["t"] = t
+        for name in self.channels:
+            frames[name] = columns[name]
+
+        return frames.tobytes()
+
+
+class FrameDecoder:
+    """ Decodes a buffer of frames into a NumPy structured array in one call
+
+    The array is a view of the buffer, nothing is copied. Frames whose sync
+    word is wrong are skipped up to the next sync word, gaps in the
+    sequence numbers are counted in `dropped`.
+    """
+
+    def __init__(self, schema: TelemetrySchema):
+        self.schema = schema
+        self.nextSeq = None
+        self.dropped = 0
+        self.resyncs = 0
+
+    def decode(self, buffer):
+        """ decode the complete frames at the start of `buffer`
+
+        :return: (frames, consumed bytes), the bytes after `consumed` belong to an incomplete frame
+        """
+        view = memoryview(buffer).cast("B")
+        size, dtype = self.schema.frameSize, self.schema.dtype
+        parts = []
+        offset = 0
+        while len(view) - offset >= size:
+            n = (len(view) - offset) // size
+            frames = np.frombuffer(view, dtype, n, offset)
+            bad = np.flatnonzero(frames["sync"] != SYNC)
+            if not len(bad):
+                parts.append(frames)
+                offset += n * size
+                break
+
+            # keep the good frames and look for the next sync word
+            parts.append(frames[:bad[0]])
+            offset += int(bad[0]) * size
+            self.resyncs += 1
+            i = bytes(view[offset + 1:]).find(SYNC)
+            offset = offset + 1 + i if i >= 0 else len(view) - len(SYNC) + 1
+
+        frames = parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else np.empty(0, dtype)
+        self.__countDropped(frames["seq"])
+        return frames, offset
+
+    def __countDropped(self, seq):
+        if not len(seq):
+            return
+
+        seq = seq.astype(np.int64)
+        if self.nextSeq is not None:
+            seq = np.concatenate(([self.nextSeq - 1], seq))
+
+        gaps = (np.diff(seq) - 1) % 2 ** 32
+        self.dropped += int(gaps[gaps < 2 ** 31].sum())
+        self.nextSeq = int(seq[-1] + 1) % 2 ** 32
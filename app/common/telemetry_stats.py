@@ -0,0 +1,226 @@
+# coding: utf-8
+from collections import deque
+
+import numpy as np
+
+
+# channels with statistics, shown next to the charts
+STATS_CHANNELS = ("depth", "heading", "voltage")
+
+# channels in degrees which wrap around at 360
+CIRCULAR_CHANNELS = ("heading",)
+
+
+class RunningStats:
+    """ Count, mean, variance, min and max of every sample since the last clear
+
+    The mean and variance are updated with Welford's algorithm, a batch is
+    reduced with NumPy first and then merged in O(1), so the aggregates
+    never drift however long the dive is.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def extend(self, values):
+        values = np.asarray(values, np.float64)
+        values = values[np.isfinite(values)]
+        n = len(values)
+        if n == 0:
+            return
+
+        mean = values.mean()
+        m2 = np.square(values - mean).sum()
+        delta = mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def std(self):
+        return (self.m2 / self.count) ** 0.5 if self.count else np.nan
+
+    def clear(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+
+class WindowMinMax:
+    """ Min and max of the samples of the last `window` seconds, with monotonic deques
+
+    The min deque holds increasing values and the max deque decreasing
+    ones, both in time order, so the extremes are at the front. Only the
+    samples of a batch which are smaller, or larger, than every later
+    sample of the batch can ever be an extreme, they are found with NumPy
+    before touching the deques.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._min = deque()     # (time, value)
+        self._max = deque()
+
+    def extend(self, times, values):
+        times, values = np.asarray(times, np.float64), np.asarray(values, np.float64)
+        finite = np.isfinite(values)
+        times, values = times[finite], values[finite]
+        if not len(values):
+            return
+
+        self.__push(self._min, times, values, 1)
+        self.__push(self._max, times, values, -1)
+        self.expire(times[-1])
+
+    @staticmethod
+    def __push(queue: deque, times, values, sign):
+        signed = sign * values
+        # strictly smaller than the smallest later value of the batch
+        later = np.append(np.minimum.accumulate(signed[::-1])[::-1][1:], np.inf)
+        keep = np.flatnonzero(signed < later)
+
+        first = signed[keep[0]]
+        while queue and sign * queue[-1][1] >= first:
+            queue.pop()
+
+        queue.extend(zip(times[keep].tolist(), values[keep].tolist()))
+
+    def expire(self, now: float):
+        for queue in (self._min, self._max):
+            while queue and queue[0][0] < now - self.window:
+                queue.popleft()
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else np.nan
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else np.nan
+
+    def clear(self):
+        self._min.clear()
+        self._max.clear()
+
+
+def windowStats(times, values, circular=False):
+    """ mean, standard deviation and rate of change per second of a window of samples
+
+    The rate is the slope of a least squares line, so a single noisy
+    sample does not dominate it. Circular channels are unwrapped first.
+
+    :return: (mean, std, rate), NaN if there are too few samples
+    """
+    times, values = np.asarray(times, np.float64), np.asarray(values, np.float64)
+    finite = np.isfinite(values)
+    times, values = times[finite], values[finite]
+    if not len(values):
+        return np.nan, np.nan, np.nan
+
+    if circular:
+        values = np.unwrap(values, period=360)
+
+    mean = values.mean()
+    dt = times - times.mean()
+    spread = np.square(dt).sum()
+    rate = (dt * (values - mean)).sum() / spread if spread > 0 else np.nan
+    return (mean % 360 if circular else mean), values.std(), rate
+
+
+def circularRange(low, high):
+    """ min and max of unwrapped angles as headings, NaN once they cover the whole circle """
+    if high - low >= 360:
+        return np.nan, np.nan
+
+    return low % 360, high % 360
+
+
+class ChannelStats:
+    """ Statistics of a channel at the time of a telemetry update """
+
+    def __init__(self, mean, std, min, max, rate, diveMean, diveStd, diveMin, diveMax):
+        self.mean = mean
+        self.std = std
+        self.min = min
+        self.max = max
+        self.rate = rate
+        self.diveMean = diveMean
+        self.diveStd = diveStd
+        self.diveMin = diveMin
+        self.diveMax = diveMax
+
+
+class StatsEngine:
+    """ Rolling statistics of some telemetry channels
+
+    `update` runs for every batch and keeps the O(1) aggregates: the dive
+    statistics and the min and max of the window. `snapshot` computes the
+    window mean, deviation and rate over the samples of the window with
+    NumPy. It runs once per throttled telemetry update, not per widget.
+    The aggregates of a circular channel are kept on its unwrapped values,
+    so a heading swinging across north reads 355° to 5°, not 5° to 355°.
+    """
+
+    def __init__(self, channels=STATS_CHANNELS, window=10.0):
+        self.channels = tuple(channels)
+        self.window = window
+        self.running = {name: RunningStats() for name in self.channels}
+        self.minMax = {name: WindowMinMax(window) for name in self.channels}
+        self.unwrapped = {}     # last unwrapped value of each circular channel
+
+    def setWindow(self, window: float):
+        self.window = window
+        for minMax in self.minMax.values():
+            minMax.window = window
+
+    def update(self, times, columns: dict):
+        for name in self.channels:
+            if name in columns:
+                values = self.__unwrap(name, columns[name]) if name in CIRCULAR_CHANNELS else columns[name]
+                self.running[name].extend(values)
+                self.minMax[name].extend(times, values)
+            else:
+                self.minMax[name].expire(times[-1])
+
+    def __unwrap(self, name: str, values):
+        """ unwrap a batch of angles, continuing from the previous batch """
+        values = np.array(values, np.float64)
+        finite = np.isfinite(values)
+        angles = values[finite]
+        if not len(angles):
+            return values
+
+        last = self.unwrapped.get(name)
+        if last is None:
+            angles = np.unwrap(angles, period=360)
+        else:
+            angles = np.unwrap(np.concatenate(([last], angles)), period=360)[1:]
+
+        self.unwrapped[name] = angles[-1]
+        values[finite] = angles
+        return values
+
+    def snapshot(self, name: str, times, values):
+        """ statistics of a channel, `times` and `values` are the samples of the window """
+        running, minMax = self.running[name], self.minMax[name]
+        circular = name in CIRCULAR_CHANNELS
+        mean, std, rate = windowStats(times, values, circular)
+        low, high = minMax.min, minMax.max
+        diveMean, diveLow, diveHigh = (running.mean, running.min, running.max) if running.count else (np.nan,) * 3
+        if circular:
+            low, high = circularRange(low, high)
+            diveLow, diveHigh = circularRange(diveLow, diveHigh)
+            diveMean %= 360
+
+        return ChannelStats(mean, std, low, high, rate, diveMean, running.std, diveLow, diveHigh)
+
+    def clear(self):
+        self.unwrapped.clear()
+        for name in self.channels:
+            self.running[name].clear()
+            self.minMax[name].clear()
@@ -0,0 +1,87 @@
+# coding: utf-8
+import numpy as np
+
+from .config import cfg, DOF_NAMES
+
+
+class ThrusterMixer:
+    """ Turns the demands of the 6 degrees of freedom into thruster commands
+
+    The allocation matrix maps thruster commands to the force and torque
+    along each degree of freedom, the mixer is its pseudo-inverse,
+    computed once when the matrix changes. Its columns are scaled so that
+    a full demand along any single degree of freedom drives the busiest
+    thruster to the limit. A combined demand which would drive a thruster
+    past the limit scales the whole command vector down, so the thrust
+    keeps its direction instead of clipping single thrusters.
+    """
+
+    def __init__(self, allocation=None, limit=None):
+        self._state = None
+        self.setAllocation(allocation if allocation is not None else cfg.get(cfg.thrusterAllocation))
+        self.limit = limit
+
+    @property
+    def allocation(self):
+        return self._state[0]
+
+    @property
+    def mixer(self):
+        return self._state[1]
+
+    @property
+    def thrusters(self):
+        return self.allocation.shape[1]
+
+    def currentLimit(self):
+        """ largest thruster command, from 0 to 1 """
+        return self.limit if self.limit is not None else cfg.get(cfg.thrusterLimit) / 100
+
+    def setAllocation(self, allocation):
+        allocation = np.asarray(allocation, np.float64)
+        if allocation.ndim != 2 or allocation.shape[0] != len(DOF_NAMES):
+            raise ValueError(f"Expected a {len(DOF_NAMES)} row allocation matrix, got shape {allocation.shape}")
+
+        mixer = np.linalg.pinv(allocation)
+        peak = np.abs(mixer).max(axis=0)
+        mixer /= np.where(peak > 0, peak, 1)
+
+        # one assignment, so a mix on the control loop thread never sees half of a change
+        self._state = (allocation, np.ascontiguousarray(mixer), np.empty(allocation.shape[1]))
+
+    def mix(self, demand):
+        """ thruster commands of a demand, one value from -1 to 1 per degree of freedom
+
+        The result is a buffer which the next call overwrites, copy it to keep it.
+        """
+        _, mixer, out = self._state
+        np.dot(mixer, demand, out=out)
+        # a NumPy reduction over 8 values costs more than the product itself
+        peak = max(map(abs, out.tolist()))
+        limit = self.currentLimit()
+        if peak > limit:
+            out *= limit / peak
+
+        return out
+
+    def mixBatch(self, demands):
+        """ thruster commands of a sequence of demands, such as a recorded input
+
+        :param demands: array of shape (samples, 6)
+        :return: (commands of shape (samples, thrusters), scale applied to each sample)
+        """
+        demands = np.asarray(demands, np.float64).reshape(-1, len(DOF_NAMES))
+        commands = demands @ self.mixer.T
+        peak = np.abs(commands).max(axis=1)
+        limit = self.currentLimit()
+        scale = np.minimum(limit / np.where(peak > 0, peak, np.inf), 1)
+        commands *= scale[:, None]
+        return commands, scale
+
+    def wrench(self, commands):
+        """ force and torque along each degree of freedom produced by thruster commands """
+        return np.asarray(commands, np.float64) @ self.allocation.T
+
+
+thrusterMixer = ThrusterMixer()
+cfg.thrusterAllocation.valueChanged.connect(thrusterMixer.setAllocation)
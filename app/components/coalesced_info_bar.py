@@ -0,0 +1,127 @@
+# coding:utf-8
+from PyQt5.QtCore import Qt, QObject, QTimer
+from PyQt5.QtWidgets import QWidget
+
+from qfluentwidgets import InfoBar, InfoBarIcon, InfoBarPosition, PushButton, CaptionLabel
+
+from ..common.alarms import Alarm, AlarmSeverity
+
+
+class CoalescedInfoBars(QObject):
+    """ At most one InfoBar per key
+
+    Showing a key whose bar is still open updates that bar in place: the
+    repeat count goes to a counter label next to the content, a new title
+    or content is written to the bar's labels, and the bar keeps its
+    anchored edge while it resizes. Only a change of the icon replaces the
+    bar. A bar closes `duration` ms after its last update, or stays until
+    it is closed if `duration` is negative.
+    """
+
+    def __init__(self, parent: QWidget, position=InfoBarPosition.TOP_RIGHT):
+        super().__init__(parent=parent)
+        self.position = position
+        self.bars = {}          # type: dict[str, InfoBar]
+        self.countLabels = {}   # type: dict[str, CaptionLabel]
+        self.counts = {}
+        self.timers = {}        # type: dict[str, QTimer]
+
+    def show(self, key: str, icon: InfoBarIcon, title: str, content: str, duration=-1,
+             action=None, count=None):
+        """ show or update the bar of `key`
+
+        :param action: (button text, slot) of a button on a new bar
+        :param count: number shown next to the content, counted per call if None
+        """
+        bar = self.bars.get(key)
+        if bar is not None and bar.icon != icon:
+            self.close(key)
+            bar = None
+
+        self.counts[key] = count if count is not None else self.counts.get(key, 0) + 1
+        if bar is None:
+            bar = self.__createBar(key, icon, title, content, action)
+        elif (bar.title, bar.content) != (title, content):
+            self.__setText(bar, title, content)
+
+        n = self.counts[key]
+        self.countLabels[key].setText(self.tr("×{0}").format(n) if n > 1 else "")
+
+        timer = self.timers[key]
+        timer.stop()
+        if duration >= 0:
+            timer.start(duration)
+
+        return bar
+
+    def __createBar(self, key, icon, title, content, action):
+        bar = InfoBar(icon, title, content, Qt.Horizontal, True, -1, self.position, self.parent())
+        # wide enough for large counts, so that counting never resizes the bar
+        countLabel = self.countLabels[key] = CaptionLabel(bar)
+        countLabel.setMinimumWidth(countLabel.fontMetrics().width("×9999"))
+        bar.addWidget(countLabel)
+        if action is not None:
+            button = PushButton(action[0], bar)
+            button.clicked.connect(action[1])
+            bar.addWidget(button)
+
+        bar.closedSignal.connect(lambda: self.__onClosed(key, bar))
+        self.bars[key] = bar
+        if key not in self.timers:
+            timer = self.timers[key] = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda: self.close(key))
+
+        bar.show()
+        return bar
+
+    def __setText(self, bar: InfoBar, title: str, content: str):
+        """ write a new title and content to the labels of an open bar and keep its anchored edges """
+        geometry = bar.geometry()
+        bar.title, bar.content = title, content
+        bar.titleLabel.setText(title)
+        bar.titleLabel.setVisible(bool(title))
+        bar.contentLabel.setText(content)
+        bar.contentLabel.setVisible(bool(content))
+        bar.adjustSize()
+
+        x, y = geometry.x(), geometry.y()
+        if self.position in (InfoBarPosition.TOP_RIGHT, InfoBarPosition.BOTTOM_RIGHT):
+            x = geometry.right() + 1 - bar.width()
+        elif self.position in (InfoBarPosition.TOP, InfoBarPosition.BOTTOM):
+            x = geometry.center().x() - bar.width() // 2
+
+        if self.position in (InfoBarPosition.BOTTOM, InfoBarPosition.BOTTOM_LEFT, InfoBarPosition.BOTTOM_RIGHT):
+            y = geometry.bottom() + 1 - bar.height()
+
+        bar.move(x, y)
+
+    def __onClosed(self, key, bar):
+        if self.bars.get(key) is bar:
+            self.bars.pop(key)
+            self.countLabels.pop(key, None)
+            self.counts.pop(key, None)
+            self.timers[key].stop()
+
+    def close(self, key: str):
+        bar = self.bars.pop(key, None)
+        self.countLabels.pop(key, None)
+        self.counts.pop(key, None)
+        if bar is not None:
+            bar.close()
+
+    def showAlarm(self, alarm: Alarm):
+        """ show the state of an alarm, a cleared alarm closes after a few seconds """
+        if not alarm.active:
+            icon = InfoBarIcon.SUCCESS
+        elif alarm.severity == AlarmSeverity.CRITICAL:
+            icon = InfoBarIcon.ERROR
+        else:
+            icon = InfoBarIcon.WARNING
+
+        content = alarm.message if alarm.active else self.tr("Cleared, worst ") + alarm.message
+        if not alarm.active and alarm.value is None:
+            content = alarm.message
+
+        self.show(alarm.key, icon, self.tr(alarm.title), content, -1 if alarm.active else 5000,
+                  count=alarm.count)
@@ -0,0 +1,237 @@
+# coding:utf-8
+import time
+
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QPainter, QPixmap, QColor, QPen, QPolygonF, QFont
+from PyQt5.QtWidgets import QWidget
+
+from qfluentwidgets import isDarkTheme
+
+from ..common.telemetry import TelemetryStore
+
+
+def polyline(x, y):
+    """ build a QPolygonF from two arrays in bulk, writing into the memory of the polygon """
+    polygon = QPolygonF(len(x))
+    pointer = polygon.data()
+    pointer.setsize(len(x) * 2 * np.dtype(np.float64).itemsize)
+    points = np.frombuffer(pointer, np.float64).reshape(len(x), 2)
+    points[:, 0] = x
+    points[:, 1] = y
+    return polygon
+
+
+class StripChart(QWidget):
+    """ Scrolling chart of the latest `span` seconds of some telemetry channels
+
+    The traces are drawn into a cached pixmap. When new records arrive the
+    pixmap is scrolled left and only the new columns on the right are
+    drawn, from the downsampled data of the store. The whole pixmap is
+    only drawn again when the chart is resized, the span or the value
+    range changes, or the store is switched or cleared.
+    """
+
+    margins = (52, 30, 12, 10)   # left, top, right, bottom
+
+    def __init__(self, title: str, traces, span=30.0, valueRange=None, unit="", parent=None):
+        """
+        :param traces: list of (channel name, QColor)
+        :param valueRange: fixed (min, max) of the values, grows with the data if None
+        """
+        super().__init__(parent=parent)
+        self.title = title
+        self.traces = [(name, QColor(color)) for name, color in traces]
+        self.span = span
+        self.unit = unit
+        self.fixedRange = valueRange is not None
+        self.valueRange = tuple(valueRange) if valueRange else (np.inf, -np.inf)
+        self.store = None       # type: TelemetryStore
+        self.frameCost = 0      # seconds spent in the last update
+        self.latestValues = {}
+
+        self._pixmap = QPixmap()
+        self._rightTime = None  # time of the right edge of the pixmap
+        self._lastPoints = {}   # last point drawn of every trace, the next segment starts there
+        self.setMinimumHeight(160)
+
+    def plotRect(self):
+        left, top, right, bottom = self.margins
+        return self.rect().adjusted(left, top, -right, -bottom)
+
+    def pixelsPerSecond(self):
+        return max(self.plotRect().width(), 1) / self.span
+
+    def setSpan(self, span: float):
+        self.span = span
+        self.invalidate()
+
+    def setStore(self, store: TelemetryStore):
+        self.store = store
+        self.latestValues.clear()
+        if not self.fixedRange:
+            self.valueRange = (np.inf, -np.inf)
+
+        self.invalidate()
+
+    def invalidate(self):
+        """ draw the whole pixmap again on the next update """
+        self._rightTime = None
+        self._lastPoints.clear()
+
+    def updateFrom(self, store: TelemetryStore):
+        """ scroll the chart to the latest record of `store` and draw the new columns """
+        start = time.perf_counter()
+        if store is not self.store:
+            self.setStore(store)
+
+        end = store.endTime()
+        if end is None:
+            if self._rightTime is not None:
+                self.invalidate()
+                self._pixmap.fill(Qt.transparent)
+                self.update()
+            return
+
+        rect = self.plotRect()
+        size = rect.size() * self.devicePixelRatioF()
+        if self._pixmap.size() != size:
+            self._pixmap = QPixmap(size)
+            self._pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+            self.invalidate()
+
+        pps = self.pixelsPerSecond()
+        if self._rightTime is None or end < self._rightTime:
+            self.__redraw(end)
+        else:
+            dx = int((end - self._rightTime) * pps)
+            if dx >= rect.width():
+                self.__redraw(end)
+            elif dx > 0:
+                self.__scroll(dx)
+
+        self.update()
+        self.frameCost = time.perf_counter() - start
+
+    def __redraw(self, end: float):
+        self._pixmap.fill(Qt.transparent)
+        self._lastPoints.clear()
+        self._rightTime = end
+        if not self.__draw(end - self.span, end, self.plotRect().width()):
+            self.__redraw(end)
+
+    def __scroll(self, dx: int):
+        ratio = self.devicePixelRatioF()
+        width = self.plotRect().width()
+        self._pixmap.scroll(-round(dx * ratio), 0, self._pixmap.rect())
+
+        painter = QPainter(self._pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(QRectF(width - dx, 0, dx, self.plotRect().height()), Qt.transparent)
+        painter.end()
+
+        # keep the fraction of a pixel for the next update, so the chart does not drift
+        start = self._rightTime
+        self._rightTime += dx / self.pixelsPerSecond()
+        if not self.__draw(start, self._rightTime, dx + 1):
+            self.__redraw(self._rightTime)
+
+    def __draw(self, t0: float, t1: float, pixels: int):
+        """ draw the traces between `t0` and `t1` into the pixmap
+
+        :return: False if the value range had to grow, the pixmap must be drawn again then
+        """
+        rect = self.plotRect()
+        pps = self.pixelsPerSecond()
+        lo, hi = self.valueRange
+
+        series = []
+        for name, color in self.traces:
+            try:
+                t, y = self.store.downsample(name, t0, t1, pixels)
+            except KeyError:
+                continue
+
+            finite = np.isfinite(y)
+            t, y = t[finite], y[finite]
+            if not len(t):
+                continue
+
+            last = self._lastPoints.get(name)
+            if last is not None and last[0] < t[0]:
+                t, y = np.concatenate(([last[0]], t)), np.concatenate(([last[1]], y))
+
+            self._lastPoints[name] = (t[-1], y[-1])
+            self.latestValues[name] = y[-1]
+            series.append((t, y, color))
+            lo, hi = min(lo, y.min()), max(hi, y.max())
+
+        if not self.fixedRange and (lo, hi) != self.valueRange:
+            # grow by a margin, so the range does not change with every new extreme
+            margin = (hi - lo) * 0.1 or 1.0
+            self.valueRange = (lo - margin if lo < self.valueRange[0] else lo,
+                               hi + margin if hi > self.valueRange[1] else hi)
+            self._pixmap.fill(Qt.transparent)
+            self._lastPoints.clear()
+            return False
+
+        lo, hi = self.valueRange
+        scale = rect.height() / ((hi - lo) or 1.0)
+        painter = QPainter(self._pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        for t, y, color in series:
+            # wider pens are stroked as paths, which is orders of magnitude slower
+            pen = QPen(color, 1)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawPolyline(polyline(rect.width() - (self._rightTime - t) * pps, (hi - y) * scale))
+
+        painter.end()
+        return True
+
+    def paintEvent(self, e):
+        painter = QPainter(self)
+        rect = self.plotRect()
+        dark = isDarkTheme()
+        textColor = QColor(255, 255, 255, 200) if dark else QColor(0, 0, 0, 200)
+        gridColor = QColor(255, 255, 255, 24) if dark else QColor(0, 0, 0, 24)
+
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(255, 255, 255, 13) if dark else QColor(255, 255, 255, 170))
+        painter.drawRoundedRect(QRectF(self.rect()).adjusted(0.5, 0.5, -0.5, -0.5), 6, 6)
+
+        # horizontal grid and value labels
+        font = QFont(self.font())
+        font.setPixelSize(11)
+        painter.setFont(font)
+        lo, hi = self.valueRange
+        for i in range(5 if lo <= hi else 0):
+            y = rect.top() + rect.height() * i / 4
+            painter.setPen(gridColor)
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+            painter.setPen(textColor)
+            painter.drawText(QRectF(0, y - 8, rect.left() - 6, 16), Qt.AlignRight | Qt.AlignVCenter,
+                             f"{hi - (hi - lo) * i / 4:.3g}")
+
+        if not self._pixmap.isNull():
+            painter.drawPixmap(rect.topLeft(), self._pixmap)
+
+        # title and legend with the latest values
+        font.setPixelSize(13)
+        painter.setFont(font)
+        painter.setPen(textColor)
+        x = rect.left()
+        title = f"{self.title} ({self.unit})" if self.unit else self.title
+        painter.drawText(QRectF(x, 4, rect.width(), 20), Qt.AlignLeft | Qt.AlignVCenter, title)
+        x += painter.fontMetrics().horizontalAdvance(title) + 16
+        for name, color in self.traces:
+            value = self.latestValues.get(name)
+            text = f"{name} {value:.2f}" if value is not None else name
+            painter.setPen(color)
+            painter.drawText(QRectF(x, 4, rect.right() - x, 20), Qt.AlignLeft | Qt.AlignVCenter, text)
+            x += painter.fontMetrics().horizontalAdvance(text) + 12
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        if self.store is not None:
+            self.updateFrom(self.store)
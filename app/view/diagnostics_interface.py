@@ -0,0 +1,214 @@
+# coding:utf-8
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QTableWidgetItem, QHeaderView
+
+from qfluentwidgets import (ScrollArea, TitleLabel, BodyLabel, CaptionLabel, StrongBodyLabel, PushButton,
+                            TableWidget, InfoBar)
+from qfluentwidgets import FluentIcon as FIF
+
+from ..common.control_loop import controlLoop, ControlLoopStats
+from ..common.control_trace import STAGES
+from ..common.data_bus import dataBus
+from ..common.signal_bus import signalBus
+
+
+STAGE_DESCRIPTIONS = {
+    "read": "Gamepad report until read",
+    "wait": "Read until the control tick",
+    "mix": "Thruster mixing",
+    "encode": "Frame encoding",
+    "uplink": "Topside to ROV",
+    "apply": "Applied on the ROV",
+    "downlink": "ROV to topside",
+    "rtt": "Acknowledgement round trip",
+    "total": "Stick input to actuation",
+}
+
+
+class StageTable(TableWidget):
+    """ Latency percentiles of each stage of a control frame """
+
+    columns = ("Stage", "Samples", "p50 (ms)", "p95 (ms)", "p99 (ms)")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.verticalHeader().hide()
+        self.setBorderRadius(8)
+        self.setBorderVisible(True)
+        self.setEditTriggers(self.NoEditTriggers)
+        self.setColumnCount(len(self.columns))
+        self.setRowCount(len(STAGES))
+        self.setHorizontalHeaderLabels([self.tr(c) for c in self.columns])
+        for i, stage in enumerate(STAGES):
+            self.setItem(i, 0, QTableWidgetItem(self.tr(STAGE_DESCRIPTIONS[stage])))
+            for j in range(1, len(self.columns)):
+                item = QTableWidgetItem("-")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.setItem(i, j, item)
+
+        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        for j in range(1, len(self.columns)):
+            self.setColumnWidth(j, 110)
+
+        self.setFixedHeight(self.horizontalHeader().height() +
+                            self.verticalHeader().defaultSectionSize() * len(STAGES) + 8)
+
+    def setSummary(self, stages: dict):
+        for i, stage in enumerate(STAGES):
+            values = stages[stage]
+            self.item(i, 1).setText(str(values["n"]))
+            for j, q in enumerate(("p50", "p95", "p99"), 2):
+                self.item(i, j).setText("-" if values[q] is None else f"{values[q] * 1000:.2f}")
+
+
+class DataBusTable(TableWidget):
+    """ Queue and counters of every subscription of `dataBus` """
+
+    columns = ("Topic", "Subscriber", "Policy", "Max rate", "Queue", "Published", "Delivered", "Dropped",
+               "Errors")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.verticalHeader().hide()
+        self.setBorderRadius(8)
+        self.setBorderVisible(True)
+        self.setEditTriggers(self.NoEditTriggers)
+        self.setColumnCount(len(self.columns))
+        self.setHorizontalHeaderLabels([self.tr(c) for c in self.columns])
+        self.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        for j in range(2, len(self.columns)):
+            self.setColumnWidth(j, 90)
+
+        self.setCounters([])
+
+    def setCounters(self, counters: list):
+        self.setRowCount(len(counters))
+        for i, (topic, name, policy, maxRate, *values) in enumerate(counters):
+            texts = [topic, name, policy.value, "Frame" if maxRate is None else f"{maxRate:g} Hz"]
+            texts += [str(v) for v in values]
+            for j, text in enumerate(texts):
+                item = QTableWidgetItem(text)
+                if j >= 3:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+                self.setItem(i, j, item)
+
+        self.setFixedHeight(self.horizontalHeader().height() +
+                            self.verticalHeader().defaultSectionSize() * max(len(counters), 1) + 8)
+
+
+class DiagnosticsInterface(ScrollArea):
+    """ Diagnostics interface, the latency of the control path from the stick to the ROV and the data bus """
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self.view = QWidget(self)
+        self.vBoxLayout = QVBoxLayout(self.view)
+        self.toolBar = QWidget(self.view)
+        self.toolBarLayout = QHBoxLayout(self.toolBar)
+        self.titleLabel = TitleLabel(self.tr("Diagnostics"), self.toolBar)
+        self.clearButton = PushButton(FIF.DELETE, self.tr("Clear"), self.toolBar)
+        self.exportButton = PushButton(FIF.SAVE, self.tr("Export"), self.toolBar)
+
+        self.latencyLabel = StrongBodyLabel(self.tr("Input to actuation"), self.view)
+        self.clockLabel = CaptionLabel(self.view)
+        self.stageTable = StageTable(self.view)
+        self.loopLabel = StrongBodyLabel(self.tr("Control loop"), self.view)
+        self.loopStatsLabel = BodyLabel(self.view)
+        self.busLabel = StrongBodyLabel(self.tr("Data bus"), self.view)
+        self.busStatsLabel = CaptionLabel(self.view)
+        self.busTable = DataBusTable(self.view)
+        self.busTimer = QTimer(self)
+
+        self.__initWidget()
+
+    def __initWidget(self):
+        self.setObjectName('diagnosticsInterface')
+        self.view.setObjectName('view')
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setWidget(self.view)
+        self.setWidgetResizable(True)
+        self.enableTransparentBackground()
+
+        self.toolBarLayout.setContentsMargins(0, 0, 0, 0)
+        self.toolBarLayout.setSpacing(8)
+        self.toolBarLayout.addWidget(self.titleLabel)
+        self.toolBarLayout.addStretch(1)
+        self.toolBarLayout.addWidget(self.clearButton)
+        self.toolBarLayout.addWidget(self.exportButton)
+
+        self.loopStatsLabel.setWordWrap(True)
+
+        self.vBoxLayout.setSpacing(12)
+        self.vBoxLayout.setContentsMargins(36, 30, 36, 36)
+        self.vBoxLayout.addWidget(self.toolBar)
+        self.vBoxLayout.addWidget(self.latencyLabel)
+        self.vBoxLayout.addWidget(self.clockLabel)
+        self.vBoxLayout.addWidget(self.stageTable)
+        self.vBoxLayout.addSpacing(12)
+        self.vBoxLayout.addWidget(self.loopLabel)
+        self.vBoxLayout.addWidget(self.loopStatsLabel)
+        self.vBoxLayout.addSpacing(12)
+        self.vBoxLayout.addWidget(self.busLabel)
+        self.vBoxLayout.addWidget(self.busStatsLabel)
+        self.vBoxLayout.addWidget(self.busTable)
+        self.vBoxLayout.addStretch(1)
+
+        self.clearButton.clicked.connect(self.__onClearButtonClicked)
+        self.exportButton.clicked.connect(self.__onExportButtonClicked)
+        signalBus.controlLoopUpdated.connect(self.onControlLoopUpdated)
+        self.onControlLoopUpdated(controlLoop.stats)
+
+        # the bus counters are polled while the page is shown
+        self.busTimer.timeout.connect(self.updateDataBus)
+        self.busTimer.setInterval(500)
+
+    def onControlLoopUpdated(self, stats: ControlLoopStats):
+        # the traces keep being recorded while hidden, the page catches up once shown
+        if not self.isVisible():
+            return
+
+        summary = controlLoop.tracer.summary()
+        self.stageTable.setSummary(summary["stages"])
+        if summary["offset"] is None:
+            self.clockLabel.setText(self.tr("{} frames traced, ROV clock not synchronized").format(
+                summary["frames"]))
+        else:
+            self.clockLabel.setText(self.tr("{} frames traced, ROV clock offset {:+.3f} s (± {:.2f} ms)").format(
+                summary["frames"], summary["offset"], summary["offsetError"] * 1000))
+
+        self.loopStatsLabel.setText(str(stats))
+
+    def updateDataBus(self):
+        state = self.tr("running") if dataBus.isActive() else self.tr("idle")
+        self.busStatsLabel.setText(self.tr("Frame timer {}, last frame {:.2f} ms").format(
+            state, dataBus.drainTime * 1000))
+        self.busTable.setCounters(dataBus.counters())
+
+    def __onClearButtonClicked(self):
+        controlLoop.clear()
+        self.onControlLoopUpdated(controlLoop.stats)
+
+    def __onExportButtonClicked(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, self.tr("Export control traces"), "control_trace.csv", self.tr("CSV (*.csv);;JSON (*.json)"))
+        if not path:
+            return
+
+        try:
+            controlLoop.tracer.export(path)
+        except OSError as e:
+            InfoBar.error(self.tr("Export failed"), str(e), duration=5000, parent=self)
+            return
+
+        InfoBar.success(self.tr("Exported"), path, duration=3000, parent=self)
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.onControlLoopUpdated(controlLoop.stats)
+        self.updateDataBus()
+        self.busTimer.start()
+
+    def hideEvent(self, e):
+        super().hideEvent(e)
+        self.busTimer.stop()
@@ -11,6 +11,7 @@ from .gallery_interface import GalleryInterface
 from .home_interface import HomeInterface
 from .basic_input_interface import BasicInputInterface
 from .date_time_interface import DateTimeInterface
+from .diagnostics_interface import DiagnosticsInterface
 from .dialog_interface import DialogInterface
 from .layout_interface import LayoutInterface
 from .icon_interface import IconInterface
@@ -20,16 +21,33 @@ from .navigation_view_interface import NavigationViewInterface
 from .scroll_interface import ScrollInterface
 from .status_info_interface import StatusInfoInterface
 from .setting_interface import SettingInterface
+from .telemetry_interface import TelemetryInterface
 from .text_interface import TextInterface
 from .view_interface import ViewInterface
-from ..common.config import cfg
+from ..common.alarms import alarmEngine
+from ..common.config import cfg, DOF_NAMES
+from ..common.control_loop import controlLoop
+from ..common.data_bus import dataBus, DeliveryPolicy
+from ..common.gamepad import gamepadPoller
 from ..common.icon import Icon
+from ..common.async_engine import asyncEngine
+from ..common.link_monitor import linkMonitor
+from ..common.link_state import LinkState, linkStateMachine
 from ..common.signal_bus import signalBus
+from ..common.signal_trace import signalTracer
+from ..common.ssh_channels import channelMultiplexer
+from ..common.ssh_session import sshSessionManager
+from ..common.recorder import diveRecorder
+from ..common.replay import replaySource
+from ..common.telemetry import sshTelemetrySource, telemetryStore
 from ..common.translator import Translator
 from ..common import resource
+from ..components.coalesced_info_bar import CoalescedInfoBars
 
 import time
 
+import numpy as np
+
 class MainWindow(FluentWindow):
 
     def __init__(self):
@@ -41,6 +59,7 @@ class MainWindow(FluentWindow):
 
         # create sub interface
         self.homeInterface = HomeInterface(self)
+        self.telemetryInterface = TelemetryInterface(self)
         # self.iconInterface = IconInterface(self)
         # self.basicInputInterface = BasicInputInterface(self)
         # self.dateTimeInterface = DateTimeInterface(self)
@@ -51,10 +70,14 @@ class MainWindow(FluentWindow):
         # self.navigationViewInterface = NavigationViewInterface(self)
         # self.scrollInterface = ScrollInterface(self)
         # self.statusInfoInterface = StatusInfoInterface(self)
+        self.diagnosticsInterface = DiagnosticsInterface(self)
         self.settingInterface = SettingInterface(self)
         # self.textInterface = TextInterface(self)
         # self.viewInterface = ViewInterface(self)
 
+        # one bar per alarm, whichever page is shown
+        self.alarmInfoBars = CoalescedInfoBars(self)
+
         # enable acrylic effect
         self.navigationInterface.setAcrylicEnabled(True)
 
@@ -67,8 +90,34 @@ class MainWindow(FluentWindow):
         # start theme listener
         self.themeListener.start()
 
+        # deliver the high frequency topics once per frame
+        dataBus.start()
+
+        # start link heartbeat and supervisor
+        linkMonitor.start()
+        linkStateMachine.start()
+        sshTelemetrySource.start()
+        controlLoop.start()
+
+        # record the telemetry of every dive
+        sshTelemetrySource.sinks.append(diveRecorder.write)
+        # alarms run on the GUI thread, off the reader, the batches are queued on the bus
+        dataBus.subscribe(sshTelemetrySource.topic, alarmEngine.evaluateBatches, policy=DeliveryPolicy.BATCH)
+        self.onRecordingEnabledChanged(cfg.get(cfg.recordingEnabled))
+        signalTracer.setEnabled(cfg.get(cfg.signalTracingEnabled))
+        self.onGamepadEnabledChanged(cfg.get(cfg.gamepadEnabled))
+
     def connectSignalToSlot(self):
         signalBus.micaEnableChanged.connect(self.setMicaEffectEnabled)
+        cfg.recordingEnabled.valueChanged.connect(self.onRecordingEnabledChanged)
+        cfg.telemetryStatsWindow.valueChanged.connect(self.onStatsWindowChanged)
+        cfg.signalTracingEnabled.valueChanged.connect(signalTracer.setEnabled)
+        cfg.gamepadEnabled.valueChanged.connect(self.onGamepadEnabledChanged)
+        cfg.gamepadDevice.valueChanged.connect(self.onGamepadDeviceChanged)
+        cfg.controlLowLatency.valueChanged.connect(controlLoop.setLowLatency)
+        signalBus.linkStateChanged.connect(alarmEngine.onLinkStateChanged)
+        signalBus.linkStateChanged.connect(self.onLinkStateChanged)
+        signalBus.alarmChanged.connect(self.alarmInfoBars.showAlarm)
         signalBus.switchToSampleCard.connect(self.switchToSample)
         # signalBus.supportSignal.connect(self.onSupport)
 
@@ -76,6 +125,7 @@ class MainWindow(FluentWindow):
         # add navigation items
         t = Translator()
         self.addSubInterface(self.homeInterface, FIF.HOME, self.tr('Home'))
+        self.addSubInterface(self.telemetryInterface, FIF.MARKET, self.tr('Telemetry'))
         # self.addSubInterface(self.iconInterface, Icon.EMOJI_TAB_SYMBOLS, t.icons)
         self.navigationInterface.addSeparator()
 
@@ -102,6 +152,8 @@ class MainWindow(FluentWindow):
         #     tooltip=t.price,
         #     position=NavigationItemPosition.BOTTOM
         # )
+        self.addSubInterface(
+            self.diagnosticsInterface, FIF.SPEED_HIGH, self.tr('Diagnostics'), NavigationItemPosition.BOTTOM)
         self.addSubInterface(
             self.settingInterface, FIF.SETTING, self.tr('Settings'), NavigationItemPosition.BOTTOM)
 
@@ -129,9 +181,61 @@ class MainWindow(FluentWindow):
         if hasattr(self, 'splashScreen'):
             self.splashScreen.resize(self.size())
 
+    def onRecordingEnabledChanged(self, enabled: bool):
+        """ a new dive folder is started each time recording is enabled """
+        if enabled:
+            diveRecorder.start()
+        else:
+            diveRecorder.stop()
+
+    def onGamepadEnabledChanged(self, enabled: bool):
+        """ the gamepad drives the thrusters while enabled, the thrusters stop when it is disabled """
+        if enabled:
+            gamepadPoller.start()
+            controlLoop.sourceInput = gamepadPoller.demandInput
+            controlLoop.source = self.gamepadDemand
+        else:
+            controlLoop.source = None
+            controlLoop.sourceInput = None
+            gamepadPoller.stop()
+
+    def onGamepadDeviceChanged(self, path: str):
+        """ open the chosen device, a running replay hands over to it when it ends """
+        if cfg.get(cfg.gamepadEnabled) and not gamepadPoller.isReplaying():
+            gamepadPoller.stop()
+            gamepadPoller.start()
+
+    @staticmethod
+    def gamepadDemand():
+        """ demand of the gamepad for the control loop, a replayed recording never drives the thrusters """
+        if gamepadPoller.isReplaying():
+            return np.zeros(len(DOF_NAMES))
+
+        return gamepadPoller.demand()
+
+    def onLinkStateChanged(self, old: LinkState, new: LinkState):
+        """ the gamepad takes over from a replay as soon as the link to the ROV is being set up """
+        if old == LinkState.DISCONNECTED and gamepadPoller.isReplaying():
+            gamepadPoller.stopReplay()
+
+    def onStatsWindowChanged(self, window: int):
+        for store in (telemetryStore, replaySource.store):
+            store.statsEngine.setWindow(window)
+
     def closeEvent(self, e):
         self.themeListener.terminate()
         self.themeListener.deleteLater()
+        linkStateMachine.stop()
+        sshTelemetrySource.stop()
+        controlLoop.stop()
+        gamepadPoller.stop()
+        replaySource.stop()
+        diveRecorder.stop()
+        linkMonitor.stop()
+        asyncEngine.stop()
+        dataBus.stop()
+        channelMultiplexer.close()
+        sshSessionManager.closeAll()
         super().closeEvent(e)
 
     def _onThemeChangedFinished(self):
@@ -8,32 +8,34 @@ from qfluentwidgets import (SettingCardGroup, SwitchSettingCard, FolderListSetti
                             FluentIconBase, LineEdit, qconfig, PrimaryPushButton, PushButton,
                             IndeterminateProgressBar, MessageBoxBase, InfoBarPosition,
                             SubtitleLabel, CaptionLabel, BodyLabel, SpinBox, PasswordLineEdit,
-                            CheckBox, SwitchButton)
+                            CheckBox, SwitchButton, RangeSettingCard, ProgressBar, ListWidget, ComboBox,
+                            PlainTextEdit, TransparentToolButton)
 from qfluentwidgets import FluentIcon as FIF
-from qfluentwidgets import InfoBar
-from PyQt5.QtCore import Qt, pyqtSignal, QUrl, QPoint, QEventLoop, QTimer, pyqtSlot
+from qfluentwidgets import InfoBar, InfoBarIcon
+from PyQt5.QtCore import Qt, pyqtSignal, QUrl, QPoint, pyqtSlot
 from PyQt5.QtGui import QDesktopServices, QIcon, QColor
 from PyQt5.QtWidgets import QWidget, QLabel, QFileDialog, QHBoxLayout, QPushButton, QVBoxLayout, QSizePolicy
 
-from ..common.config import Config, cfg, HELP_URL, FEEDBACK_URL, AUTHOR, VERSION, YEAR, RELEASE_URL, isWin11
+from ..common.config import Config, cfg, SSHProfile, DOF_NAMES, AllocationValidator, HELP_URL, FEEDBACK_URL, AUTHOR, VERSION, YEAR, RELEASE_URL, isWin11
+from ..common.latency_stats import HISTOGRAM_EDGES
+from ..common.gamepad import findGamepads, gamepadPoller
+from ..common.link_monitor import LinkQuality
+from ..common.link_state import LinkState, linkStateMachine
+from ..common.replay import replaySource
+from ..common.sftp_transfer import SFTPTransferEngine
 from ..common.signal_bus import signalBus
+from ..common.signal_trace import signalTracer
+from ..common.ssh_check import SSHCheckEngine
+from ..common.ssh_discovery import SSHDiscovery, parseCandidates
+from ..common.ssh_session import sshSessionManager
 from ..common.style_sheet import StyleSheet
+from ..components.coalesced_info_bar import CoalescedInfoBars
 
-import paramiko, socket, time
+import ipaddress
+import socket
 from datetime import datetime
 from paramiko import SSHException, AuthenticationException
 
-import threading
-import functools
-
-def threaded_func(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        thread = threading.Thread(target=func, args=args, kwargs=kwargs)
-        thread.start()
-        return thread  # 如果需要返回线程对象，可以返回它，否则可以选择不返回
-    return wrapper
-
 
 class CustomSSHSettingCard(ExpandGroupSettingCard):
     sshUpdated = pyqtSignal(bool)
@@ -46,8 +48,18 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.configPort = configItems.sshPort
         self.configUsername = configItems.sshUser
         self.configPassword = configItems.sshPassword
-        self.connectionStatus = "Unknown"
+        self.configKeyFile = configItems.sshKeyFile
+        self.configProfile = configItems.sshAlgorithmProfile
+        self.checkResult = None     # "Success", "Failed" or "Unknown" of the last check, None while checking
         self.sshMessage = "NONE"
+        self.checkInit = False
+
+        self.checkEngine = SSHCheckEngine(
+            self.__checkSSHConnection, abortFunc=sshSessionManager.abort, parent=self)
+        self.checkEngine.checkStarted.connect(self.__onCheckStarted)
+        self.checkEngine.checkFinished.connect(self.__onCheckFinished)
+        self.checkEngine.checkCancelled.connect(
+            lambda: self.__onCheckFinished("Unknown", self.tr("SSH Connection Check Cancelled")))
 
         self.Widget = QWidget(self.view)
         self.Layout = QHBoxLayout(self.Widget)
@@ -60,6 +72,10 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.sshPort = QLabel(self.Widget)
         self.sshUserLabel = QLabel(self.Widget)
         self.passwordLabel = QLabel(self.Widget)
+        self.keyFileLabel = QLabel(self.Widget)
+        self.profileLabel = QLabel(self.Widget)
+        self.linkQualityLabel = QLabel(self.Widget)
+        self.linkStateLabel = QLabel(self.Widget)
         self.editButton.clicked.connect(self.showSSHSettingsBox)
 
         self.checkWidget = QWidget(self.view)
@@ -70,7 +86,7 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
             self.tr('View Details'), self.checkWidget)
         self.checkButton = PrimaryPushButton(
             self.tr("Check SSH Connection"), self.checkWidget)
-        self.checkButton.clicked.connect(self.updateSSHStatus)
+        self.checkButton.clicked.connect(self.__onCheckButtonClicked)
         self.detailButton.clicked.connect(self.showSSHDetail)
 
         self.__initWidget()
@@ -82,8 +98,16 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.sshPort.setObjectName("titleLabel")
         self.sshUserLabel.setObjectName("titleLabel")
         self.passwordLabel.setObjectName("titleLabel")
+        self.keyFileLabel.setObjectName("titleLabel")
+        self.profileLabel.setObjectName("titleLabel")
+        self.linkQualityLabel.setObjectName("titleLabel")
+        self.linkStateLabel.setObjectName("titleLabel")
         self.checkLabel.setObjectName("titleLabel")
         self.__updateLabel()
+        self.updateLinkQuality(LinkQuality())
+        signalBus.linkQualityUpdated.connect(self.updateLinkQuality)
+        self.updateLinkState(None, linkStateMachine.state)
+        signalBus.linkStateChanged.connect(self.updateLinkState)
 
         self.updateSSHStatus(init=True)
     
@@ -95,6 +119,10 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.leftLayout.addWidget(self.sshPort, 0, Qt.AlignLeft)
         self.leftLayout.addWidget(self.sshUserLabel, 0, Qt.AlignLeft)
         self.leftLayout.addWidget(self.passwordLabel, 0, Qt.AlignLeft)
+        self.leftLayout.addWidget(self.keyFileLabel, 0, Qt.AlignLeft)
+        self.leftLayout.addWidget(self.profileLabel, 0, Qt.AlignLeft)
+        self.leftLayout.addWidget(self.linkStateLabel, 0, Qt.AlignLeft)
+        self.leftLayout.addWidget(self.linkQualityLabel, 0, Qt.AlignLeft)
 
         self.rightLayout.addWidget(self.editButton, 0, Qt.AlignRight | Qt.AlignTop)
         
@@ -120,90 +148,144 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.sshPort.setText(self.tr("SSH Connection Port: ") + str(qconfig.get(self.configPort)))
         self.sshUserLabel.setText(self.tr("SSH Username: ") + qconfig.get(self.configUsername))
         self.passwordLabel.setText(self.tr("SSH Password: ") + qconfig.get(self.configPassword))
+        self.keyFileLabel.setText(self.tr("SSH Key File: ") + (qconfig.get(self.configKeyFile) or self.tr("None")))
+        self.profileLabel.setText(self.tr("Algorithm Profile: ") + qconfig.get(self.configProfile).value)
         
         self.sshLinkLabel.adjustSize()
         self.sshPort.adjustSize()
         self.sshUserLabel.adjustSize()
         self.passwordLabel.adjustSize()
+        self.keyFileLabel.adjustSize()
+        self.profileLabel.adjustSize()
+
+    @property
+    def connectionStatus(self) -> LinkState:
+        """ status of the connection, the state of the supervised link """
+        return linkStateMachine.state
+
+    def updateLinkState(self, old: LinkState, new: LinkState):
+        self.linkStateLabel.setText(self.tr("Link State: ") + new.value)
+        self.linkStateLabel.adjustSize()
+        self.__updateCheckLabel()
+
+    def __updateCheckLabel(self):
+        if self.checkEngine.isChecking():
+            self.checkLabel.setText(self.tr("Checking Connection: "))
+        else:
+            self.checkLabel.setText(self.tr("Connection Status: ") + self.connectionStatus.value)
+
+        self.checkLabel.adjustSize()
+
+    def updateLinkQuality(self, quality: LinkQuality):
+        self.linkQualityLabel.setText(self.tr("Link Quality: ") + str(quality))
+        self.linkQualityLabel.adjustSize()
 
     def __checkSSHConnection(self):
         """
-        测试 SSH 连接
+        测试 SSH 连接, 复用 sshSessionManager 中已认证的会话
 
-        :param hostname: SSH 服务器的主机名或 IP 地址
-        :param port: SSH 端口号，默认为 22
-        :param username: SSH 用户名
-        :param password: SSH 密码
-        :return: (success, message) 其中 success 是布尔值，表示连接是否成功；message 是状态信息
+        :return: (status, message) 其中 status 为 "Success" 或 "Failed"; message 是状态信息
         """
-        client = paramiko.SSHClient()
-        # 自动添加未知的主机密钥，避免提示
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        config = " \nConfig: [SSH Address: {0}, SSH Port: {1}, Username: {2}, Passowrd: {3}]".format(
+        config = " \nConfig: [SSH Address: {0}, SSH Port: {1}, Username: {2}, Passowrd: {3}, " \
+                 "Key File: {4}, Profile: {5}]".format(
             qconfig.get(self.configSsh), qconfig.get(self.configPort),
-            qconfig.get(self.configUsername), qconfig.get(self.configPassword))
+            qconfig.get(self.configUsername), qconfig.get(self.configPassword),
+            qconfig.get(self.configKeyFile) or "None", qconfig.get(self.configProfile).value)
         utctime = datetime.now()
         utctimeconfig = " \nCheck Connection at {0}; {1}".format(
             utctime, utctime.timestamp())
         try:
-            # 尝试连接 SSH 服务器
-            client.connect(
-                qconfig.get(self.configSsh), port=qconfig.get(self.configPort), 
-                username=qconfig.get(self.configUsername), password=qconfig.get(self.configPassword), timeout=5)
+            # 仅在会话失效或配置变更时重新握手
+            session, reused, rtt = sshSessionManager.ping(timeout=5)
+            sessionInfo = " \nSession: {0}, Round Trip: {1:.1f} ms".format(
+                "Reused" if reused else "New Handshake", rtt * 1000)
+            if not reused:
+                sessionInfo += " \nHandshake: " + ", ".join(
+                    f"{k.upper()} {v * 1000:.1f} ms" for k, v in session.timings.items())
+            sessionInfo += " \nCipher: {0}, MAC: {1}".format(*session.algorithms)
             # 如果连接成功，返回成功信息
-            return "Success", self.tr("SSH Connection Status: Success!") + config + utctimeconfig
-                
+            return "Success", self.tr("SSH Connection Status: Success!") + config + sessionInfo + utctimeconfig
+
         except AuthenticationException:
             # 认证失败
             return "Failed", self.tr("SSH Connection Failed: Authentication Failed, Asscess Denied") +\
                    config + utctimeconfig
+        except FileNotFoundError as e:
+            # 密钥文件不存在
+            return "Failed", self.tr("SSH Connection Failed: Key file not found ") + \
+                f"({e.filename})" + config + utctimeconfig
         except SSHException as e:
-            # 其他 SSH 错误
-            return "Failed", self.tr("SSH Connection Failed: ") + e + config + utctimeconfig
+            # 其他 SSH 错误, 丢弃可能已损坏的会话
+            sshSessionManager.invalidate()
+            return "Failed", self.tr("SSH Connection Failed: ") + str(e) + config + utctimeconfig
         except socket.error as e:
             # 网络错误
+            sshSessionManager.invalidate()
             return "Failed", self.tr("Network Connection Failed: Please check your Internet ") \
                 + f"({e})" + config + utctimeconfig
-        finally:
-            # 确保连接关闭
-            client.close()
+
+    def __onCheckButtonClicked(self):
+        # the button cancels the check in flight
+        if self.checkEngine.isChecking():
+            self.checkEngine.cancel()
+        else:
+            self.updateSSHStatus()
 
     @pyqtSlot()
-    @threaded_func
     def updateSSHStatus(self, init: bool = False):
-        if self.connectionStatus == "Checking": 
+        if self.checkEngine.isChecking():
+            # 合并到正在进行的检查中
             self.sshUpdated.emit(init)
             return
-        
-        start_time = time.time()
-        self.connectionStatus = "Checking"
-        self.checkButton.setEnabled(False)
+
+        self.checkInit = init
+        self.checkEngine.check()
+        linkStateMachine.reconnect()
+
+    def __onCheckStarted(self):
+        self.checkResult = None
+        self.checkButton.setText(self.tr("Cancel"))
         self.detailButton.setEnabled(False)
         self.checkLabel.setText(self.tr("Checking Connection: "))
         self.checkLabel.adjustSize()
         self.checkingBar.show()
 
-        self.connectionStatus, self.sshMessage = self.__checkSSHConnection()
-        print(self.connectionStatus, self.sshMessage)
-        
-        # 延时
-        loop = QEventLoop()
-        QTimer.singleShot(int(max((1 - time.time() + start_time) * 1000, 0)), loop.quit)
-        loop.exec_()
+    def __onCheckFinished(self, status: str, message: str):
+        self.checkResult, self.sshMessage = status, message
 
         self.checkingBar.hide()
-        self.checkLabel.setText(self.tr("Connection Status: ") + self.connectionStatus)
-        # self.checkLabel.setText(message)
-        self.checkButton.setEnabled(True)
+        self.__updateCheckLabel()
+        self.checkButton.setText(self.tr("Check SSH Connection"))
         self.detailButton.setEnabled(True)
         self._adjustViewSize()
 
-        self.sshUpdated.emit(init)
-    
+        self.sshUpdated.emit(self.checkInit)
+
+    def __latencyReport(self):
+        """ per stage percentiles and histogram of the recent handshakes """
+        history = sshSessionManager.history
+        checks = max((history.count(stage) for stage in history.stages), default=0)
+        lines = [self.tr("Latency of the last {0} checks (p50 / p95 / p99, ms):").format(checks)]
+        for stage in history.stages:
+            if not history.count(stage):
+                continue
+
+            p50, p95, p99 = history.percentiles(stage)
+            histogram = " ".join(str(c) for c in history.histogram(stage))
+            lines.append("{0}: {1:.1f} / {2:.1f} / {3:.1f}  (n={4})  [{5}]".format(
+                stage.upper(), p50 * 1000, p95 * 1000, p99 * 1000, history.count(stage), histogram))
+
+        if len(lines) == 1:
+            lines.append(self.tr("No samples yet"))
+        else:
+            lines.append(self.tr("Histogram buckets (ms): ") + " ".join(
+                f"≤{e}" for e in HISTOGRAM_EDGES) + f" >{HISTOGRAM_EDGES[-1]}")
+
+        return "\n".join(lines)
+
     def showSSHDetail(self):
-        w = MessageBox(self.tr("SSH Connection Status: ") + self.connectionStatus, 
-                       self.sshMessage, self.window())
+        w = MessageBox(self.tr("SSH Connection Status: ") + self.connectionStatus.value,
+                       self.sshMessage + " \n\n" + self.__latencyReport(), self.window())
         w.show()
 
     def showSSHSettingsBox(self):
@@ -215,6 +297,8 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
             qconfig.set(self.configPort, w.sshPortEdit.text())
             qconfig.set(self.configUsername, w.sshUserEdit.text())
             qconfig.set(self.configPassword, w.sshPasswordEdit.text())
+            qconfig.set(self.configKeyFile, w.sshKeyFileEdit.text())
+            qconfig.set(self.configProfile, w.profileComboBox.currentData())
 
             self.__updateLabel()
 
@@ -226,6 +310,154 @@ class CustomSSHSettingCard(ExpandGroupSettingCard):
         self.setExpand(not self.isExpand)
         self._adjustViewSize()
 
+class DiveDataSettingCard(ExpandGroupSettingCard):
+    """ Pull dive logs and recordings from the ROV """
+
+    def __init__(self, icon: Union[str, QIcon, FluentIconBase], title: str, content=None, parent=None):
+        super().__init__(icon, title, content, parent=parent)
+        self.transferEngine = SFTPTransferEngine(parent=self)
+
+        self.folderWidget = QWidget(self.view)
+        self.folderLayout = QVBoxLayout(self.folderWidget)
+        self.remoteLayout = QHBoxLayout()
+        self.localLayout = QHBoxLayout()
+        self.remoteLabel = QLabel(self.tr("Remote Folder: "), self.folderWidget)
+        self.remoteEdit = LineEdit(self.folderWidget)
+        self.localLabel = QLabel(self.folderWidget)
+        self.chooseButton = PushButton(self.tr('Choose folder'), self.folderWidget)
+
+        self.transferWidget = QWidget(self.view)
+        self.transferLayout = QHBoxLayout(self.transferWidget)
+        self.transferLabel = QLabel(self.tr("Transfer Status: Idle"), self.transferWidget)
+        self.progressBar = ProgressBar(self.transferWidget)
+        self.cancelButton = PushButton(self.tr('Cancel'), self.transferWidget)
+        self.pullButton = PrimaryPushButton(self.tr("Pull Dive Logs"), self.transferWidget)
+
+        self.__initWidget()
+
+    def __initWidget(self):
+        self.remoteLabel.setObjectName("titleLabel")
+        self.localLabel.setObjectName("titleLabel")
+        self.transferLabel.setObjectName("titleLabel")
+        self.remoteEdit.setText(cfg.get(cfg.remoteLogFolder))
+        self.remoteEdit.setMinimumWidth(280)
+        self.progressBar.setFixedWidth(200)
+        self.progressBar.setValue(0)
+        self.progressBar.hide()
+        self.cancelButton.hide()
+        self.__updateLocalLabel()
+
+        self.folderLayout.setContentsMargins(48, 18, 44, 18)
+        self.remoteLayout.addWidget(self.remoteLabel, 0, Qt.AlignLeft)
+        self.remoteLayout.addStretch()
+        self.remoteLayout.addWidget(self.remoteEdit, 0, Qt.AlignRight)
+        self.localLayout.addWidget(self.localLabel, 0, Qt.AlignLeft)
+        self.localLayout.addStretch()
+        self.localLayout.addWidget(self.chooseButton, 0, Qt.AlignRight)
+        self.folderLayout.addLayout(self.remoteLayout)
+        self.folderLayout.addLayout(self.localLayout)
+
+        self.transferLayout.setContentsMargins(48, 18, 44, 18)
+        self.transferLayout.addWidget(self.transferLabel, 0, Qt.AlignLeft)
+        self.transferLayout.addWidget(self.progressBar, 0, Qt.AlignLeft)
+        self.transferLayout.addStretch()
+        self.transferLayout.addWidget(self.cancelButton, 0, Qt.AlignRight)
+        self.transferLayout.addWidget(self.pullButton, 0, Qt.AlignRight)
+        self.transferLayout.setSizeConstraint(QHBoxLayout.SetMinimumSize)
+
+        self.viewLayout.setSpacing(0)
+        self.viewLayout.setContentsMargins(0, 0, 0, 0)
+        self.addGroupWidget(self.folderWidget)
+        self.addGroupWidget(self.transferWidget)
+
+        self.remoteEdit.editingFinished.connect(
+            lambda: cfg.set(cfg.remoteLogFolder, self.remoteEdit.text()))
+        self.chooseButton.clicked.connect(self.__onChooseButtonClicked)
+        self.pullButton.clicked.connect(self.pull)
+        self.cancelButton.clicked.connect(self.transferEngine.cancel)
+        self.transferEngine.progressChanged.connect(self.__onProgressChanged)
+        self.transferEngine.fileStarted.connect(self.__onFileStarted)
+        self.transferEngine.finished.connect(self.__onFinished)
+
+    def __updateLocalLabel(self):
+        self.localLabel.setText(self.tr("Local Folder: ") + cfg.get(cfg.downloadFolder))
+        self.localLabel.adjustSize()
+
+    def __onChooseButtonClicked(self):
+        folder = QFileDialog.getExistingDirectory(
+            self, self.tr("Choose folder"), cfg.get(cfg.downloadFolder))
+        if not folder or cfg.get(cfg.downloadFolder) == folder:
+            return
+
+        cfg.set(cfg.downloadFolder, folder)
+        self.__updateLocalLabel()
+
+    def pull(self):
+        if self.transferEngine.isRunning():
+            return
+
+        self.pullButton.setEnabled(False)
+        self.cancelButton.show()
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+        self.transferLabel.setText(self.tr("Transfer Status: Listing files"))
+        self.transferEngine.pullFolder(cfg.get(cfg.remoteLogFolder), cfg.get(cfg.downloadFolder))
+
+    def __onFileStarted(self, remotePath: str):
+        self.transferLabel.setText(self.tr("Pulling: ") + remotePath.rsplit("/", 1)[-1])
+        self.transferLabel.adjustSize()
+
+    def __onProgressChanged(self, transferred: int, total: int):
+        self.progressBar.setValue(int(transferred * 100 / total) if total else 100)
+
+    def __onFinished(self, success: bool):
+        self.pullButton.setEnabled(True)
+        self.cancelButton.hide()
+        self.progressBar.hide()
+        self.transferLabel.setText(self.tr("Transfer Status: ") +
+                                   (self.tr("Finished") if success else self.tr("Failed")))
+        self.transferLabel.adjustSize()
+
+class GamepadDeviceSettingCard(SettingCard):
+    """ Choose the gamepad among the joysticks the kernel lists """
+
+    def __init__(self, configItem, icon: Union[str, QIcon, FluentIconBase], title: str, content=None,
+                 parent=None):
+        super().__init__(icon, title, content, parent)
+        self.configItem = configItem
+        self.comboBox = ComboBox(self)
+        self.refreshButton = TransparentToolButton(FIF.SYNC, self)
+
+        self.comboBox.setMinimumWidth(240)
+        self.refreshButton.setToolTip(self.tr('Look for gamepads again'))
+        self.hBoxLayout.addWidget(self.comboBox, 0, Qt.AlignRight)
+        self.hBoxLayout.addSpacing(8)
+        self.hBoxLayout.addWidget(self.refreshButton, 0, Qt.AlignRight)
+        self.hBoxLayout.addSpacing(16)
+
+        self.refresh()
+        self.comboBox.currentIndexChanged.connect(self.__onCurrentIndexChanged)
+        self.refreshButton.clicked.connect(self.refresh)
+
+    def refresh(self):
+        """ list the gamepads connected now, and the configured one if it is not """
+        path = cfg.get(self.configItem)
+        self.comboBox.blockSignals(True)
+        self.comboBox.clear()
+        self.comboBox.addItem(self.tr('Automatic'), userData="")
+        for name, device in findGamepads():
+            self.comboBox.addItem(f"{name} ({device})", userData=device)
+
+        if self.comboBox.findData(path) < 0:
+            self.comboBox.addItem(self.tr("{0} (not connected)").format(path), userData=path)
+
+        self.comboBox.setCurrentIndex(self.comboBox.findData(path))
+        self.comboBox.blockSignals(False)
+
+    def __onCurrentIndexChanged(self, index: int):
+        cfg.set(self.configItem, self.comboBox.itemData(index))
+
+
 class sshSettingBox(MessageBoxBase):
     def __init__(self, configItems: Config, parent=None):
         super().__init__(parent)
@@ -233,11 +465,16 @@ class sshSettingBox(MessageBoxBase):
         self.configPort = configItems.sshPort
         self.configUsername = configItems.sshUser
         self.configPassword = configItems.sshPassword
+        self.configKeyFile = configItems.sshKeyFile
+        self.configProfile = configItems.sshAlgorithmProfile
         
         self.titleLabel = SubtitleLabel(self.tr('SSH Connection Settings'), self)
         
         self.sshAddressLabel = BodyLabel(self.tr("SSH Connection Address (Ipv4)"), self)
+        self.sshAddressLayout = QHBoxLayout()
         self.sshAddressEdit = LineEdit(self)
+        self.scanButton = PushButton(self.tr("Scan"), self, FIF.SEARCH)
+        self.scanButton.clicked.connect(self.showDiscoveryBox)
 
         self.sshPortLabel = BodyLabel(self.tr("SSH Connection Port (Port number)"), self)
         self.sshPortEdit = SpinBox(self)
@@ -248,6 +485,15 @@ class sshSettingBox(MessageBoxBase):
         self.sshPasswordLabel = BodyLabel(self.tr("SSH Connection Password"), self)
         self.sshPasswordEdit = PasswordLineEdit(self)
 
+        self.sshKeyFileLabel = BodyLabel(self.tr("SSH Private Key File (optional, tried before the password)"), self)
+        self.sshKeyFileLayout = QHBoxLayout()
+        self.sshKeyFileEdit = LineEdit(self)
+        self.browseKeyButton = PushButton(self.tr("Browse"), self, FIF.FOLDER)
+        self.browseKeyButton.clicked.connect(self.browseKeyFile)
+
+        self.profileLabel = BodyLabel(self.tr("Algorithm Profile"), self)
+        self.profileComboBox = ComboBox(self)
+
         self.autoCheckLayout = QHBoxLayout(self)
         self.autoCheckLabel = BodyLabel(self.tr("Check the connection after save"), self)
         # self.autoCheckPicker = CheckBox(parent=self)
@@ -270,18 +516,41 @@ class sshSettingBox(MessageBoxBase):
         self.sshPasswordEdit.setText(qconfig.get(self.configPassword))
         self.sshPasswordEdit.setPlaceholderText(qconfig.get(self.configPassword))
 
+        self.sshKeyFileEdit.setText(qconfig.get(self.configKeyFile))
+        self.sshKeyFileEdit.setPlaceholderText(self.tr("Password authentication only"))
+        self.sshKeyFileEdit.setClearButtonEnabled(True)
+
+        profileTexts = {
+            SSHProfile.DEFAULT: self.tr("Default (paramiko preferences)"),
+            SSHProfile.FAST: self.tr("Fast (curve25519, AES-GCM)"),
+            SSHProfile.COMPATIBLE: self.tr("Compatible (older SSH servers)"),
+        }
+        for profile, text in profileTexts.items():
+            self.profileComboBox.addItem(text, userData=profile)
+        self.profileComboBox.setCurrentIndex(list(profileTexts).index(qconfig.get(self.configProfile)))
+
         self.autoCheckPicker.setChecked(True)
 
         # add widget to view layout
         self.viewLayout.addWidget(self.titleLabel)
         self.viewLayout.addWidget(self.sshAddressLabel)
-        self.viewLayout.addWidget(self.sshAddressEdit)
+        self.sshAddressLayout.setContentsMargins(0, 0, 0, 0)
+        self.sshAddressLayout.addWidget(self.sshAddressEdit, 1)
+        self.sshAddressLayout.addWidget(self.scanButton, 0)
+        self.viewLayout.addLayout(self.sshAddressLayout)
         self.viewLayout.addWidget(self.sshPortLabel)
         self.viewLayout.addWidget(self.sshPortEdit)
         self.viewLayout.addWidget(self.sshUserLabel)
         self.viewLayout.addWidget(self.sshUserEdit)
         self.viewLayout.addWidget(self.sshPasswordLabel)
         self.viewLayout.addWidget(self.sshPasswordEdit)
+        self.viewLayout.addWidget(self.sshKeyFileLabel)
+        self.sshKeyFileLayout.setContentsMargins(0, 0, 0, 0)
+        self.sshKeyFileLayout.addWidget(self.sshKeyFileEdit, 1)
+        self.sshKeyFileLayout.addWidget(self.browseKeyButton, 0)
+        self.viewLayout.addLayout(self.sshKeyFileLayout)
+        self.viewLayout.addWidget(self.profileLabel)
+        self.viewLayout.addWidget(self.profileComboBox)
 
         self.autoCheckLayout.setContentsMargins(0, 0, 0, 0)
         self.autoCheckLayout.addWidget(self.autoCheckLabel, 0, Qt.AlignLeft)
@@ -294,6 +563,143 @@ class sshSettingBox(MessageBoxBase):
 
         self.widget.setMinimumWidth(450)
 
+    def browseKeyFile(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, self.tr("Choose private key"), self.sshKeyFileEdit.text() or "./")
+        if path:
+            self.sshKeyFileEdit.setText(path)
+
+    def showDiscoveryBox(self):
+        w = sshDiscoveryBox(self.sshAddressEdit.text(), self.sshPortEdit.value(), self.window())
+        if w.exec() and w.selectedAddress():
+            self.sshAddressEdit.setText(w.selectedAddress())
+
+class sshDiscoveryBox(MessageBoxBase):
+    """ Scan candidate addresses for the ROV's SSH server """
+
+    def __init__(self, address: str, port: int, parent=None):
+        super().__init__(parent)
+        self.port = port
+        self.results = []
+        self.discovery = SSHDiscovery(parent=self)
+
+        self.titleLabel = SubtitleLabel(self.tr('Scan for ROV'), self)
+        self.candidateLabel = BodyLabel(self.tr("Subnet, address range or address list"), self)
+        self.candidateLayout = QHBoxLayout()
+        self.candidateEdit = LineEdit(self)
+        self.scanButton = PrimaryPushButton(self.tr("Scan"), self)
+        self.progressBar = ProgressBar(self)
+        self.statusLabel = CaptionLabel(self)
+        self.resultList = ListWidget(self)
+
+        # guess the /24 subnet of the current address
+        try:
+            subnet = str(ipaddress.ip_network(address + "/24", strict=False))
+        except ValueError:
+            subnet = ""
+
+        self.candidateEdit.setText(subnet)
+        self.candidateEdit.setPlaceholderText("192.168.137.0/24, 10.0.0.2-20")
+        self.candidateEdit.setClearButtonEnabled(True)
+        self.resultList.setMinimumHeight(200)
+        self.progressBar.setValue(0)
+
+        self.candidateLayout.setContentsMargins(0, 0, 0, 0)
+        self.candidateLayout.addWidget(self.candidateEdit, 1)
+        self.candidateLayout.addWidget(self.scanButton, 0)
+
+        self.viewLayout.addWidget(self.titleLabel)
+        self.viewLayout.addWidget(self.candidateLabel)
+        self.viewLayout.addLayout(self.candidateLayout)
+        self.viewLayout.addWidget(self.progressBar)
+        self.viewLayout.addWidget(self.statusLabel)
+        self.viewLayout.addWidget(self.resultList)
+
+        self.yesButton.setText(self.tr("Use Selected"))
+        self.cancelButton.setText(self.tr("Cancel"))
+        self.widget.setMinimumWidth(450)
+
+        self.scanButton.clicked.connect(self.scan)
+        self.discovery.progressChanged.connect(self.__onProgressChanged)
+        self.discovery.finished.connect(self.__onFinished)
+        self.rejected.connect(self.discovery.cancel)
+
+    def scan(self):
+        try:
+            addresses = parseCandidates(self.candidateEdit.text())
+        except ValueError as e:
+            self.statusLabel.setText(self.tr("Cannot scan: ") + str(e))
+            return
+
+        self.resultList.clear()
+        self.progressBar.setRange(0, max(len(addresses), 1))
+        self.progressBar.setValue(0)
+        self.statusLabel.setText(self.tr("Scanning {0} addresses...").format(len(addresses)))
+        self.discovery.scan(addresses, self.port)
+
+    def selectedAddress(self):
+        row = self.resultList.currentRow()
+        return self.results[row].address if 0 <= row < len(self.results) else None
+
+    def __onProgressChanged(self, probed: int, total: int):
+        self.progressBar.setValue(probed)
+
+    def __onFinished(self, results: list):
+        # responders are ranked by latency
+        self.results = results
+        self.resultList.clear()
+        for r in results:
+            self.resultList.addItem(f"{r.address}    {r.latency * 1000:.1f} ms    {r.banner}")
+
+        if results:
+            self.resultList.setCurrentRow(0)
+
+        self.statusLabel.setText(self.tr("Found {0} SSH servers").format(len(results)))
+
+class thrusterAllocationBox(MessageBoxBase):
+    """ Edit the thruster allocation matrix, one line per degree of freedom """
+
+    def __init__(self, allocation, parent=None):
+        super().__init__(parent)
+        self.validator = AllocationValidator()
+        self.allocation = allocation
+
+        self.titleLabel = SubtitleLabel(self.tr('Thruster Allocation'), self)
+        self.hintLabel = BodyLabel(self.tr(
+            "Thrust of each thruster along {0}, one line each, values separated by commas")
+            .format(", ".join(DOF_NAMES)), self)
+        self.hintLabel.setWordWrap(True)
+        self.matrixEdit = PlainTextEdit(self)
+        self.statusLabel = CaptionLabel(self)
+
+        self.matrixEdit.setPlainText("\n".join(", ".join(f"{v:g}" for v in row) for row in allocation))
+        self.matrixEdit.setMinimumHeight(180)
+
+        self.viewLayout.addWidget(self.titleLabel)
+        self.viewLayout.addWidget(self.hintLabel)
+        self.viewLayout.addWidget(self.matrixEdit)
+        self.viewLayout.addWidget(self.statusLabel)
+
+        self.yesButton.setText(self.tr("OK"))
+        self.cancelButton.setText(self.tr("Cancel"))
+        self.widget.setMinimumWidth(450)
+
+    def validate(self):
+        try:
+            allocation = [[float(v) for v in line.replace(",", " ").split()]
+                          for line in self.matrixEdit.toPlainText().splitlines() if line.strip()]
+        except ValueError as e:
+            self.statusLabel.setText(self.tr("Not a number: ") + str(e))
+            return False
+
+        if not self.validator.validate(allocation):
+            self.statusLabel.setText(self.tr("Expected {0} lines of {1} to {2} values, not all zero").format(
+                self.validator.rows, self.validator.minThrusters, self.validator.maxThrusters))
+            return False
+
+        self.allocation = allocation
+        return True
+
 class SettingInterface(ScrollArea):
     """ Setting interface """
 
@@ -333,7 +739,175 @@ class SettingInterface(ScrollArea):
             self.tr("Configure the connection between ROV and computer using SSH Protocol"), 
             self.rovConnectGroup
         )
+        self.sshInfoBars = CoalescedInfoBars(self, InfoBarPosition.BOTTOM_LEFT)
+        signalTracer.instrument(self.sshconfig, ["sshUpdated"])
         self.sshconfig.sshUpdated.connect(self.__ssh_pop_infoBar)
+        self.diveDataCard = DiveDataSettingCard(
+            FIF.CLOUD_DOWNLOAD,
+            self.tr("Dive data"),
+            self.tr("Pull logs and recordings from the ROV after a dive"),
+            self.rovConnectGroup
+        )
+        self.heartbeatCard = SwitchSettingCard(
+            FIF.HEART,
+            self.tr('Link heartbeat'),
+            self.tr('Measure the round trip time, jitter and loss of the SSH link continuously'),
+            cfg.heartbeatEnabled,
+            self.rovConnectGroup
+        )
+        self.heartbeatRateCard = RangeSettingCard(
+            cfg.heartbeatRate,
+            FIF.SPEED_HIGH,
+            self.tr('Heartbeat rate'),
+            self.tr('Number of heartbeats sent to the ROV per second'),
+            self.rovConnectGroup
+        )
+        self.controlRateCard = RangeSettingCard(
+            cfg.controlRate,
+            FIF.ROTATE,
+            self.tr('Control rate'),
+            self.tr('Number of thruster commands sent to the ROV per second'),
+            self.rovConnectGroup
+        )
+        self.controlLowLatencyCard = SwitchSettingCard(
+            FIF.STOP_WATCH,
+            self.tr('Low latency control'),
+            self.tr('Let the control thread take over the interpreter sooner, at some cost to the whole app'),
+            cfg.controlLowLatency,
+            self.rovConnectGroup
+        )
+
+        # thrusters
+        self.thrusterGroup = SettingCardGroup(
+            self.tr('Thrusters'), self.scrollWidget)
+        self.thrusterAllocationCard = PushSettingCard(
+            self.tr('Edit'),
+            FIF.IOT,
+            self.tr('Thruster allocation'),
+            self.__allocationText(),
+            self.thrusterGroup
+        )
+        self.thrusterLimitCard = RangeSettingCard(
+            cfg.thrusterLimit,
+            FIF.SPEED_MEDIUM,
+            self.tr('Thrust limit'),
+            self.tr('Largest thruster command in percent, larger demands are scaled down as a whole'),
+            self.thrusterGroup
+        )
+
+        # gamepad
+        self.gamepadGroup = SettingCardGroup(
+            self.tr('Gamepad'), self.scrollWidget)
+        self.gamepadCard = SwitchSettingCard(
+            FIF.GAME,
+            self.tr('Gamepad control'),
+            self.tr('Drive the thrusters with a gamepad connected to this computer (Linux)'),
+            cfg.gamepadEnabled,
+            self.gamepadGroup
+        )
+        self.gamepadDeviceCard = GamepadDeviceSettingCard(
+            cfg.gamepadDevice,
+            FIF.GAME,
+            self.tr('Gamepad'),
+            self.tr('Event device of the gamepad, the first joystick the kernel lists if automatic'),
+            self.gamepadGroup
+        )
+        self.gamepadDeadzoneCard = RangeSettingCard(
+            cfg.gamepadDeadzone,
+            FIF.CANCEL,
+            self.tr('Deadzone'),
+            self.tr('Percent of stick travel around the center which is ignored'),
+            self.gamepadGroup
+        )
+        self.gamepadExpoCard = RangeSettingCard(
+            cfg.gamepadExpo,
+            FIF.SCROLL,
+            self.tr('Expo'),
+            self.tr('Percent of cubic response, finer control around the center'),
+            self.gamepadGroup
+        )
+        self.gamepadReplayCard = PushSettingCard(
+            self.tr('Open recording'),
+            FIF.PLAY,
+            self.tr('Replay gamepad input'),
+            self.tr('Feed a recorded evdev event file through the gamepad input while the ROV is disconnected'),
+            self.gamepadGroup
+        )
+
+        # telemetry
+        self.telemetryGroup = SettingCardGroup(
+            self.tr('Telemetry'), self.scrollWidget)
+        self.telemetryNotifyRateCard = RangeSettingCard(
+            cfg.telemetryNotifyRate,
+            FIF.SYNC,
+            self.tr('Display update rate'),
+            self.tr('Maximum number of telemetry updates shown per second'),
+            self.telemetryGroup
+        )
+        self.telemetryStatsWindowCard = RangeSettingCard(
+            cfg.telemetryStatsWindow,
+            FIF.STOP_WATCH,
+            self.tr('Statistics window'),
+            self.tr('Seconds of telemetry the rolling mean, deviation, extremes and rates are computed over'),
+            self.telemetryGroup
+        )
+
+        # alarms
+        self.alarmGroup = SettingCardGroup(
+            self.tr('Alarms'), self.scrollWidget)
+        self.alarmDepthCard = RangeSettingCard(
+            cfg.alarmDepthLimit,
+            FIF.DOWN,
+            self.tr('Depth limit'),
+            self.tr('Raise an alarm below this depth in meters'),
+            self.alarmGroup
+        )
+        self.alarmCurrentCard = RangeSettingCard(
+            cfg.alarmCurrentLimit,
+            FIF.ROBOT,
+            self.tr('Thruster current limit'),
+            self.tr('Raise an alarm when a thruster draws more amperes'),
+            self.alarmGroup
+        )
+        self.alarmVerticalSpeedCard = RangeSettingCard(
+            cfg.alarmVerticalSpeed,
+            FIF.SPEED_HIGH,
+            self.tr('Vertical speed limit'),
+            self.tr('Raise an alarm when the ROV ascends or descends faster, in meters per second'),
+            self.alarmGroup
+        )
+
+        # recording
+        self.recordingGroup = SettingCardGroup(
+            self.tr('Recording'), self.scrollWidget)
+        self.recordingCard = SwitchSettingCard(
+            FIF.SAVE,
+            self.tr('Record dives'),
+            self.tr('Write all telemetry to disk while the ROV is connected'),
+            cfg.recordingEnabled,
+            self.recordingGroup
+        )
+        self.recordingFolderCard = PushSettingCard(
+            self.tr('Choose folder'),
+            FIF.FOLDER,
+            self.tr("Recording directory"),
+            cfg.get(cfg.recordingFolder),
+            self.recordingGroup
+        )
+        self.recordingSyncCard = RangeSettingCard(
+            cfg.recordingSyncInterval,
+            FIF.SYNC,
+            self.tr('Sync interval'),
+            self.tr('Seconds between flushes of the recording to disk'),
+            self.recordingGroup
+        )
+        self.replayCard = PushSettingCard(
+            self.tr('Open dive'),
+            FIF.PLAY,
+            self.tr("Replay a dive"),
+            self.tr("Play a recorded dive through the telemetry views"),
+            self.recordingGroup
+        )
 
         # personalization
         self.personalGroup = SettingCardGroup(
@@ -405,6 +979,24 @@ class SettingInterface(ScrollArea):
         #     parent=self.updateSoftwareGroup
         # )
 
+        # diagnostics
+        self.diagnosticsGroup = SettingCardGroup(
+            self.tr('Diagnostics'), self.scrollWidget)
+        self.signalTracingCard = SwitchSettingCard(
+            FIF.DEVELOPER_TOOLS,
+            self.tr('Trace signals'),
+            self.tr('Measure the rate, queueing delay and slot time of the application signals'),
+            cfg.signalTracingEnabled,
+            self.diagnosticsGroup
+        )
+        self.signalReportCard = PushSettingCard(
+            self.tr('View'),
+            FIF.DOCUMENT,
+            self.tr('Signal report'),
+            self.tr('Latency percentiles and histograms of the traced signals'),
+            self.diagnosticsGroup
+        )
+
         # application
         self.aboutGroup = SettingCardGroup(self.tr('About'), self.scrollWidget)
         self.helpCard = HyperlinkCard(
@@ -461,6 +1053,32 @@ class SettingInterface(ScrollArea):
         # self.musicInThisPCGroup.addSettingCard(self.downloadFolderCard)
 
         self.rovConnectGroup.addSettingCard(self.sshconfig)
+        self.rovConnectGroup.addSettingCard(self.heartbeatCard)
+        self.rovConnectGroup.addSettingCard(self.heartbeatRateCard)
+        self.rovConnectGroup.addSettingCard(self.controlRateCard)
+        self.rovConnectGroup.addSettingCard(self.controlLowLatencyCard)
+        self.rovConnectGroup.addSettingCard(self.diveDataCard)
+
+        self.thrusterGroup.addSettingCard(self.thrusterAllocationCard)
+        self.thrusterGroup.addSettingCard(self.thrusterLimitCard)
+
+        self.gamepadGroup.addSettingCard(self.gamepadCard)
+        self.gamepadGroup.addSettingCard(self.gamepadDeviceCard)
+        self.gamepadGroup.addSettingCard(self.gamepadDeadzoneCard)
+        self.gamepadGroup.addSettingCard(self.gamepadExpoCard)
+        self.gamepadGroup.addSettingCard(self.gamepadReplayCard)
+
+        self.telemetryGroup.addSettingCard(self.telemetryNotifyRateCard)
+        self.telemetryGroup.addSettingCard(self.telemetryStatsWindowCard)
+
+        self.alarmGroup.addSettingCard(self.alarmDepthCard)
+        self.alarmGroup.addSettingCard(self.alarmCurrentCard)
+        self.alarmGroup.addSettingCard(self.alarmVerticalSpeedCard)
+
+        self.recordingGroup.addSettingCard(self.recordingCard)
+        self.recordingGroup.addSettingCard(self.recordingFolderCard)
+        self.recordingGroup.addSettingCard(self.recordingSyncCard)
+        self.recordingGroup.addSettingCard(self.replayCard)
 
         self.personalGroup.addSettingCard(self.micaCard)
         self.personalGroup.addSettingCard(self.themeCard)
@@ -472,6 +1090,9 @@ class SettingInterface(ScrollArea):
 
         # self.updateSoftwareGroup.addSettingCard(self.updateOnStartUpCard)
 
+        self.diagnosticsGroup.addSettingCard(self.signalTracingCard)
+        self.diagnosticsGroup.addSettingCard(self.signalReportCard)
+
         self.aboutGroup.addSettingCard(self.helpCard)
         self.aboutGroup.addSettingCard(self.feedbackCard)
         self.aboutGroup.addSettingCard(self.aboutCard)
@@ -481,9 +1102,15 @@ class SettingInterface(ScrollArea):
         self.expandLayout.setContentsMargins(36, 10, 36, 0)
         # self.expandLayout.addWidget(self.musicInThisPCGroup)
         self.expandLayout.addWidget(self.rovConnectGroup)
+        self.expandLayout.addWidget(self.thrusterGroup)
+        self.expandLayout.addWidget(self.gamepadGroup)
+        self.expandLayout.addWidget(self.telemetryGroup)
+        self.expandLayout.addWidget(self.alarmGroup)
+        self.expandLayout.addWidget(self.recordingGroup)
         self.expandLayout.addWidget(self.personalGroup)
         # self.expandLayout.addWidget(self.materialGroup)
         # self.expandLayout.addWidget(self.updateSoftwareGroup)
+        self.expandLayout.addWidget(self.diagnosticsGroup)
         self.expandLayout.addWidget(self.aboutGroup)
 
     def __showRestartTooltip(self):
@@ -497,45 +1124,18 @@ class SettingInterface(ScrollArea):
 
     def __ssh_pop_infoBar(self, init: bool):
         if init: return
-        if self.sshconfig.connectionStatus == "Checking":
-            w = InfoBar.warning(
-                title=self.tr("SSH Connection:"),
-                content=self.tr("SSH Connection Check is performing, please try again later."),
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_LEFT,
-                duration=2000,    # won't disappear automatically
-                parent=self
-            )
-            w.show()
-        elif self.sshconfig.connectionStatus == "Success":
-            w = InfoBar.success(
-                title=self.tr("SSH Connection:"),
-                content=self.tr("Success!  "),
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_LEFT,
-                duration=2000,    # won't disappear automatically
-                parent=self
-            )
-            wbtn = PushButton(self.tr('View Details'), self)
-            wbtn.clicked.connect(self.sshconfig.showSSHDetail)
-            w.addWidget(wbtn, 0)
-            w.show()
-        elif self.sshconfig.connectionStatus == "Failed":
-            w = InfoBar.error(
-                title=self.tr("SSH Connection: "),
-                content=self.tr("Failed!  "),
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_LEFT,
-                duration=5000,    # won't disappear automatically
-                parent=self
-            )
-            wbtn = PushButton(self.tr('View Details'), self)
-            wbtn.clicked.connect(self.sshconfig.showSSHDetail)
-            w.addWidget(wbtn, 0)
-            w.show()
+        # one bar for the SSH status, a new status replaces the shown one
+        details = (self.tr('View Details'), self.sshconfig.showSSHDetail)
+        if self.sshconfig.checkResult is None:
+            self.sshInfoBars.show(
+                "ssh", InfoBarIcon.WARNING, self.tr("SSH Connection:"),
+                self.tr("SSH Connection Check is performing, please try again later."), 2000)
+        elif self.sshconfig.checkResult == "Success":
+            self.sshInfoBars.show(
+                "ssh", InfoBarIcon.SUCCESS, self.tr("SSH Connection:"), self.tr("Success!  "), 2000, details)
+        elif self.sshconfig.checkResult == "Failed":
+            self.sshInfoBars.show(
+                "ssh", InfoBarIcon.ERROR, self.tr("SSH Connection: "), self.tr("Failed!  "), 5000, details)
 
     # def __onDownloadFolderCardClicked(self):
     #     """ download folder card clicked slot """
@@ -547,10 +1147,117 @@ class SettingInterface(ScrollArea):
     #     cfg.set(cfg.downloadFolder, folder)
     #     self.downloadFolderCard.setContent(folder)
 
+    def __onRecordingFolderCardClicked(self):
+        """ recording folder card clicked slot """
+        folder = QFileDialog.getExistingDirectory(
+            self, self.tr("Choose folder"), cfg.get(cfg.recordingFolder))
+        if not folder or cfg.get(cfg.recordingFolder) == folder:
+            return
+
+        cfg.set(cfg.recordingFolder, folder)
+        self.recordingFolderCard.setContent(folder)
+
+    def __onReplayCardClicked(self):
+        """ replay card clicked slot """
+        folder = QFileDialog.getExistingDirectory(
+            self, self.tr("Choose dive"), cfg.get(cfg.recordingFolder))
+        if not folder:
+            return
+
+        try:
+            reader = replaySource.open(folder)
+        except (OSError, ValueError, KeyError) as e:
+            InfoBar.error(self.tr("Replay"), self.tr("Not a recorded dive: ") + str(e),
+                          duration=3000, parent=self)
+            return
+
+        replaySource.resume()
+        replaySource.start()
+        self.replayCard.setContent(self.tr("Replaying {0}, {1:.0f} s, controlled on the telemetry page").format(
+            folder, reader.endTime - reader.startTime))
+
+    def __onReplayStateChanged(self, playing: bool):
+        if not replaySource.isOpen():
+            self.replayCard.setContent(self.tr("Play a recorded dive through the telemetry views"))
+
+    def __allocationText(self):
+        return self.tr("{0} thrusters, mixed with the pseudo-inverse of the allocation matrix").format(
+            len(cfg.get(cfg.thrusterAllocation)[0]))
+
+    def __onThrusterAllocationCardClicked(self):
+        """ thruster allocation card clicked slot """
+        w = thrusterAllocationBox(cfg.get(cfg.thrusterAllocation), self.window())
+        if not w.exec():
+            return
+
+        cfg.set(cfg.thrusterAllocation, w.allocation)
+        self.thrusterAllocationCard.setContent(self.__allocationText())
+
+    def __onGamepadReplayCardClicked(self):
+        """ gamepad replay card clicked slot """
+        if gamepadPoller.isReplaying():
+            gamepadPoller.stopReplay()
+            return
+
+        # the replay replaces the device, the pilot must not lose the sticks while the ROV is connected
+        if linkStateMachine.state != LinkState.DISCONNECTED:
+            InfoBar.warning(self.tr("Replay"), self.tr("Disconnect the ROV before replaying gamepad input"),
+                            duration=5000, parent=self)
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, self.tr("Choose input recording"), "./")
+        if not path:
+            return
+
+        gamepadPoller.replay(path)
+
+    def __onGamepadReplayChanged(self, replaying: bool):
+        path = gamepadPoller.replayPath
+        if path is None:
+            self.gamepadReplayCard.button.setText(self.tr('Open recording'))
+            self.gamepadReplayCard.setContent(
+                self.tr('Feed a recorded evdev event file through the gamepad input while the ROV is disconnected'))
+        else:
+            self.gamepadReplayCard.button.setText(self.tr('Stop replay'))
+            self.gamepadReplayCard.setContent(self.tr("Replaying {0}").format(path))
+
+    def __onSignalReportCardClicked(self):
+        """ signal report card clicked slot """
+        report = signalTracer.report()
+        if not report:
+            report = self.tr("No signal was traced yet.") if cfg.get(cfg.signalTracingEnabled) else \
+                self.tr("Signal tracing is off.")
+
+        w = MessageBox(self.tr("Signal report"), report, self.window())
+        w.yesButton.setText(self.tr("Export"))
+        w.cancelButton.setText(self.tr("Close"))
+        if not w.exec():
+            return
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, self.tr("Export signal report"), "signals.json", self.tr("JSON (*.json);;CSV (*.csv)"))
+        if path:
+            signalTracer.export(path)
+
     def __connectSignalToSlot(self):
         """ connect signal to slot """
         cfg.appRestartSig.connect(self.__showRestartTooltip)
 
+        # recording
+        self.recordingFolderCard.clicked.connect(self.__onRecordingFolderCardClicked)
+        self.replayCard.clicked.connect(self.__onReplayCardClicked)
+        signalBus.replayStateChanged.connect(self.__onReplayStateChanged)
+
+        # thrusters
+        self.thrusterAllocationCard.clicked.connect(self.__onThrusterAllocationCardClicked)
+
+        # gamepad
+        self.gamepadReplayCard.clicked.connect(self.__onGamepadReplayCardClicked)
+        signalBus.gamepadReplayChanged.connect(self.__onGamepadReplayChanged)
+
+        # diagnostics
+        self.signalReportCard.clicked.connect(self.__onSignalReportCardClicked)
+
         # music in the pc
         # self.downloadFolderCard.clicked.connect(
         #     self.__onDownloadFolderCardClicked)
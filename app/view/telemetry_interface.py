@@ -0,0 +1,271 @@
+# coding:utf-8
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout
+
+from qfluentwidgets import (ScrollArea, TitleLabel, BodyLabel, CaptionLabel, ComboBox, StrongBodyLabel, Slider,
+                            TransparentToolButton, ToolTipFilter)
+from qfluentwidgets import FluentIcon as FIF
+
+from ..common.replay import replaySource
+from ..common.signal_bus import signalBus
+from ..common.telemetry import TelemetryStore, telemetryStore
+from ..common.telemetry_stats import ChannelStats
+from ..components.strip_chart import StripChart
+
+
+# visible history of the charts in seconds
+CHART_SPANS = (10, 30, 120, 600)
+
+# speeds offered for the replay of a dive
+REPLAY_SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+
+class StatsPanel(QWidget):
+    """ Rolling statistics of a channel, shown next to its chart """
+
+    panelWidth = 190
+    rows = ("Mean", "Std dev", "Min", "Max", "Rate", "Dive min", "Dive max")
+
+    def __init__(self, channel: str, unit: str, parent=None):
+        super().__init__(parent=parent)
+        self.channel = channel
+        self.unit = unit
+        self.titleLabel = StrongBodyLabel(channel, self)
+        self.gridLayout = QGridLayout(self)
+        self.valueLabels = {}
+
+        self.setFixedWidth(self.panelWidth)
+        self.gridLayout.setContentsMargins(12, 30, 0, 0)
+        self.gridLayout.setVerticalSpacing(2)
+        self.gridLayout.addWidget(self.titleLabel, 0, 0, 1, 2)
+        for i, row in enumerate(self.rows, 1):
+            self.gridLayout.addWidget(CaptionLabel(self.tr(row), self), i, 0)
+            self.valueLabels[row] = BodyLabel("-", self)
+            self.gridLayout.addWidget(self.valueLabels[row], i, 1, Qt.AlignRight)
+
+        self.gridLayout.setRowStretch(len(self.rows) + 1, 1)
+
+    def setStats(self, stats: ChannelStats):
+        values = (stats.mean, stats.std, stats.min, stats.max, stats.rate, stats.diveMin, stats.diveMax)
+        for row, value in zip(self.rows, values):
+            if value != value:      # NaN
+                text = "-"
+            elif row == "Rate":
+                text = f"{value:+.3g} {self.unit}/s"
+            else:
+                text = f"{value:.3g} {self.unit}"
+
+            self.valueLabels[row].setText(text)
+
+
+class ReplayBar(QWidget):
+    """ Controls of the dive replay, shown while a recorded dive is open """
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self.hBoxLayout = QHBoxLayout(self)
+        self.titleLabel = StrongBodyLabel(self.tr("Replay"), self)
+        self.playButton = TransparentToolButton(FIF.PAUSE, self)
+        self.positionSlider = Slider(Qt.Horizontal, self)
+        self.positionLabel = CaptionLabel(self)
+        self.speedComboBox = ComboBox(self)
+        self.stopButton = TransparentToolButton(FIF.CLOSE, self)
+        self.isSeeking = False
+
+        for speed in REPLAY_SPEEDS:
+            self.speedComboBox.addItem(f"{speed:g}×", userData=speed)
+
+        self.speedComboBox.setCurrentIndex(REPLAY_SPEEDS.index(1))
+        self.positionLabel.setMinimumWidth(110)
+        self.stopButton.setToolTip(self.tr("Stop the replay and show the live telemetry"))
+        self.stopButton.installEventFilter(ToolTipFilter(self.stopButton))
+
+        self.hBoxLayout.setContentsMargins(0, 0, 0, 0)
+        self.hBoxLayout.setSpacing(8)
+        self.hBoxLayout.addWidget(self.titleLabel)
+        self.hBoxLayout.addWidget(self.playButton)
+        self.hBoxLayout.addWidget(self.positionSlider, 1)
+        self.hBoxLayout.addWidget(self.positionLabel)
+        self.hBoxLayout.addWidget(self.speedComboBox)
+        self.hBoxLayout.addWidget(self.stopButton)
+
+        self.playButton.clicked.connect(self.__onPlayButtonClicked)
+        self.stopButton.clicked.connect(replaySource.close)
+        self.speedComboBox.currentIndexChanged.connect(
+            lambda i: replaySource.setSpeed(self.speedComboBox.itemData(i)))
+        self.positionSlider.sliderPressed.connect(self.__onSliderPressed)
+        self.positionSlider.sliderMoved.connect(self.__setPositionText)
+        self.positionSlider.sliderReleased.connect(self.__onSliderReleased)
+        self.positionSlider.clicked.connect(self.__seek)
+
+    def updateState(self):
+        """ show the state of the replay after it was opened, started or stopped """
+        self.setVisible(replaySource.isOpen())
+        if not replaySource.isOpen():
+            return
+
+        playing = replaySource.isRunning() and not replaySource.paused
+        self.playButton.setIcon(FIF.PAUSE if playing else FIF.PLAY)
+        reader = replaySource.reader
+        self.positionSlider.setRange(0, int((reader.endTime - reader.startTime) * 10))
+        self.updatePosition()
+
+    def updatePosition(self):
+        if self.isSeeking or not replaySource.isOpen():
+            return
+
+        value = int((replaySource.position - replaySource.reader.startTime) * 10)
+        self.positionSlider.setValue(value)
+        self.__setPositionText(value)
+
+    def __setPositionText(self, value: int):
+        self.positionLabel.setText(self.tr("{0:.1f} / {1:.1f} s").format(
+            value / 10, self.positionSlider.maximum() / 10))
+
+    def __onPlayButtonClicked(self):
+        if not replaySource.isRunning():
+            replaySource.resume()
+            replaySource.start()
+        elif replaySource.paused:
+            replaySource.resume()
+        else:
+            replaySource.pause()
+
+        self.updateState()
+
+    def __onSliderPressed(self):
+        self.isSeeking = True
+
+    def __onSliderReleased(self):
+        self.isSeeking = False
+        self.__seek(self.positionSlider.value())
+
+    def __seek(self, value: int):
+        if replaySource.isOpen():
+            replaySource.seek(replaySource.reader.startTime + value / 10)
+            self.updatePosition()
+
+
+class TelemetryInterface(ScrollArea):
+    """ Telemetry interface, live strip charts of the ROV sensors """
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self.view = QWidget(self)
+        self.vBoxLayout = QVBoxLayout(self.view)
+        self.toolBar = QWidget(self.view)
+        self.toolBarLayout = QHBoxLayout(self.toolBar)
+        self.titleLabel = TitleLabel(self.tr("Telemetry"), self.toolBar)
+        self.spanLabel = BodyLabel(self.tr("History"), self.toolBar)
+        self.spanComboBox = ComboBox(self.toolBar)
+        self.replayBar = ReplayBar(self.view)
+
+        self.depthChart = StripChart(
+            self.tr("Depth"), [("depth", QColor(0, 120, 212))], unit="m", parent=self.view)
+        self.headingChart = StripChart(
+            self.tr("Heading"), [("heading", QColor(136, 23, 152))], valueRange=(0, 360), unit="°",
+            parent=self.view)
+        self.attitudeChart = StripChart(
+            self.tr("Pitch / Roll"), [("pitch", QColor(16, 124, 16)), ("roll", QColor(202, 80, 16))],
+            unit="°", parent=self.view)
+        self.currentChart = StripChart(
+            self.tr("Thruster currents"),
+            [("current1", QColor(0, 153, 188)), ("current2", QColor(231, 72, 86)),
+             ("current3", QColor(255, 185, 0)), ("current4", QColor(142, 140, 216))],
+            unit="A", parent=self.view)
+        self.voltageChart = StripChart(
+            self.tr("Battery voltage"), [("voltage", QColor(0, 178, 148))], valueRange=(12, 17), unit="V", parent=self.view)
+        self.charts = [self.depthChart, self.headingChart, self.attitudeChart, self.currentChart,
+                       self.voltageChart]
+
+        # statistics next to the charts of their channels
+        self.statsPanels = {
+            self.depthChart: StatsPanel("depth", "m", self.view),
+            self.headingChart: StatsPanel("heading", "°", self.view),
+            self.voltageChart: StatsPanel("voltage", "V", self.view),
+        }
+
+        self.__initWidget()
+
+    def __initWidget(self):
+        self.setObjectName('telemetryInterface')
+        self.view.setObjectName('view')
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setWidget(self.view)
+        self.setWidgetResizable(True)
+        self.enableTransparentBackground()
+
+        for span in CHART_SPANS:
+            self.spanComboBox.addItem(self.tr("{} s").format(span), userData=span)
+
+        self.spanComboBox.setCurrentIndex(CHART_SPANS.index(30))
+        self.spanComboBox.currentIndexChanged.connect(self.__onSpanChanged)
+
+        self.toolBarLayout.setContentsMargins(0, 0, 0, 0)
+        self.toolBarLayout.addWidget(self.titleLabel)
+        self.toolBarLayout.addStretch(1)
+        self.toolBarLayout.addWidget(self.spanLabel)
+        self.toolBarLayout.addWidget(self.spanComboBox)
+
+        self.vBoxLayout.setSpacing(12)
+        self.vBoxLayout.setContentsMargins(36, 30, 36, 36)
+        self.vBoxLayout.addWidget(self.toolBar)
+        self.vBoxLayout.addWidget(self.replayBar)
+        for chart in self.charts:
+            chart.setMinimumHeight(200)
+            row = QHBoxLayout()
+            row.setSpacing(0)
+            row.addWidget(chart, 1)
+            if chart in self.statsPanels:
+                row.addWidget(self.statsPanels[chart])
+            else:
+                row.addSpacing(StatsPanel.panelWidth)
+
+            self.vBoxLayout.addLayout(row)
+
+        self.vBoxLayout.addStretch(1)
+
+        signalBus.telemetryUpdated.connect(self.onTelemetryUpdated)
+        signalBus.replayStateChanged.connect(self.onReplayStateChanged)
+        self.replayBar.updateState()
+
+    def __onSpanChanged(self, index: int):
+        for chart in self.charts:
+            chart.setSpan(self.spanComboBox.itemData(index))
+            if chart.store is not None:
+                chart.updateFrom(chart.store)
+
+    def onTelemetryUpdated(self, store: TelemetryStore):
+        # hidden charts catch up from the store once they are shown again
+        if not self.isVisible():
+            return
+
+        # an open replay takes the charts over from the live link until it is stopped
+        if replaySource.isOpen() and store is not replaySource.store:
+            return
+
+        if store is replaySource.store:
+            self.replayBar.updatePosition()
+
+        for chart in self.charts:
+            chart.updateFrom(store)
+
+        # computed once per update by the source, see `TelemetryStore.updateStats`
+        for panel in self.statsPanels.values():
+            if panel.channel in store.stats:
+                panel.setStats(store.stats[panel.channel])
+
+    def onReplayStateChanged(self, playing: bool):
+        self.replayBar.updateState()
+        if not replaySource.isOpen():
+            for chart in self.charts:
+                chart.setStore(telemetryStore)
+
+            self.onTelemetryUpdated(telemetryStore)
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        for chart in self.charts:
+            if chart.store is not None:
+                chart.updateFrom(chart.store)
@@ -0,0 +1,2 @@
+# coding: utf-8
+""" Tests, run with `python -m pytest` or `python -m unittest` from the repository root """
@@ -0,0 +1,148 @@
+# coding: utf-8
+""" Round trip of the command stream through the stand-in ROV server over SSH """
+import unittest
+
+from app.common.command_format import (CommandEncoder, HEADER, KEYFRAME, DELTA, MASK, SCALE,
+                                       MAX_THRUSTERS)
+from app.common.ssh_channels import channelMultiplexer
+from app.common.ssh_session import sshSessionManager
+from tools.bench_utils import useStubServer
+from tools.rov_stub_server import ROVStubServer
+
+
+class CommandStreamTest(unittest.TestCase):
+    """ Frames of a `CommandEncoder` sent on the control channel, decoded and acknowledged by the server """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ROVStubServer()
+        useStubServer(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        channelMultiplexer.close()
+        sshSessionManager.closeAll()
+        cls.server.close()
+
+    def setUp(self):
+        # a keyframe interval longer than any test, only the first frame and `reset` send keyframes
+        self.encoder = CommandEncoder(keyframeInterval=3600)
+        self.channel = self.__openChannel()
+        self.errors = self.server.controlErrors
+
+    def tearDown(self):
+        channelMultiplexer.close("control")
+
+    def __openChannel(self):
+        channelMultiplexer.close("control")
+        channel = channelMultiplexer.channel("control")
+        channel.settimeout(5)
+        return channel
+
+    def send(self, values, now=0.0):
+        """ encode a tick and send its frame, return (seq, payload) or None if nothing was sent """
+        frame = self.encoder.encode(values, now)
+        if frame is not None:
+            self.channel.sendMessage(frame[1])
+
+        return frame
+
+    def receiveAck(self):
+        ack = CommandEncoder.parseAck(self.channel.recvMessage())
+        self.assertIsNotNone(ack)
+        return ack
+
+    def assertApplied(self, values):
+        self.assertEqual(len(self.server.controlValues), len(values))
+        for applied, sent in zip(self.server.controlValues, values):
+            self.assertAlmostEqual(applied, sent, delta=0.5 / SCALE)
+
+    def test_setpoints_round_trip(self):
+        setpoints = [[0.0] * 6, [0.5, -0.5, 0.25, -0.25, 1.0, -1.0], [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+                     [-0.123, 0.456, -0.789, 0.0, 0.999, -0.001], [1.5, -2.0, 0.0, 0.0, 0.0, 0.0]]
+        for values in setpoints:
+            seq, _ = self.send(values)
+            ackSeq, received, applied = self.receiveAck()
+            self.assertEqual(ackSeq, seq)
+            self.assertLessEqual(received, applied)
+            # commands beyond the range are clamped
+            self.assertApplied([max(-1.0, min(1.0, v)) for v in values])
+
+        self.assertEqual(self.server.controlErrors, self.errors)
+
+    def test_acks_follow_the_sequence(self):
+        seqs = []
+        for i in range(50):
+            seq, _ = self.send([i / 100] + [0.0] * 5)
+            seqs.append(seq)
+
+        acks = [self.receiveAck()[0] for _ in seqs]
+        self.assertEqual(acks, seqs)
+        self.assertEqual(seqs, list(range(seqs[0], seqs[0] + 50)))
+
+    def test_delta_carries_only_the_changed_thrusters(self):
+        # on the quantization steps, so a tenth of a step changes nothing
+        values = [n / SCALE for n in (3277, 6553, 9830, 13107, 16384, 19660)]
+        seq, payload = self.send(values)
+        self.assertEqual(payload[0], KEYFRAME)
+        self.receiveAck()
+
+        values[1], values[4] = -values[1], -values[4]
+        seq, payload = self.send(values)
+        self.assertEqual(payload[0], DELTA)
+        mask, = MASK.unpack_from(payload, HEADER.size)
+        self.assertEqual(mask, 1 << 1 | 1 << 4)
+        self.assertEqual(len(payload), HEADER.size + MASK.size + 2 * 2)
+        self.assertEqual(self.receiveAck()[0], seq)
+        self.assertApplied(values)
+
+        frames = self.server.controlFrames
+        self.assertIsNone(self.send(values))
+        self.assertIsNone(self.send([v + 0.1 / SCALE for v in values]))
+        self.assertEqual(self.encoder.suppressed, 2)
+
+        values[5] = 0.0
+        seq, _ = self.send(values)
+        self.assertEqual(self.receiveAck()[0], seq)
+        self.assertEqual(self.server.controlFrames, frames + 1)
+        self.assertApplied(values)
+
+    def test_keyframe_after_reset(self):
+        values = [0.3] * 6
+        self.send(values)
+        self.receiveAck()
+
+        # a reopened channel reaches a new decoder on the ROV, which cannot apply a delta
+        self.channel = self.__openChannel()
+        values[0] = -0.3
+        seq, payload = self.send(values)
+        self.assertEqual(payload[0], DELTA)
+        self.encoder.reset()
+        values[2] = 0.7
+        seq, payload = self.send(values)
+        self.assertEqual(payload[0], KEYFRAME)
+        self.assertEqual(self.receiveAck()[0], seq)
+        self.assertEqual(self.server.controlErrors, self.errors + 1)
+        self.assertApplied(values)
+
+        # the stream goes on with deltas from the keyframe
+        values[3] = -0.7
+        seq, payload = self.send(values)
+        self.assertEqual(payload[0], DELTA)
+        self.assertEqual(self.receiveAck()[0], seq)
+        self.assertApplied(values)
+
+    def test_keyframe_interval(self):
+        self.encoder.keyframeInterval = 0.25
+        values = [0.2] * MAX_THRUSTERS
+        self.assertEqual(self.send(values, 0.0)[1][0], KEYFRAME)
+        self.receiveAck()
+        self.assertIsNone(self.send(values, 0.1))
+        seq, payload = self.send(values, 0.3)
+        self.assertEqual(payload[0], KEYFRAME)
+        self.assertEqual(self.receiveAck()[0], seq)
+        self.assertApplied(values)
+
+
+if __name__ == "__main__":
+    unittest.main()
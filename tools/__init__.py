@@ -0,0 +1,2 @@
+# coding: utf-8
+""" Development tools: the ROV stand-in server and the benchmarks, not shipped with the app """
@@ -0,0 +1,235 @@
+# coding: utf-8
+""" Benchmarks of the control path: mixer, gamepad, control loop and command stream """
+import os
+import time
+
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+from app.common.config import cfg
+from .rov_stub_server import ROVStubServer
+
+
+def benchMixer(ticks=100000, hours=1.0, rate=100):
+    """ thruster mixing of single control ticks and of a recorded input sequence
+
+    :return: (seconds per tick within the limit, seconds per saturated tick, seconds per sample of
+        `hours` of input at `rate` in batch mode)
+    """
+    import numpy as np
+    from app.common.thruster_mixer import ThrusterMixer
+
+    mixer = ThrusterMixer(limit=1.0)
+    results = []
+    for demand in (np.array([0.3, -0.2, 0.1, 0.2, 0.0, 0.0]), np.ones(6)):
+        start = time.perf_counter()
+        for _ in range(ticks):
+            mixer.mix(demand)
+        results.append((time.perf_counter() - start) / ticks)
+
+    demands = np.random.uniform(-1, 1, (int(hours * 3600 * rate), 6))
+    start = time.perf_counter()
+    mixer.mixBatch(demands)
+    results.append((time.perf_counter() - start) / len(demands))
+    return tuple(results)
+
+
+def benchGamepad(seconds=10, rate=1000, ticks=100000, tickRate=100, replaySeconds=2):
+    """ parsing and shaping of gamepad input, from an event file of `rate` reports per second
+
+    :return: (events parsed per second, seconds of `demand` per control tick, reports coalesced per
+        control tick and ages of the state at the tick in seconds while the file replays in real time)
+    """
+    import math
+    import tempfile
+    import numpy as np
+    from app.common.gamepad import (GamepadPoller, encodeEvents, EVENT_SIZE, EV_ABS, EV_KEY, EV_SYN, SYN_REPORT,
+                          ABS_X, ABS_Y, ABS_RX, ABS_RY)
+
+    events = []
+    for i in range(seconds * rate):
+        t = 1000 + i / rate
+        for j, code in enumerate((ABS_X, ABS_Y, ABS_RX, ABS_RY)):
+            events.append((t, EV_ABS, code, round(32767 * math.sin(t * (j + 1)))))
+        if i % 500 == 0:
+            events.append((t, EV_KEY, 0x130, i // 500 % 2))
+        events.append((t, EV_SYN, SYN_REPORT, 0))
+
+    data = encodeEvents(events)
+    with tempfile.NamedTemporaryFile(suffix=".evdev", delete=False) as f:
+        f.write(data)
+
+    # reads of 256 events, as from the device
+    poller = GamepadPoller()
+    chunk = EVENT_SIZE * 256
+    start = time.perf_counter()
+    for offset in range(0, len(data), chunk):
+        poller.feed(data[offset:offset + chunk])
+    parseRate = len(events) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        poller.demand()
+    demandTime = (time.perf_counter() - start) / ticks
+
+    # the control loop samples the newest state while the file replays
+    poller = GamepadPoller()
+    poller.replay(f.name)
+    coalesced, ages, last = [], [], 0
+    end = time.perf_counter() + replaySeconds
+    while time.perf_counter() < end:
+        time.sleep(1 / tickRate)
+        state = poller.state
+        poller.demand()
+        if state.received is not None:
+            coalesced.append(state.seq - last)
+            ages.append(time.monotonic() - state.received)
+            last = state.seq
+
+    poller.stop()
+    os.remove(f.name)
+    return parseRate, demandTime, np.mean(coalesced[1:]), ages
+
+
+def benchControlLoop(rate=100, seconds=5):
+    """ timing of the control loop at `rate` frames per second with an idle and a busy GUI thread
+
+    The busy GUI thread redraws a 16 trace strip chart in full, back to back.
+
+    :return: {"idle" or "busy": ControlLoopStats}
+    """
+    import numpy as np
+    from PyQt5.QtGui import QColor
+    from app.components.strip_chart import StripChart
+    from app.common.control_loop import ControlLoop
+    from app.common.ssh_session import sshSessionManager
+    from app.common.telemetry import TelemetryStore
+
+    cfg.controlRate.value = rate
+    sshSessionManager.session()
+    names = [f"trace{i}" for i in range(16)]
+    chart = StripChart("Benchmark", [(name, QColor.fromHsv(i * 22, 200, 220)) for i, name in enumerate(names)])
+    chart.resize(1200, 300)
+    chart.show()
+    store = TelemetryStore()
+    t = np.arange(30000) / 1000
+    store.append(t, {name: np.sin(t * (i + 1)) + 0.1 * np.random.randn(len(t)) for i, name in enumerate(names)})
+
+    results = {}
+    for load in ("idle", "busy"):
+        loop = ControlLoop(channelName="control:bench", publishInterval=seconds / 2)
+        loop.start()
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            if load == "busy":
+                chart.invalidate()
+                chart.updateFrom(store)
+                chart.repaint()
+            QApplication.processEvents(QEventLoop.AllEvents, 5)
+            if load == "idle":
+                time.sleep(0.005)
+
+        loop.stop()
+        results[load] = loop.stats
+
+    chart.deleteLater()
+    return results
+
+
+def benchCommandStream(server: ROVStubServer, rate=100, seconds=5, ticks=100000):
+    """ round trip of the delta encoded command stream
+
+    Offline, `ticks` setpoints of 8 thrusters, of which one changes at a
+    time, are encoded and decoded and compared. Live, the control loop
+    sends a setpoint which changes at 10 Hz to the stand-in server for
+    `seconds`, and the setpoint the server applied last is compared with
+    the last one sent.
+
+    :return: {name: value} of the offline encoded and raw bytes, mismatches, encode time per tick, and
+        the live ControlLoopStats, frames, acknowledgements, decode errors and whether the server agrees
+    """
+    import numpy as np
+    from app.common.command_format import CommandDecoder, CommandEncoder, quantize, SCALE
+    from app.common.control_loop import ControlLoop
+    from app.common.ssh_session import sshSessionManager
+
+    # offline, with keyframes every 0.25 s of 100 Hz ticks
+    rng = np.random.default_rng(1)
+    setpoints = np.zeros((ticks, 8))
+    setpoints[0] = rng.uniform(-1, 1, 8)
+    for i in range(1, ticks):
+        setpoints[i] = setpoints[i - 1]
+        if i % 10 == 0:
+            setpoints[i, rng.integers(8)] = rng.uniform(-1, 1)
+    setpoints = setpoints.tolist()
+
+    encoder, decoder, mismatches = CommandEncoder(), CommandDecoder(), 0
+    start = time.perf_counter()
+    frames = [encoder.encode(values, i / 100) for i, values in enumerate(setpoints)]
+    encodeTime = (time.perf_counter() - start) / ticks
+    for values, frame in zip(setpoints, frames):
+        if frame is not None:
+            decoder.decode(frame[1])
+        mismatches += decoder.values != [quantize(v) / SCALE for v in values]
+
+    result = {"offline": (encoder.encodedBytes, encoder.rawBytes, mismatches, encodeTime)}
+
+    # live, against the stand-in server
+    cfg.controlRate.value = rate
+    sshSessionManager.session()
+    server.controlFrames = server.controlErrors = 0
+    loop = ControlLoop(thrusters=8, channelName="control:bench", publishInterval=seconds / 4)
+    loop.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        loop.setSetpoint(np.round(rng.uniform(-1, 1, 8) * (rng.uniform(size=8) < 0.2), 2).tolist())
+        time.sleep(0.1)
+
+    last = [quantize(v) / SCALE for v in loop.setpoint]
+    time.sleep(0.5)
+    loop.stop()
+    result["live"] = (loop.stats, loop.encoder.ticks, server.controlFrames, loop.acked, server.controlErrors,
+                      server.controlValues == last)
+    return result
+
+
+def benchControlTrace(server: ROVStubServer, rate=100, seconds=5, inputRate=250, clockOffset=1234.5):
+    """ input to actuation latency of the control path, from a replayed gamepad to the stand-in server
+
+    The sticks of the event file move on every report, the clock of the
+    server runs `clockOffset` seconds ahead of the topside clock.
+
+    :return: (`ControlTracer.summary`, error of the estimated clock offset in seconds)
+    """
+    import math
+    import tempfile
+    from app.common.control_loop import ControlLoop
+    from app.common.gamepad import GamepadPoller, encodeEvents, EV_ABS, EV_SYN, SYN_REPORT, ABS_X, ABS_Y, ABS_RX, ABS_RY
+    from app.common.ssh_session import sshSessionManager
+
+    events = []
+    for i in range(int((seconds + 1) * inputRate)):
+        t = i / inputRate
+        for j, code in enumerate((ABS_X, ABS_Y, ABS_RX, ABS_RY)):
+            events.append((t, EV_ABS, code, round(32767 * math.sin(t * (j + 1)))))
+        events.append((t, EV_SYN, SYN_REPORT, 0))
+
+    with tempfile.NamedTemporaryFile(suffix=".evdev", delete=False) as f:
+        f.write(encodeEvents(events))
+
+    cfg.controlRate.value = rate
+    sshSessionManager.session()
+    server.clockOffset = clockOffset
+    poller = GamepadPoller()
+    loop = ControlLoop(channelName="control:bench", publishInterval=seconds / 2)
+    loop.sourceInput, loop.source = poller.demandInput, poller.demand
+    poller.replay(f.name)
+    loop.start()
+    time.sleep(seconds)
+    loop.stop()
+    poller.stop()
+    server.clockOffset = 0.0
+    os.remove(f.name)
+
+    summary = loop.tracer.summary()
+    return summary, summary["offset"] - clockOffset if summary["offset"] is not None else None
@@ -0,0 +1,157 @@
+# coding: utf-8
+""" Benchmarks of the delivery to the GUI thread: data bus, signal tracing and strip chart """
+import threading
+import time
+
+from PyQt5.QtCore import Qt, QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+
+def benchDataBus(messages=200000, seconds=2):
+    """ per sample messages from a worker thread, through `dataBus` and through a queued signal
+
+    :return: {name: value} of publish cost, GUI drain time per frame, deliveries and drops, and the
+        time the GUI thread needs to work off the same number of queued signal emissions
+    """
+    from PyQt5.QtCore import QObject, pyqtSignal
+    from app.common.data_bus import DataBus, DeliveryPolicy
+
+    bus = DataBus()
+    calls = {policy: 0 for policy in DeliveryPolicy}
+    # the batch queue holds a tenth of a second of messages
+    subscriptions = [bus.subscribe("sample", lambda m, p=policy: calls.__setitem__(p, calls[p] + 1),
+                                   maxRate, policy, maxQueue)
+                     for policy, maxRate, maxQueue in ((DeliveryPolicy.LATEST, 60, 1),
+                                                       (DeliveryPolicy.BATCH, 10, messages // seconds // 5),
+                                                       (DeliveryPolicy.EVERY, None, messages))]
+    published = []
+
+    def produce():
+        start = time.perf_counter()
+        for i in range(messages):
+            bus.publish("sample", i)
+            if i % 1000 == 0:
+                time.sleep(seconds / messages * 1000)   # spread the messages over `seconds`
+        published.append(time.perf_counter() - start)
+
+    producer = threading.Thread(target=produce)
+    drains = []
+    bus.start()
+    producer.start()
+    while producer.is_alive() or any(s.queue for s in subscriptions):
+        QApplication.processEvents(QEventLoop.AllEvents, 5)
+        if bus.drainTime:
+            drains.append(bus.drainTime)
+            bus.drainTime = 0
+
+    bus.stop()
+    result = {"drains": drains, "publishCost": (published[0] - seconds) / messages}
+    for s in subscriptions:
+        result[s.policy] = (s.deliveries, s.delivered, s.dropped)
+
+    # the same messages as a queued signal, one event each
+    class Emitter(QObject):
+        sample = pyqtSignal(int)
+
+    emitter, received = Emitter(), []
+    emitter.sample.connect(received.append, Qt.QueuedConnection)
+    thread = threading.Thread(target=lambda: [emitter.sample.emit(i) for i in range(messages)])
+    start = time.perf_counter()
+    thread.start()
+    while thread.is_alive() or len(received) < messages:
+        QApplication.processEvents(QEventLoop.AllEvents, 5)
+
+    result["signal"] = time.perf_counter() - start
+    return result
+
+
+def benchSignalTracing(emits=100000, queued=2000):
+    """ emit cost of a signal without and with tracing, and the queueing delay of a traced signal
+
+    :return: (plain, traced off, traced on) seconds per emit without a slot, and the queue and
+        slot summary of `queued` emissions from a worker thread to a slot on the GUI thread
+    """
+    from PyQt5.QtCore import QObject, pyqtSignal
+    from app.common.signal_trace import SignalTracer
+
+    class Emitter(QObject):
+        sample = pyqtSignal(int)
+
+    def emitCost(signal):
+        start = time.perf_counter()
+        for i in range(emits):
+            signal.emit(i)
+        return (time.perf_counter() - start) / emits
+
+    tracer, emitter = SignalTracer(), Emitter()
+    plain = emitCost(emitter.sample)
+    tracer.instrument(emitter)
+    off = emitCost(emitter.sample)
+    tracer.setEnabled(True)
+    on = emitCost(emitter.sample)
+
+    class Receiver(QObject):
+        def __init__(self):
+            super().__init__()
+            self.received = 0
+
+        def onSample(self, i):
+            self.received += 1
+
+    emitter, receiver = Emitter(), Receiver()
+    tracer.instrument(emitter, prefix="Worker")
+    emitter.sample.connect(receiver.onSample)
+    thread = threading.Thread(target=lambda: [emitter.sample.emit(i) for i in range(queued)])
+    thread.start()
+    while thread.is_alive() or receiver.received < queued:
+        QApplication.processEvents(QEventLoop.AllEvents, 5)
+
+    stats = tracer.signals["Worker.sample"].stats.summary()
+    return plain, off, on, stats["queue"], stats["slot"]
+
+
+def benchStripChart(traces=16, rate=1000, fps=60, frames=600, width=1200):
+    """ GUI thread time of a strip chart per frame, fed `rate` records per second at `fps`
+
+    :return: (frame times of incremental updates, frame times of full redraws) in seconds
+    """
+    import numpy as np
+    from PyQt5.QtGui import QColor
+    from app.components.strip_chart import StripChart
+    from app.common.telemetry import TelemetryStore
+
+    names = [f"trace{i}" for i in range(traces)]
+    chart = StripChart("Benchmark", [(name, QColor.fromHsv(i * 360 // traces, 200, 220))
+                                     for i, name in enumerate(names)], valueRange=(-2, 2))
+    chart.resize(width, 300)
+    chart.show()
+    store = TelemetryStore()
+
+    def feed(frame):
+        t = (np.arange(rate // fps) + frame * (rate // fps)) / rate
+        store.append(t, {name: np.sin(t * (i + 1)) + 0.1 * np.random.randn(len(t))
+                         for i, name in enumerate(names)})
+
+    def frameTime(redraw=False):
+        start = time.perf_counter()
+        if redraw:
+            chart.invalidate()
+
+        chart.updateFrom(store)
+        chart.repaint()
+        return time.perf_counter() - start
+
+    # fill the visible span first
+    for frame in range(int(chart.span * fps)):
+        feed(frame)
+
+    incremental, full = [], []
+    for frame in range(int(chart.span * fps), int(chart.span * fps) + frames):
+        feed(frame)
+        incremental.append(frameTime())
+
+    for _ in range(20):
+        full.append(frameTime(redraw=True))
+
+    chart.deleteLater()
+    return incremental, full
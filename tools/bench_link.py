@@ -0,0 +1,169 @@
+# coding: utf-8
+""" Benchmarks of the SSH link: checks, reconnects, channels and algorithm profiles """
+import os
+import threading
+import time
+
+from PyQt5.QtCore import Qt, QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+from app.common.config import cfg, SSHProfile
+from .rov_stub_server import ROVStubServer
+from .bench_utils import summary
+
+
+def benchCheckLatency(runs=20):
+    """ latency of `CustomSSHSettingCard` checks, from click to the result on the GUI thread
+
+    :return: (cold, warm) latencies in seconds, cold checks do a new handshake
+    """
+    from app.view.setting_interface import CustomSSHSettingCard
+    from app.common.ssh_session import sshSessionManager
+    from qfluentwidgets import FluentIcon
+
+    card = CustomSSHSettingCard(cfg, FluentIcon.CERTIFICATE, "Benchmark")
+    card.checkEngine.minDuration = 0
+    loop = QEventLoop()
+    card.checkEngine.checkFinished.connect(loop.quit)
+
+    def settle():
+        # wait until the result of the last check, such as the one the card starts itself, is shown
+        while card.checkEngine.isChecking() or card.checkResult is None:
+            QApplication.processEvents(QEventLoop.AllEvents, 10)
+
+    def check():
+        settle()
+        start = time.perf_counter()
+        card.updateSSHStatus()
+
+        # a fast check may have finished before the event loop starts
+        if card.checkResult is None:
+            loop.exec_()
+
+        return time.perf_counter() - start
+
+    cold, warm = [], []
+    for _ in range(runs):
+        settle()
+        sshSessionManager.invalidate()
+        cold.append(check())
+        warm.append(check())
+
+    card.deleteLater()
+    return cold, warm
+
+
+def benchReconnect(server: ROVStubServer, runs=10, timeout=10):
+    """ time from a dropped tether to the link being up again
+
+    :return: reconnect times in seconds
+    """
+    from app.common.link_monitor import linkMonitor
+    from app.common.link_state import LinkState, linkStateMachine
+    from app.common.signal_bus import signalBus
+
+    up = threading.Event()
+
+    def onStateChanged(old, new):
+        if new == LinkState.UP:
+            up.set()
+
+    signalBus.linkStateChanged.connect(onStateChanged, Qt.DirectConnection)
+    linkMonitor.start()
+    linkStateMachine.start()
+    up.wait(timeout)
+
+    times = []
+    for _ in range(runs):
+        up.clear()
+        start = time.perf_counter()
+        server.dropConnections()
+        if up.wait(timeout):
+            times.append(time.perf_counter() - start)
+
+        time.sleep(0.2)
+
+    linkStateMachine.stop()
+    linkMonitor.stop()
+    signalBus.linkStateChanged.disconnect(onStateChanged)
+    return times
+
+
+def benchChannelThroughput(channelName="echo", size=8 * 1024 * 1024, messageSize=64 * 1024):
+    """ throughput of a logical channel with the flow control of `control`, echoed by the stand-in server
+
+    :return: (bytes per second, message round trip times in seconds)
+    """
+    from app.common.ssh_channels import ChannelSpec, channelMultiplexer
+
+    control = channelMultiplexer.spec("control")
+    channelMultiplexer.addSpec(ChannelSpec(channelName, "exec", "rov-echo", control.windowSize, control.maxPacketSize))
+
+    channel = channelMultiplexer.channel(channelName)
+    payload = os.urandom(messageSize)
+    count = max(size // messageSize, 1)
+
+    # round trip of single messages
+    rtts = []
+    for _ in range(min(count, 50)):
+        start = time.perf_counter()
+        channel.sendMessage(payload)
+        channel.recvMessage()
+        rtts.append(time.perf_counter() - start)
+
+    # streaming, the sender runs ahead of the receiver
+    start = time.perf_counter()
+    sender = threading.Thread(target=lambda: [channel.sendMessage(payload) for _ in range(count)])
+    sender.start()
+    for _ in range(count):
+        channel.recvMessage()
+
+    sender.join()
+    elapsed = time.perf_counter() - start
+    channelMultiplexer.close(channelName)
+    return count * messageSize / elapsed, rtts
+
+
+def benchProfiles(runs=5, size=8 * 1024 * 1024, timeout=10):
+    """ handshake time and bulk throughput of each algorithm profile against the current config
+
+    The bulk stream is `head -c <size> /dev/zero` run on the target, so the
+    throughput includes the cost of the negotiated cipher and MAC on both ends.
+
+    :return: {profile: (handshake times in seconds, bytes per second, (cipher, mac))}
+    """
+    from app.common.ssh_session import SSHSession, sshSessionManager
+
+    results = {}
+    for profile in SSHProfile:
+        config = sshSessionManager.currentConfig()[:5] + (profile,)
+        handshakes, rates, algorithms = [], [], None
+        for _ in range(runs):
+            session = SSHSession(*config)
+            try:
+                session.connect(timeout)
+                handshakes.append(sum(session.timings.values()))
+                algorithms = session.algorithms
+
+                channel = session.openChannel(timeout)
+                start = time.perf_counter()
+                channel.exec_command(f"head -c {size} /dev/zero")
+                received = 0
+                for data in iter(lambda: channel.recv(65536), b""):
+                    received += len(data)
+
+                rates.append(received / (time.perf_counter() - start))
+                channel.close()
+            finally:
+                session.close()
+
+        results[profile] = (handshakes, max(rates) if rates else 0, algorithms)
+
+    return results
+
+
+def printProfiles(results):
+    for profile, (handshakes, rate, algorithms) in results.items():
+        print(summary(f"handshake ({profile.value})", handshakes))
+        print(f"{f'bulk stream ({profile.value})':<28} {rate / 1024 / 1024:.2f} MiB/s  "
+              f"cipher {algorithms[0]}, mac {algorithms[1]}" if algorithms else "")
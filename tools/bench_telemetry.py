@@ -0,0 +1,239 @@
+# coding: utf-8
+""" Benchmarks of the telemetry path: decoding, recording, replay, downsampling, statistics and alarms """
+import time
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from app.common.config import cfg
+from .rov_stub_server import ROVStubServer
+from .bench_utils import residentMemory
+
+
+def benchDecode(frames=100000):
+    """ decoding throughput of binary frames against newline delimited JSON
+
+    :return: {format: (records per second, bytes per record)}
+    """
+    import json
+    import numpy as np
+    from .rov_stub_server import imitatedRecord
+    from app.common.telemetry import parseJsonRecords
+    from app.common.telemetry_format import FrameDecoder, TelemetrySchema
+
+    schema = TelemetrySchema()
+    t = np.arange(frames) / 1000
+    columns = {name: np.empty(frames) for name in schema.channels}
+    for i, ti in enumerate(t):
+        for name, value in imitatedRecord(ti).items():
+            columns[name][i] = value
+
+    binary = schema.encodeArray(np.arange(frames), t, columns)
+    text = b"".join(json.dumps({"t": ti, **{n: float(columns[n][i]) for n in schema.channels}}).encode() + b"\n"
+                    for i, ti in enumerate(t))
+
+    start = time.perf_counter()
+    decoded, _ = FrameDecoder(schema).decode(binary)
+    # the store converts the columns to float64 as well
+    [decoded[name].astype(np.float64) for name in schema.channels]
+    binaryTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parseJsonRecords(text.split(b"\n")[:-1])
+    jsonTime = time.perf_counter() - start
+
+    return {
+        "binary": (frames / binaryTime, len(binary) / frames),
+        "json": (frames / jsonTime, len(text) / frames),
+    }
+
+
+def benchTelemetry(server: ROVStubServer, rate=1000, seconds=3):
+    """ ingestion of the telemetry stream at `rate` records per second
+
+    :return: (records per second, GUI notifications per second)
+    """
+    from app.common.signal_bus import signalBus
+    from app.common.ssh_session import sshSessionManager
+    from app.common.telemetry import SSHTelemetrySource, TelemetryStore
+
+    notifications = []
+    onUpdated = lambda store: notifications.append(time.perf_counter())
+    signalBus.telemetryUpdated.connect(onUpdated, Qt.DirectConnection)
+
+    server.telemetryRate = rate
+    sshSessionManager.session()
+    source = SSHTelemetrySource(TelemetryStore())
+    source.start()
+    time.sleep(0.5)
+
+    records, start, notifications[:] = source.records, time.perf_counter(), []
+    time.sleep(seconds)
+    records, count = source.records - records, len(notifications)
+    elapsed = time.perf_counter() - start
+
+    source.stop()
+    signalBus.telemetryUpdated.disconnect(onUpdated)
+    return records / elapsed, count / elapsed
+
+
+def benchRecorder(rate=1000, channels=64, seconds=600, batch=33):
+    """ record `seconds` of `channels` channels at `rate` Hz as fast as possible
+
+    :return: (records per second, resident memory at the start, in the middle and at the end in bytes)
+    """
+    import shutil
+    import tempfile
+    import numpy as np
+    from app.common.recorder import DiveRecorder
+
+    folder = tempfile.mkdtemp(prefix="rov-recording-")
+    cfg.recordingFolder.value = folder
+    names = [f"ch{i}" for i in range(channels)]
+    values = np.random.default_rng(0).standard_normal((channels, batch)).astype(np.float32)
+    batches = rate * seconds // batch
+
+    recorder = DiveRecorder()
+    recorder.start()
+    memory = [residentMemory()]
+    start = time.perf_counter()
+    for i in range(batches):
+        t = (np.arange(batch) + i * batch) / rate
+        recorder.write(t, dict(zip(names, values)))
+        if i == batches // 2:
+            memory.append(residentMemory())
+
+        # keep the queue short, like a source which is paced by the ROV
+        while recorder.backlog() > 64:
+            time.sleep(0.001)
+
+    recorder.stop(timeout=60)
+    elapsed = time.perf_counter() - start
+    memory.append(residentMemory())
+    shutil.rmtree(folder)
+    return recorder.records / elapsed, memory
+
+
+def benchReplay(hours=3.0, rate=1000, channels=6, speed=32, seconds=2):
+    """ open, seek and play a recording of `hours` at `rate` Hz
+
+    :return: (open time, seek times in seconds, played records per second)
+    """
+    import shutil
+    import tempfile
+    import numpy as np
+    from app.common.recorder import DiveRecording
+    from app.common.replay import DiveReader, ReplaySource
+    from app.common.telemetry import TelemetryStore
+
+    folder = tempfile.mkdtemp(prefix="rov-replay-")
+    recording = DiveRecording(folder)
+    names = [f"ch{i}" for i in range(channels)]
+    batch = rate * 60
+    values = np.random.default_rng(0).standard_normal((channels, batch)).astype(np.float32)
+    for i in range(int(hours * 60)):
+        recording.append((np.arange(batch) + i * batch) / rate, dict(zip(names, values)))
+
+    recording.close()
+
+    start = time.perf_counter()
+    reader = DiveReader(folder)
+    openTime = time.perf_counter() - start
+
+    source = ReplaySource(TelemetryStore())
+    source.open(folder)
+    seeks = []
+    for t in np.random.default_rng(1).uniform(reader.startTime, reader.endTime, 20):
+        start = time.perf_counter()
+        source.seek(t)
+        seeks.append(time.perf_counter() - start)
+
+    source.setSpeed(speed)
+    source.start()
+    records = source.records
+    time.sleep(seconds)
+    played = (source.records - records) / seconds
+    source.stop()
+
+    del reader, source
+    shutil.rmtree(folder)
+    return openTime, seeks, played
+
+
+def benchDownsample(hours=3.0, rate=1000, pixels=1000):
+    """ feed `hours` of one channel into a store and query views of different spans
+
+    :return: (append records per second, {span: (query seconds, points)})
+    """
+    import numpy as np
+    from app.common.telemetry import TelemetryStore
+
+    store = TelemetryStore()
+    batch = rate * 60
+    start = time.perf_counter()
+    for i in range(int(hours * 60)):
+        t = (np.arange(batch) + i * batch) / rate
+        store.append(t, {"depth": np.sin(t / 100)})
+
+    appendRate = batch * int(hours * 60) / (time.perf_counter() - start)
+    end = float(store.time.latest(1)[0])
+    views = {}
+    for span in (10, 600, hours * 3600):
+        start = time.perf_counter()
+        t, _ = store.downsample("depth", end - span, end, pixels)
+        views[span] = (time.perf_counter() - start, len(t))
+
+    return appendRate, views
+
+
+def benchStats(rate=1000, seconds=600, batch=33):
+    """ cost of the rolling statistics, fed `seconds` of telemetry in batches of `batch` records
+
+    :return: (records per second through the running aggregates, seconds per `updateStats`)
+    """
+    import numpy as np
+    from app.common.telemetry_stats import StatsEngine
+    from app.common.telemetry import TelemetryStore
+
+    engine = StatsEngine()
+    t = np.arange(rate * seconds) / rate
+    columns = {"depth": np.sin(t / 10), "heading": t * 10 % 360, "voltage": 16.8 - t / 3600}
+    start = time.perf_counter()
+    for i in range(0, len(t), batch):
+        engine.update(t[i:i + batch], {name: c[i:i + batch] for name, c in columns.items()})
+
+    updateRate = len(t) / (time.perf_counter() - start)
+
+    store = TelemetryStore()
+    store.append(t[-store.capacity:], {name: c[-store.capacity:] for name, c in columns.items()})
+    start = time.perf_counter()
+    for _ in range(100):
+        store.updateStats()
+
+    return updateRate, (time.perf_counter() - start) / 100
+
+
+def benchAlarms(rate=1000, seconds=600, batch=33):
+    """ cost of evaluating the default alarm rules, on telemetry which keeps crossing the limits
+
+    :return: (records per second, alarm raises, publications), publications are rate limited in wall
+        clock time, and the telemetry is evaluated much faster than real time
+    """
+    import numpy as np
+    from app.common.alarms import AlarmEngine
+    from app.common.signal_bus import signalBus
+
+    engine = AlarmEngine()
+    published = []
+    signalBus.alarmChanged.connect(published.append)
+    t = np.arange(rate * seconds) / rate
+    columns = {"depth": cfg.get(cfg.alarmDepthLimit) + np.sin(t), "leak": (t % 60 > 59).astype(float),
+               **{f"current{i}": cfg.get(cfg.alarmCurrentLimit) + 2 * np.sin(t * i) for i in range(1, 5)}}
+    start = time.perf_counter()
+    for i in range(0, len(t), batch):
+        engine.evaluate(t[i:i + batch], {name: c[i:i + batch] for name, c in columns.items()})
+
+    elapsed = time.perf_counter() - start
+    QApplication.processEvents()
+    signalBus.alarmChanged.disconnect(published.append)
+    return len(t) / elapsed, sum(a.count for a in engine.alarms()), len(published)
@@ -0,0 +1,34 @@
+# coding: utf-8
+""" Helpers shared by the benchmarks """
+import os
+
+from app.common.config import cfg
+from app.common.latency_stats import percentile
+from .rov_stub_server import ROVStubServer
+
+
+def useStubServer(server: ROVStubServer):
+    """ point the connection config at the stand-in server without saving it """
+    cfg.sshAddress.value = "127.0.0.1"
+    cfg.sshPort.value = server.port
+    cfg.sshUser.value = server.username
+    cfg.sshPassword.value = server.password
+
+
+def summary(name, values, unit="ms", scale=1000):
+    """ one line of percentiles """
+    if not values:
+        return f"{name:<28} no samples"
+
+    p50, p95, p99 = (percentile(values, q) * scale for q in (50, 95, 99))
+    return f"{name:<28} n={len(values):<4} p50 {p50:8.2f} {unit}  p95 {p95:8.2f} {unit}  " \
+           f"p99 {p99:8.2f} {unit}  max {max(values) * scale:8.2f} {unit}"
+
+
+def residentMemory():
+    """ resident set size of this process in bytes, None where /proc is missing """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,151 @@
+# coding: utf-8
+""" Connection benchmarks against the local ROV stand-in server
+
+Run from the repository root:
+
+    python -m tools.benchmark --latency 0.005 --bandwidth 1000000
+
+With `--target` only the algorithm profiles are benchmarked, against the
+ROV in the saved config instead of the stand-in server.
+"""
+import argparse
+import os
+import sys
+
+from PyQt5.QtWidgets import QApplication
+
+from app.common.data_bus import DeliveryPolicy
+from .bench_control import benchMixer, benchGamepad, benchControlLoop, benchCommandStream, benchControlTrace
+from .bench_gui import benchDataBus, benchSignalTracing, benchStripChart
+from .bench_link import benchCheckLatency, benchReconnect, benchChannelThroughput, benchProfiles, printProfiles
+from .bench_telemetry import (benchDecode, benchTelemetry, benchRecorder, benchReplay, benchDownsample, benchStats,
+                              benchAlarms)
+from .bench_utils import useStubServer, summary
+from .rov_stub_server import ROVStubServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ROV connection against a local stand-in server")
+    parser.add_argument("--latency", type=float, default=0.0, help="one way link delay in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="link bandwidth in bytes per second")
+    parser.add_argument("--stall", type=float, default=0.0, help="probability of a stalled chunk")
+    parser.add_argument("--runs", type=int, default=10, help="number of runs of each benchmark")
+    parser.add_argument("--size", type=int, default=8, help="megabytes streamed in the throughput benchmark")
+    parser.add_argument("--record", type=int, default=120,
+                        help="seconds of 1 kHz x 64 channel telemetry recorded in the recorder benchmark")
+    parser.add_argument("--replay", type=float, default=3,
+                        help="hours of 1 kHz x 6 channel telemetry in the replay benchmark")
+    parser.add_argument("--target", action="store_true",
+                        help="benchmark the algorithm profiles against the ROV in the saved config")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    if args.target:
+        printProfiles(benchProfiles(args.runs, args.size * 1024 * 1024))
+        return
+
+    server = ROVStubServer(latency=args.latency, bandwidth=args.bandwidth, stallProbability=args.stall)
+    useStubServer(server)
+    print(f"Link: latency {args.latency * 1000:.1f} ms, bandwidth {args.bandwidth or 'unlimited'}, "
+          f"stall probability {args.stall}")
+
+    cold, warm = benchCheckLatency(args.runs)
+    print(summary("check (new handshake)", cold))
+    print(summary("check (reused session)", warm))
+
+    throughput, rtts = benchChannelThroughput(size=args.size * 1024 * 1024)
+    print(summary("channel message round trip", rtts))
+    print(f"{'channel throughput':<28} {throughput / 1024 / 1024:.2f} MiB/s")
+
+    for name, (rate, size) in benchDecode().items():
+        print(f"{f'decode {name}':<28} {rate / 1e6:.2f} M records/s, {size:.0f} bytes/record")
+
+    rate, memory = benchRecorder(seconds=args.record)
+    print(f"{'recorder 64 channels':<28} {rate:.0f} records/s ({rate / 1000:.0f}x real time), RSS " +
+          " / ".join(f"{m / 1024 / 1024:.0f}" if m else "?" for m in memory) + " MiB")
+
+    openTime, seeks, played = benchReplay(args.replay)
+    print(f"{f'replay open ({args.replay:g} h)':<28} {openTime * 1000:.2f} ms")
+    print(summary("replay seek", seeks))
+    print(f"{'replay at 32x':<28} {played:.0f} records/s")
+
+    appendRate, views = benchDownsample(args.replay)
+    print(f"{'store with pyramid':<28} {appendRate / 1e6:.2f} M records/s")
+    for span, (elapsed, points) in views.items():
+        print(f"{f'view of {span:g} s':<28} {elapsed * 1000:.2f} ms, {points} points for 1000 pixels")
+
+    updateRate, snapshot = benchStats(seconds=args.record)
+    print(f"{'rolling stats 3 channels':<28} {updateRate / 1e6:.2f} M records/s, "
+          f"{snapshot * 1000:.2f} ms per update")
+
+    alarmRate, raises, published = benchAlarms(seconds=args.record)
+    print(f"{'alarm rules':<28} {alarmRate / 1e6:.2f} M records/s, {raises} raises in {published} publications")
+
+    bus = benchDataBus()
+    print(f"{'data bus publish':<28} {bus['publishCost'] * 1e9:.0f} ns per message, 3 subscribers")
+    print(summary("data bus drain per frame", bus["drains"]))
+    for policy in DeliveryPolicy:
+        deliveries, delivered, dropped = bus[policy]
+        print(f"{f'data bus {policy.value.lower()}':<28} {deliveries} calls, {delivered} delivered, "
+              f"{dropped} dropped")
+    print(f"{'queued signal per message':<28} {bus['signal']:.2f} s of GUI thread for the same messages")
+
+    tick, saturated, batch = benchMixer()
+    print(f"{'thruster mixer':<28} {tick * 1e6:.2f} us per tick, {saturated * 1e6:.2f} us saturated, "
+          f"{batch * 1e9:.0f} ns per sample in batch")
+
+    parseRate, demandTime, coalesced, ages = benchGamepad()
+    print(f"{'gamepad events':<28} {parseRate / 1e6:.2f} M events/s parsed, {demandTime * 1e6:.2f} us per "
+          f"demand, {coalesced:.1f} reports per tick")
+    print(summary("gamepad state age at tick", ages))
+
+    plain, off, on, queue, slot = benchSignalTracing()
+    print(f"{'signal emit':<28} {plain * 1e9:.0f} ns plain, {off * 1e9:.0f} ns traced off, "
+          f"{on * 1e9:.0f} ns traced on")
+    for stage, values in (("queue", queue), ("slot", slot)):
+        print(f"{f'traced signal {stage}':<28} p50 {values['p50'] * 1000:.3f} ms  "
+              f"p95 {values['p95'] * 1000:.3f} ms  p99 {values['p99'] * 1000:.3f} ms")
+
+    incremental, full = benchStripChart()
+    print(summary("strip chart 16 traces frame", incremental))
+    print(summary("strip chart full redraw", full))
+
+    for load, stats in benchControlLoop().items():
+        print(f"{f'control loop 100 Hz, {load} GUI':<28} {stats}, lateness p99 {stats.lateness:.2f} ms")
+
+    stream = benchCommandStream(server)
+    encoded, raw, mismatches, encodeTime = stream["offline"]
+    print(f"{'command stream offline':<28} {encoded} of {raw} bytes ({encoded / raw:.1%}), "
+          f"{mismatches} mismatches, {encodeTime * 1e6:.2f} us per tick")
+    stats, ticks, applied, acked, errors, agrees = stream["live"]
+    print(f"{'command stream live':<28} {ticks} ticks, {applied} frames applied, {acked} acknowledged, "
+          f"{errors} errors, {'same' if agrees else 'different'} setpoint on the server")
+    print(f"{'command stream uplink':<28} {stats.sentRate:.0f} of {stats.rawRate:.0f} B/s, "
+          f"ack p50 {stats.ack:.2f} ms  p99 {stats.ackMax:.2f} ms")
+
+    trace, offsetError = benchControlTrace(server)
+    for stage, values in trace["stages"].items():
+        if values["n"]:
+            print(f"{f'control trace {stage}':<28} n={values['n']:<4} p50 {values['p50'] * 1000:8.2f} ms  "
+                  f"p95 {values['p95'] * 1000:8.2f} ms  p99 {values['p99'] * 1000:8.2f} ms")
+    print(f"{'control trace clock offset':<28} error {offsetError * 1000:.3f} ms, "
+          f"bound {trace['offsetError'] * 1000:.3f} ms")
+
+    for telemetryFormat in ("binary", "json"):
+        server.telemetryFormat = telemetryFormat
+        for rate in (100, 1000):
+            records, notifications = benchTelemetry(server, rate)
+            print(f"{f'telemetry {telemetryFormat} {rate} Hz':<28} {records:.0f} records/s, "
+                  f"{notifications:.1f} GUI updates/s")
+
+    print(summary("reconnect after tether drop", benchReconnect(server, args.runs)))
+    printProfiles(benchProfiles(args.runs, args.size * 1024 * 1024))
+
+    server.close()
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+# coding: utf-8
+import hashlib
+import json
+import math
+import os
+import random
+import shlex
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+import paramiko
+from paramiko import (SFTPServerInterface, SFTPServer, SFTPAttributes, SFTPHandle,
+                      SFTP_OK, AUTH_SUCCESSFUL, AUTH_FAILED, OPEN_SUCCEEDED)
+
+from app.common.command_format import CommandDecoder
+from app.common.telemetry_format import TelemetrySchema
+
+
+# length prefix of the messages of a logical channel
+MESSAGE_HEADER = struct.Struct("!I")
+
+
+class LinkEmulator:
+    """ TCP proxy which imitates the tether between the panel and the ROV
+
+    Parameters
+    ----------
+    latency: float
+        one way delay in seconds added to each direction
+
+    bandwidth: int
+        bytes per second of each direction, None for unlimited
+
+    stallProbability: float
+        probability that a chunk is held back for `stallDuration`, which
+        imitates a TCP retransmission after a lost packet
+
+    stallDuration: float
+        seconds a stalled chunk is held back
+    """
+
+    def __init__(self, upstreamPort: int, latency=0.0, bandwidth=None, stallProbability=0.0, stallDuration=0.2):
+        self.upstreamPort = upstreamPort
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.stallProbability = stallProbability
+        self.stallDuration = stallDuration
+        self._sockets = []
+        self._lock = threading.Lock()
+
+        self.listener = socket.socket()
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.__accept, name="LinkEmulator", daemon=True).start()
+
+    def __accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+
+            try:
+                upstream = socket.create_connection(("127.0.0.1", self.upstreamPort))
+            except OSError:
+                client.close()
+                continue
+
+            for s in (client, upstream):
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            with self._lock:
+                self._sockets += [client, upstream]
+
+            self.__pipe(client, upstream)
+            self.__pipe(upstream, client)
+
+    def __pipe(self, src: socket.socket, dst: socket.socket):
+        """ forward src to dst through a delay line """
+        queue = deque()
+        ready = threading.Condition()
+
+        def read():
+            free = time.monotonic()     # time the emulated wire becomes free
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b""
+
+                now = time.monotonic()
+                if data:
+                    start = max(now, free)
+                    if self.stallProbability and random.random() < self.stallProbability:
+                        start += self.stallDuration
+
+                    free = start + (len(data) / self.bandwidth if self.bandwidth else 0)
+                    due = free + self.latency
+                else:
+                    due = max(now, free) + self.latency
+
+                with ready:
+                    queue.append((due, data))
+                    ready.notify()
+
+                if not data:
+                    return
+
+        def write():
+            while True:
+                with ready:
+                    while not queue:
+                        ready.wait()
+
+                    due, data = queue.popleft()
+
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+    def dropConnections(self):
+        """ cut every connection, like an unplugged tether """
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+
+        for s in sockets:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+            s.close()
+
+    def close(self):
+        self.listener.close()
+        self.dropConnections()
+
+
+class _FileHandle(SFTPHandle):
+
+    def stat(self):
+        f = getattr(self, "readfile", None) or getattr(self, "writefile")
+        return SFTPAttributes.from_stat(os.fstat(f.fileno()))
+
+
+def resolvePath(root: str, path: str):
+    """ local path of a path on the stand-in ROV, whose file system is the folder `root`
+
+    Absolute and relative paths both start at `root`, ".." can not leave it.
+    """
+    path = os.path.normpath("/" + path.replace("\\", "/")).lstrip("/\\")
+    return os.path.join(root, path)
+
+
+class _FileSystemSFTP(SFTPServerInterface):
+    """ sftp subsystem serving the folder `root` as the file system of the ROV """
+
+    def __init__(self, server, root: str, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def canonicalize(self, path):
+        relative = os.path.relpath(resolvePath(self.root, path), self.root)
+        return "/" if relative == "." else "/" + relative.replace(os.sep, "/")
+
+    def list_folder(self, path):
+        path = resolvePath(self.root, path)
+        try:
+            attrs = []
+            for name in os.listdir(path):
+                attr = SFTPAttributes.from_stat(os.stat(os.path.join(path, name)))
+                attr.filename = name
+                attrs.append(attr)
+
+            return attrs
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(resolvePath(self.root, path)))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.lstat(resolvePath(self.root, path)))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        writing = flags & (os.O_WRONLY | os.O_RDWR)
+        path = resolvePath(self.root, path)
+        try:
+            fd = os.open(path, flags | getattr(os, "O_BINARY", 0), 0o644)
+            f = os.fdopen(fd, ("r+b" if flags & os.O_RDWR else "wb") if writing else "rb")
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+        handle = _FileHandle(flags)
+        handle.filename = path
+        if writing:
+            handle.writefile = f
+            if flags & os.O_RDWR:
+                handle.readfile = f
+        else:
+            handle.readfile = f
+
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(resolvePath(self.root, path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+        return SFTP_OK
+
+
+def echoCommand(channel: paramiko.Channel, command: str):
+    """ send everything received back, like a loopback ROV process """
+    while True:
+        data = channel.recv(65536)
+        if not data:
+            break
+
+        channel.sendall(data)
+
+    channel.send_exit_status(0)
+
+
+def sha256Command(channel: paramiko.Channel, command: str, root: str):
+    """ `sha256sum -- <path>` computed with hashlib, `path` is in the folder `root` """
+    path = shlex.split(command)[-1]
+    try:
+        h = hashlib.sha256()
+        with open(resolvePath(root, path), "rb") as f:
+            for data in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(data)
+    except OSError as e:
+        channel.sendall_stderr(f"sha256sum: {path}: {e.strerror}\n".encode())
+        channel.send_exit_status(1)
+        return
+
+    channel.sendall(f"{h.hexdigest()}  {path}\n".encode())
+    channel.send_exit_status(0)
+
+
+def headCommand(channel: paramiko.Channel, command: str):
+    """ `head -c <bytes> /dev/zero`, a bulk stream for throughput measurements """
+    args = shlex.split(command)
+    size = int(args[args.index("-c") + 1])
+    chunk = bytes(min(size, 32768))
+    while size > 0:
+        size -= channel.send(chunk[:size])
+
+    channel.send_exit_status(0)
+
+
+def imitatedRecord(t: float):
+    """ sensor values of the imitated ROV at time `t`, in the order of `TELEMETRY_CHANNELS` """
+    return {
+        "depth": 2 + math.sin(t / 5),
+        "heading": (t * 10) % 360,
+        "pitch": 5 * math.sin(t),
+        "roll": 3 * math.cos(t * 1.3),
+        "temperature": 18 + 0.1 * math.sin(t / 30),
+        "voltage": 16.8 - t / 3600,
+        **{f"current{i}": 2 + 1.5 * math.sin(t / 2 + i) for i in range(1, 5)},
+        "leak": 0.0,
+    }
+
+
+class _ROVServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, stub):
+        self.stub = stub    # type: ROVStubServer
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        if self.stub.consumeAuthFailure():
+            return AUTH_FAILED
+
+        ok = username == self.stub.username and password == self.stub.password
+        return AUTH_SUCCESSFUL if ok else AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        if self.stub.consumeAuthFailure():
+            return AUTH_FAILED
+
+        ok = username == self.stub.username and any(k == key for k in self.stub.authorizedKeys)
+        return AUTH_SUCCESSFUL if ok else AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        return OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=echoCommand, args=(channel, ""), daemon=True).start()
+        return True
+
+    def check_channel_pty_request(self, channel, *args):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode()
+        handler = self.stub.commands.get(command.split(" ", 1)[0])
+        if handler is None:
+            return False
+
+        def run():
+            try:
+                handler(channel, command)
+            finally:
+                # send EOF and let the client close the channel, a close could
+                # overtake the reply to the exec request of a fast command
+                channel.shutdown_write()
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def check_global_request(self, kind, msg):
+        # like OpenSSH, keepalive@openssh.com is answered with a failure
+        return False
+
+
+class ROVStubServer:
+    """ Local SSH server which imitates the ROV's sshd
+
+    It accepts the password of `username` and the keys in `authorizedKeys`,
+    serves the folder `root` as its file system over sftp, answers keepalive
+    requests and runs the commands in `commands`. Without a `root` it serves
+    a new temporary folder, which `close` removes. It is a test fixture, it
+    never leaves the loopback interface. All connections go through a
+    `LinkEmulator`, connect to `port` to get the emulated link.
+
+    `rov-control` applies the keyframes and deltas of the command stream
+    and acknowledges every frame with the times it received and applied
+    it, the last setpoint is kept in `controlValues`. Those times are on a
+    clock `clockOffset` seconds ahead of `time.perf_counter`, standing in
+    for the ROV's own clock. `rov-echo` sends back everything it receives.
+
+    `rov-telemetry` streams imitated sensor records at `telemetryRate`, as
+    binary frames or as newline delimited JSON depending on `telemetryFormat`.
+
+    Parameters
+    ----------
+    latency, bandwidth, stallProbability, stallDuration:
+        link emulation, see `LinkEmulator`
+
+    authFailures: int
+        number of authentication attempts to reject before accepting, -1 rejects all
+
+    root: str
+        folder served as the file system of the ROV
+    """
+
+    def __init__(self, username="rov", password="rov", latency=0.0, bandwidth=None,
+                 stallProbability=0.0, stallDuration=0.2, authFailures=0, hostKey=None, telemetryRate=100,
+                 telemetryFormat="binary", clockOffset=0.0, root=None):
+        self.username = username
+        self.password = password
+        self.authorizedKeys = []
+        self.authFailures = authFailures
+        self.telemetryRate = telemetryRate
+        self.telemetryFormat = telemetryFormat
+        self.clockOffset = clockOffset
+        self.ownsRoot = root is None
+        self.root = root if root is not None else tempfile.mkdtemp(prefix="rov-stub-")
+        self.hostKey = hostKey or paramiko.RSAKey.generate(2048)
+        self.commands = {
+            "rov-control": self.controlCommand,
+            "rov-echo": echoCommand,
+            "rov-telemetry": self.telemetryCommand,
+            "sha256sum": lambda channel, command: sha256Command(channel, command, self.root),
+            "head": headCommand,
+        }
+        self.controlValues = None
+        self.controlFrames = 0
+        self.controlErrors = 0
+        self.transports = []
+        self._lock = threading.Lock()
+
+        self.listener = socket.socket()
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.serverPort = self.listener.getsockname()[1]
+        threading.Thread(target=self.__accept, name="ROVStubServer", daemon=True).start()
+
+        self.link = LinkEmulator(self.serverPort, latency, bandwidth, stallProbability, stallDuration)
+
+    @property
+    def port(self):
+        """ port of the emulated link """
+        return self.link.port
+
+    def telemetryCommand(self, channel: paramiko.Channel, command: str):
+        """ stream imitated sensor records until the channel is closed """
+        schema = TelemetrySchema()
+        binary = self.telemetryFormat == "binary"
+        start = time.monotonic()
+        sent = 0
+        try:
+            if binary:
+                channel.sendall(schema.header())
+
+            while not channel.closed:
+                due = int((time.monotonic() - start) * self.telemetryRate)
+                frames = []
+                for i in range(sent, due):
+                    t = i / self.telemetryRate
+                    record = imitatedRecord(t)
+                    if binary:
+                        frames.append(schema.encode(i, t, record.values()))
+                    else:
+                        frames.append(json.dumps({"t": t, **record}).encode() + b"\n")
+
+                sent = due
+                if frames:
+                    channel.sendall(b"".join(frames))
+
+                time.sleep(0.005)
+        except OSError:
+            return
+
+    def controlCommand(self, channel: paramiko.Channel, command: str):
+        """ apply and acknowledge the frames of the command stream until the channel is closed """
+        decoder = CommandDecoder()
+        header = MESSAGE_HEADER
+        data = b""
+        try:
+            while True:
+                chunk = channel.recv(65536)
+                if not chunk:
+                    break
+
+                received = time.perf_counter() + self.clockOffset
+                data += chunk
+                while len(data) >= header.size:
+                    size = header.size + header.unpack_from(data)[0]
+                    if len(data) < size:
+                        break
+
+                    payload, data = data[header.size:size], data[size:]
+                    try:
+                        seq, values = decoder.decode(payload)
+                    except ValueError:
+                        self.controlErrors += 1
+                        continue
+
+                    self.controlValues = values
+                    self.controlFrames += 1
+                    ack = decoder.ack(seq, received, time.perf_counter() + self.clockOffset)
+                    channel.sendall(header.pack(len(ack)) + ack)
+        except OSError:
+            return
+
+    def consumeAuthFailure(self):
+        with self._lock:
+            if self.authFailures == 0:
+                return False
+
+            if self.authFailures > 0:
+                self.authFailures -= 1
+
+            return True
+
+    def __accept(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(self.hostKey)
+            transport.set_subsystem_handler("sftp", SFTPServer, _FileSystemSFTP, self.root)
+            try:
+                transport.start_server(server=_ROVServerInterface(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+
+            with self._lock:
+                self.transports.append(transport)
+
+    def dropConnections(self):
+        """ cut every connection on the emulated link """
+        self.link.dropConnections()
+
+    def close(self):
+        self.listener.close()
+        self.link.close()
+        with self._lock:
+            for t in self.transports:
+                t.close()
+
+            self.transports.clear()
+
+        if self.ownsRoot:
+            shutil.rmtree(self.root, ignore_errors=True)
+